@@ -0,0 +1,451 @@
+"""
+Computer players for the Backgammon engine.
+
+Every player exposes choose_play(position, color, dice, stop=None), returning
+one of the move tuples produced by Position.legal_plays, and shutdown() to
+release any resources the player holds. stop is a threading.Event owned by the
+caller; setting it from another thread makes a running choose_play return early. ENGINES maps the names offered in the GUI to the player classes.
+"""
+
+import random
+import sys
+import time
+
+from bearoff import default_database, home_counts
+from engine import BLACK, ROLLS, WHITE, Position, dice_for_roll, opponent
+from neural import NeuralPlayer
+from rollout import RolloutPlayer
+from transposition import TranspositionTable
+
+# Every evaluation lies within these bounds; the chance-node pruning relies on it.
+LOWER_BOUND = -1.0
+UPPER_BOUND = 1.0
+
+# Forward pruning: past the first iteration, a decision node searches its first play and
+# at most FILTER_PLAYS - 1 others, only those scoring within FILTER_MARGIN of the best statically.
+FILTER_PLAYS = 2
+FILTER_MARGIN = 0.05
+
+# XORed into the position hash when black is to move, so both sides get separate entries.
+BLACK_TO_MOVE_KEY = 0x9D39247E33776D41
+
+
+def evaluate(position, color):
+    """
+    Scores a position from one player's point of view with a quick heuristic.
+
+    The score combines the race (pip counts), borne-off checkers, exposed blots and
+    made points, squashed into the open interval (-1, 1). A won game scores exactly 1.
+    Once both sides are bearing off, the score comes from the bear-off database
+    instead, if it has been built.
+
+    Parameters:
+        position (engine.Position): The position to score, just after `color` played.
+        color (str): The player whose point of view is used.
+
+    Returns:
+        float: The score, 1 for a win and -1 for a loss.
+    """
+    winner = position.winner()
+    if winner:
+        return UPPER_BOUND if winner == color else LOWER_BOUND
+    other = opponent(color)
+    if position.outside[color] == 0 and position.outside[other] == 0:
+        database = default_database()
+        if database is not None:
+            lose = database.win_probability(home_counts(position, other), home_counts(position, color))
+            return max(LOWER_BOUND, min(UPPER_BOUND, 1.0 - 2.0 * lose))
+    score = (position.pips[other] - position.pips[color]) / 30.0
+    score += (position.off[color] - position.off[other]) / 15.0
+    score += 0.08 * (_structure(position, color) - _structure(position, other))
+    return score / (1.0 + abs(score))
+
+
+def _structure(position, color):
+    """
+    Counts made points (weighted towards home) minus blots left outside home.
+
+    Parameters:
+        position (engine.Position): The position to score.
+        color (str): The player whose checkers are counted.
+
+    Returns:
+        float: The structure score.
+    """
+    points = position.points
+    score = 0.0
+    if color == WHITE:
+        for point in range(1, 25):
+            n = points[point]
+            if n >= 2:
+                score += 1.0 if point <= 6 else 0.5
+            elif n == 1 and point > 6:
+                score -= 1.0
+    else:
+        for point in range(1, 25):
+            n = -points[point]
+            if n >= 2:
+                score += 1.0 if point >= 19 else 0.5
+            elif n == 1 and point < 19:
+                score -= 1.0
+    return score - 2.0 * position.bar(color)
+
+
+def _filter(plays):
+    """
+    Applies the forward-pruning move filter to a list of plays.
+
+    Parameters:
+        plays (list): The (moves, position, score) plays, the one to search first at the front.
+
+    Returns:
+        list: The first play followed by the best-scoring others within FILTER_MARGIN of the best score.
+    """
+    cutoff = max(score for (moves, child, score) in plays) - FILTER_MARGIN
+    rest = [play for play in plays[1:] if play[2] >= cutoff]
+    rest.sort(key=lambda play: play[2], reverse=True)
+    return plays[:1] + rest[:FILTER_PLAYS - 1]
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out.
+    """
+
+
+class RandomPlayer:
+    """
+    Plays a uniformly random legal play.
+
+    Attributes:
+        rng (random.Random): Random generator used to pick the play.
+    """
+
+    name = "random"
+
+    def __init__(self, rng=None):
+        """
+        Initializes the player.
+
+        Parameters:
+            rng (random.Random, optional): Random generator. Defaults to the random module.
+        """
+        self.rng = rng if rng is not None else random
+
+    def choose_play(self, position, color, dice, stop=None):
+        """
+        Picks a random legal play.
+
+        Parameters:
+            position (engine.Position): The current position.
+            color (str): The color to move.
+            dice (list): The dice to play.
+            stop (threading.Event, optional): Ignored; picking a random play is instant. Defaults to None.
+
+        Returns:
+            tuple: The chosen moves as (start_point, dest_point, die) tuples.
+        """
+        return self.rng.choice(position.legal_plays(color, dice))[0]
+
+    def shutdown(self):
+        """
+        Releases the player's resources; there are none to release.
+        """
+
+
+class ExpectiminimaxPlayer:
+    """
+    Expectiminimax search over the 21 distinct rolls with Star1/Star2 chance-node pruning.
+
+    The search deepens one chance layer at a time until the time budget runs out. Each
+    iteration searches the previous best play first, so an iteration cut off by the
+    deadline still yields the best play among the root plays it finished. Decision nodes
+    are searched with alpha-beta windows; at chance nodes the windows are narrowed using
+    the known evaluation bounds (Star1) and a cheap probe of each roll's best-looking
+    play (Star2), so many rolls can be cut without being searched in full. Past the
+    first iteration a move filter keeps only the few plays that look best statically,
+    so a second chance layer often fits in a one-second budget.
+
+    Attributes:
+        time_budget_ms (int): Hard limit on the thinking time per move.
+        max_depth (int): Deepest iteration to try, in chance layers.
+        table (transposition.TranspositionTable): Cache of decision-node results.
+        nodes (int): Nodes visited by the last search.
+        last_stats (dict): Nodes, nodes per second, depth reached and time of the last search.
+    """
+
+    name = "expectiminimax"
+
+    def __init__(self, time_budget_ms=1000, max_depth=4, evaluator=evaluate, table_mb=16):
+        """
+        Initializes the player.
+
+        Parameters:
+            time_budget_ms (int, optional): Time budget per move in milliseconds. Defaults to 1000.
+            max_depth (int, optional): Deepest iteration to try. Defaults to 4.
+            evaluator (callable, optional): Function (position, color) -> score in [-1, 1]. Defaults to evaluate.
+            table_mb (float, optional): Transposition table budget in megabytes. Defaults to 16.
+        """
+        self.time_budget_ms = time_budget_ms
+        self.max_depth = max_depth
+        self.evaluator = evaluator
+        self.table = TranspositionTable(table_mb)
+        self.nodes = 0
+        self.last_stats = {}
+        self._deadline = None
+        self._stop = None
+        self._best = None
+
+    def choose_play(self, position, color, dice, stop=None):
+        """
+        Searches for the best play within the time budget.
+
+        Parameters:
+            position (engine.Position): The current position.
+            color (str): The color to move.
+            dice (list): The dice to play.
+            stop (threading.Event, optional): Set from another thread to end the search at the next
+                node, as if its time budget had run out. Defaults to None.
+
+        Returns:
+            tuple: The chosen moves as (start_point, dest_point, die) tuples.
+        """
+        start = time.perf_counter()
+        self._deadline = start + self.time_budget_ms / 1000.0
+        self._stop = stop
+        self.nodes = 0
+        self.table.new_search()
+
+        plays = self._ordered_plays(position, color, dice)
+        self._best = plays[0][0]
+        depth_reached = 0
+        if len(plays) > 1:
+            for depth in range(1, self.max_depth + 1):
+                try:
+                    self._search_root(plays, color, depth)
+                except SearchTimeout:
+                    break
+                depth_reached = depth
+                # Stable sort: the best play moves to the front, the rest keep their order.
+                plays.sort(key=lambda play: play[0] != self._best)
+        best = self._best
+
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            "nodes": self.nodes,
+            "nodes_per_second": self.nodes / elapsed if elapsed > 0 else 0.0,
+            "depth": depth_reached,
+            "seconds": elapsed,
+        }
+        return best
+
+    def shutdown(self):
+        """
+        Releases the player's resources; there are none to release.
+        """
+
+    def _search_root(self, plays, color, depth):
+        """
+        Runs one iteration of the search over the root plays.
+
+        The best play so far is kept in _best as soon as it is known, so it survives a
+        SearchTimeout raised part way through the iteration.
+
+        Parameters:
+            plays (list): The (moves, position, score) root plays, the previous best first.
+            color (str): The color to move.
+            depth (int): Number of chance layers to search.
+        """
+        alpha = LOWER_BOUND
+        other = opponent(color)
+        if depth > 1:
+            plays = _filter(plays)
+        for (moves, child, score) in plays:
+            value = -self._chance(child, other, depth - 1, -UPPER_BOUND, -alpha)
+            if value > alpha:
+                alpha = value
+                self._best = moves
+
+    def _ordered_plays(self, position, color, dice):
+        """
+        Generates the legal plays sorted by their static evaluation, best first.
+
+        Parameters:
+            position (engine.Position): The position to move from.
+            color (str): The color to move.
+            dice (list): The dice to play.
+
+        Returns:
+            list: Tuples (moves, position, score) with the static score of each resulting position.
+        """
+        evaluator = self.evaluator
+        plays = [(moves, child, evaluator(child, color)) for (moves, child) in position.legal_plays(color, dice)]
+        plays.sort(key=lambda play: play[2], reverse=True)
+        return plays
+
+    def _tick(self):
+        """
+        Counts a node and aborts the search once the deadline has passed.
+        """
+        self.nodes += 1
+        self._check_deadline()
+
+    def _check_deadline(self):
+        """
+        Aborts the search once the deadline has passed or the caller asked it to stop.
+        """
+        if time.perf_counter() > self._deadline or (self._stop is not None and self._stop.is_set()):
+            raise SearchTimeout()
+
+    def _chance(self, position, color, depth, alpha, beta):
+        """
+        Value of a position before `color` rolls, as the probability-weighted average over the rolls.
+
+        Parameters:
+            position (engine.Position): The position.
+            color (str): The color about to roll.
+            depth (int): Remaining chance layers below this one.
+            alpha (float): Lower bound of the search window.
+            beta (float): Upper bound of the search window.
+
+        Returns:
+            float: The value from `color`'s point of view, or a bound outside the window on a cut.
+        """
+        self._tick()
+        if depth < 0 or position.winner():
+            return self.evaluator(position, color)
+
+        # Star2 probing: the best-looking play of each roll gives a lower bound on that roll's value.
+        # The node is cut as soon as the probes so far, with the rolls left at their worst, reach beta.
+        children = []
+        probe_total = 0.0
+        remaining = 1.0
+        for (roll, probability) in ROLLS:
+            self._check_deadline()
+            remaining -= probability
+            plays = self._ordered_plays(position, color, dice_for_roll(*roll))
+            if depth > 0:
+                # The probe only has to tell whether it reaches the cut, so its window ends there;
+                # below the cut Star1 takes it as a lower bound, so it must stay exact down to the bound.
+                probe_beta = (beta - probe_total - remaining * LOWER_BOUND) / probability
+                probe = -self._chance(plays[0][1], opponent(color), depth - 1,
+                                      -min(probe_beta, UPPER_BOUND), -LOWER_BOUND)
+            else:
+                probe = plays[0][2]
+            children.append((probability, roll, plays, probe))
+            probe_total += probability * probe
+            if probe_total + remaining * LOWER_BOUND >= beta:
+                return probe_total + remaining * LOWER_BOUND
+
+        # Star1 search: narrow every roll's window using what is already known.
+        total = 0.0
+        remaining = 1.0
+        lower_rest = probe_total
+        for (probability, roll, plays, probe) in children:
+            remaining -= probability
+            lower_rest -= probability * probe
+            child_alpha = (alpha - total - remaining * UPPER_BOUND) / probability
+            child_beta = (beta - total - lower_rest) / probability
+            value = self._decide(position, color, roll, plays, probe, depth,
+                                 max(child_alpha, probe), min(child_beta, UPPER_BOUND))
+            total += probability * value
+            if total + remaining * UPPER_BOUND <= alpha:
+                return total + remaining * UPPER_BOUND
+            if total + lower_rest >= beta:
+                return total + lower_rest
+        return total
+
+    def _decide(self, position, color, roll, plays, first_value, depth, alpha, beta):
+        """
+        Value of the best play for a roll, searched with an alpha-beta window.
+
+        Parameters:
+            position (engine.Position): The position before the play.
+            color (str): The color to move.
+            roll (tuple): The roll being played.
+            plays (list): The (moves, position, score) plays for the roll, best-looking first.
+            first_value (float): The exact value of the first play, already found by the probe.
+            depth (int): Remaining chance layers below this node.
+            alpha (float): Lower bound of the search window.
+            beta (float): Upper bound of the search window.
+
+        Returns:
+            float: The value from `color`'s point of view, or a bound outside the window on a cut.
+        """
+        self._tick()
+        key = position.hash ^ (BLACK_TO_MOVE_KEY if color == BLACK else 0)
+        entry = self.table.probe(key, roll)
+        if entry is not None and entry.depth >= depth:
+            low, high = entry.value
+            if low >= beta or high <= alpha or low == high:
+                return low if low >= beta or low == high else high
+
+        if depth == 0:
+            # The plays are sorted by static score, so the first one is the best.
+            return first_value
+
+        start_alpha = alpha
+        best = first_value
+        other = opponent(color)
+        for (moves, child, score) in _filter(plays)[1:]:
+            if best >= beta:
+                break
+            value = -self._chance(child, other, depth - 1, -beta, -max(alpha, best))
+            if value > best:
+                best = value
+        if best <= start_alpha:
+            bounds = (LOWER_BOUND, best)
+        elif best >= beta:
+            bounds = (best, UPPER_BOUND)
+        else:
+            bounds = (best, best)
+        self.table.store(key, roll, depth, bounds)
+        return best
+
+
+ENGINES = {
+    RandomPlayer.name: RandomPlayer,
+    ExpectiminimaxPlayer.name: ExpectiminimaxPlayer,
+    RolloutPlayer.name: RolloutPlayer,
+    NeuralPlayer.name: NeuralPlayer,
+}
+
+
+def benchmark(positions=20, time_budget_ms=1000, seed=0):
+    """
+    Runs the expectiminimax player on self-play positions and reports search speed.
+
+    Parameters:
+        positions (int, optional): Number of positions to search. Defaults to 20.
+        time_budget_ms (int, optional): Time budget per move. Defaults to 1000.
+        seed (int, optional): Seed for the sample positions. Defaults to 0.
+    """
+    rng = random.Random(seed)
+    player = ExpectiminimaxPlayer(time_budget_ms=time_budget_ms)
+    position = Position.initial()
+    color = WHITE
+    nodes = 0
+    seconds = 0.0
+    depths = []
+    for _ in range(positions):
+        dice = dice_for_roll(rng.randint(1, 6), rng.randint(1, 6))
+        moves = player.choose_play(position, color, dice)
+        stats = player.last_stats
+        nodes += stats["nodes"]
+        seconds += stats["seconds"]
+        depths.append(stats["depth"])
+        print(f"{color} {dice}: depth {stats['depth']}, {stats['nodes']} nodes, "
+              f"{stats['nodes_per_second']:,.0f} nodes/s, {stats['seconds'] * 1000:.0f} ms")
+        for (spoint, dest, die) in moves:
+            position.apply_move(color, spoint, dest)
+        if position.winner():
+            position = Position.initial()
+            color = WHITE
+        else:
+            color = opponent(color)
+    print(f"total: {nodes / seconds:,.0f} nodes/s, average depth {sum(depths) / len(depths):.2f}, "
+          f"max depth {max(depths)}")
+
+
+if __name__ == "__main__":
+    benchmark(*[int(arg) for arg in sys.argv[1:3]])
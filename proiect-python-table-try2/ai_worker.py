@@ -0,0 +1,113 @@
+"""
+Background thread that runs AI players so the GUI keeps rendering while they think.
+"""
+
+import queue
+import threading
+
+from tracing import span
+
+
+class AIWorker:
+    """
+    Runs choose_play requests on a daemon thread, one at a time.
+
+    Every request gets a ticket number and a stop event. cancel() moves the current
+    ticket on, so a result that arrives for an older request is dropped instead of
+    being played on a board that has been reset in the meantime, and sets the
+    request's event, which the player checks while it thinks. The event belongs to
+    the request, so a cancel that comes before the player has even started is not lost.
+
+    Attributes:
+        requests (queue.Queue): Pending (ticket, player, position, color, dice, stop) requests.
+        results (queue.Queue): Finished (ticket, play) results.
+        ticket (int): Ticket of the latest request; results for other tickets are stale.
+        busy (bool): True while the latest request has not produced a result.
+    """
+
+    def __init__(self):
+        """
+        Initializes the worker; the thread is started on the first request.
+        """
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.ticket = 0
+        self.busy = False
+        self._stop = None
+        self._thread = None
+
+    def request(self, player, position, color, dice):
+        """
+        Asks a player to choose a play in the background.
+
+        Parameters:
+            player (object): The AI player, see ai.ENGINES.
+            position (engine.Position): The position to move from; a copy is searched.
+            color (str): The color to move.
+            dice (list): The dice to play.
+
+        Returns:
+            int: The ticket of the request.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ai-worker", daemon=True)
+            self._thread.start()
+        if self._stop is not None:
+            self._stop.set()
+        self.ticket += 1
+        self.busy = True
+        self._stop = threading.Event()
+        self.requests.put((self.ticket, player, position.copy(), color, list(dice), self._stop))
+        return self.ticket
+
+    def poll(self):
+        """
+        Returns the result of the latest request if it is ready.
+
+        Returns:
+            tuple or None: The chosen moves, or None if nothing current has finished.
+        """
+        while True:
+            try:
+                ticket, play = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if ticket == self.ticket:
+                self.busy = False
+                return play
+
+    def cancel(self):
+        """
+        Abandons the latest request; its result will be discarded and the player is asked to stop early.
+        """
+        self.ticket += 1
+        self.busy = False
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+    def stop(self):
+        """
+        Cancels any request and ends the thread.
+        """
+        self.cancel()
+        if self._thread is not None:
+            self.requests.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            ticket, player, position, color, dice, stop = item
+            if ticket != self.ticket or stop.is_set():
+                continue
+            try:
+                with span("ai_search"):
+                    play = player.choose_play(position, color, dice, stop)
+            except Exception as e:
+                print(f"AI player failed: {e}")
+                play = ()
+            self.results.put((ticket, play))
@@ -0,0 +1,489 @@
+"""
+Batch analysis: rates every decision of recorded games by the equity it lost.
+
+Games are read as a stream from move-list files, or from game-record files
+written by records.py, and handed in chunks to a process pool. Each worker
+replays its games with the engine rules, scores every legal play of every roll
+with the chosen evaluator and compares the play made with the best one. Scores
+of positions already seen are kept in a per-worker cache, so openings and
+other common positions are evaluated once per worker rather than once per game.
+
+The move-list format is plain text, one line per entry, '#' starting a comment:
+
+    game white
+    white 31: 8/5 6/5
+    black 64: 24/18 13/9
+    white 66:
+    ...
+    end black gammon
+
+`game` names the player who moves first and `end` the winner ('-' if the game
+was not finished), followed by 'gammon' for a gammon. A turn names the player
+and the dice, then the checkers moved as from/to in that player's own point
+numbering (24 down to 1), with 'bar' and 'off'; a turn without moves has none.
+
+Example:
+    python analyze.py games.txt --evaluator neural --workers 4 --output errors.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from ai import evaluate
+from engine import COLORS, OFF, WHITE, Position, dice_for_roll, find_play
+from records import MAGIC, read_games
+
+# Games handed to a worker at once.
+CHUNK_SIZE = 8
+
+# Positions whose score a worker keeps.
+CACHE_ENTRIES = 200000
+
+# Equity lost by a play counted as a blunder.
+BLUNDER = 0.1
+
+
+def _heuristic(positions, color):
+    return [evaluate(position, color) for position in positions]
+
+
+def _neural():
+    from neural import NeuralEvaluator
+
+    network = NeuralEvaluator.default()
+
+    def score(positions, color):
+        values = network.win_probabilities(positions, color)
+        scores = []
+        for position, value in zip(positions, values):
+            winner = position.winner()
+            scores.append((1.0 if winner == color else -1.0) if winner else 2.0 * float(value) - 1.0)
+        return scores
+    return score
+
+
+# Evaluators by name. Each factory returns a function scoring a list of positions,
+# each just after `color` moved, from `color`'s point of view in [-1, 1].
+EVALUATORS = {
+    "heuristic": lambda: _heuristic,
+    "neural": _neural,
+}
+
+
+def point_name(slot, color):
+    """
+    Names a slot in a player's own point numbering.
+
+    Parameters:
+        slot (int): The slot index, or OFF.
+        color (str): The player.
+
+    Returns:
+        str: "bar", "off" or the point number.
+    """
+    if slot == OFF:
+        return "off"
+    if slot == (25 if color == WHITE else 0):
+        return "bar"
+    return str(slot if color == WHITE else 25 - slot)
+
+
+def slot_for(name, color):
+    """
+    Converts a point name of the move-list format to a slot index.
+
+    Parameters:
+        name (str): "bar", "off" or a point number in the player's own numbering.
+        color (str): The player.
+
+    Returns:
+        int: The slot index, or OFF.
+
+    Raises:
+        ValueError: If the name is not a point.
+    """
+    if name == "off":
+        return OFF
+    if name == "bar":
+        return 25 if color == WHITE else 0
+    point = int(name)
+    if not 1 <= point <= 24:
+        raise ValueError(f"No point {name}")
+    return point if color == WHITE else 25 - point
+
+
+def format_turn(color, dice, moves):
+    """
+    Formats one turn as a move-list line.
+
+    Parameters:
+        color (str): The player.
+        dice (tuple): The two dice.
+        moves (list): The moves as (start_point, dest_point, ...) tuples.
+
+    Returns:
+        str: The line, without the newline.
+    """
+    text = " ".join(f"{point_name(move[0], color)}/{point_name(move[1], color)}" for move in moves)
+    return f"{color} {dice[0]}{dice[1]}: {text}".rstrip()
+
+
+def write_game(f, first, turns, winner, gammon=False):
+    """
+    Writes one game in the move-list format.
+
+    Parameters:
+        f (file): The text file.
+        first (str): The player who moved first.
+        turns (list): (color, dice, moves) per turn.
+        winner (str): The winner, or None if unfinished.
+        gammon (bool, optional): Whether the win was a gammon. Defaults to False.
+    """
+    f.write(f"game {first}\n")
+    for (color, dice, moves) in turns:
+        f.write(format_turn(color, dice, moves) + "\n")
+    f.write(f"end {winner or '-'}{' gammon' if gammon else ''}\n")
+
+
+def read_movelist(path):
+    """
+    Streams the games of a move-list file.
+
+    Parameters:
+        path (str): The file.
+
+    Yields:
+        tuple: (first, turns, winner, gammon) per game, turns being (color, dice, moves)
+        with moves as (start_point, dest_point) pairs.
+
+    Raises:
+        ValueError: If a line cannot be parsed.
+    """
+    game = None
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                word, _, rest = line.partition(" ")
+                if word == "game":
+                    if rest not in COLORS:
+                        raise ValueError(f"unknown player {rest!r}")
+                    game = (rest, [])
+                elif word == "end":
+                    fields = rest.split()
+                    winner = fields[0] if fields and fields[0] in COLORS else None
+                    yield game[0], game[1], winner, "gammon" in fields[1:]
+                    game = None
+                elif word in COLORS:
+                    roll, _, text = rest.partition(":")
+                    roll = roll.strip()
+                    if len(roll) != 2 or any(digit not in "123456" for digit in roll):
+                        raise ValueError(f"bad roll {roll!r}")
+                    dice = (int(roll[0]), int(roll[1]))
+                    moves = []
+                    for step in text.split():
+                        start, dest = step.split("/")
+                        moves.append((slot_for(start, word), slot_for(dest, word)))
+                    game[1].append((word, dice, moves))
+                else:
+                    raise ValueError(f"unknown entry {word!r}")
+            except (ValueError, IndexError, TypeError) as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+    if game is not None:
+        yield game[0], game[1], None, False
+
+
+def read_game_file(path):
+    """
+    Streams the games of a move-list or game-record file, telling them apart by the record header.
+
+    Parameters:
+        path (str): The file.
+
+    Yields:
+        tuple: (first, turns, winner, gammon), see read_movelist.
+    """
+    with open(path, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    if not binary:
+        yield from read_movelist(path)
+        return
+    for (start, turns, end) in read_games(path):
+        yield (start.first,
+               [(turn.color, turn.dice, [move[:2] for move in turn.moves]) for turn in turns],
+               end.winner if end else None,
+               bool(end and end.gammon))
+
+
+_evaluator = None
+_cache = None
+
+
+def _init_worker(evaluator_name, cache_entries):
+    """
+    Builds a worker's evaluator and its empty position cache.
+
+    Parameters:
+        evaluator_name (str): Name in EVALUATORS.
+        cache_entries (int): Cache capacity.
+    """
+    global _evaluator, _cache
+    _evaluator = EVALUATORS[evaluator_name]()
+    _cache = (OrderedDict(), cache_entries, [0, 0])
+
+
+def _scores(children, color):
+    """
+    Scores positions after `color` moved, answering from the worker's cache where possible.
+
+    Parameters:
+        children (list): The positions.
+        color (str): The player who moved.
+
+    Returns:
+        list: The scores.
+    """
+    entries, capacity, counts = _cache
+    scores = [None] * len(children)
+    missing = []
+    for k, child in enumerate(children):
+        key = (child.hash, color)
+        value = entries.get(key)
+        if value is None:
+            missing.append(k)
+        else:
+            entries.move_to_end(key)
+            scores[k] = value
+    counts[0] += len(children) - len(missing)
+    counts[1] += len(missing)
+    if missing:
+        for k, value in zip(missing, _evaluator([children[k] for k in missing], color)):
+            scores[k] = value
+            entries[(children[k].hash, color)] = value
+        while len(entries) > capacity:
+            entries.popitem(last=False)
+    return scores
+
+
+def analyze_game(first, turns):
+    """
+    Replays one game and rates each of its decisions.
+
+    Parameters:
+        first (str): The player who moved first.
+        turns (list): (color, dice, moves) per turn.
+
+    Returns:
+        list: One dict per turn with "turn", "color", "dice", "played", "best",
+        "choices" (number of legal plays) and "error" (equity lost, 0 for forced plays).
+
+    Raises:
+        ValueError: If a recorded play is not legal.
+    """
+    position = Position.initial()
+    decisions = []
+    for index, (color, dice, moves) in enumerate(turns):
+        plays = position.legal_plays(color, dice_for_roll(*dice))
+        played = find_play(position, color, plays, moves)
+        if played is None:
+            raise ValueError(f"turn {index + 1}: {format_turn(color, dice, moves)} is not legal")
+        decision = {"turn": index + 1, "color": color, "dice": list(dice),
+                    "played": format_turn(color, dice, plays[played][0]).partition(": ")[2],
+                    "choices": len(plays), "error": 0.0}
+        decision["best"] = decision["played"]
+        if len(plays) > 1:
+            scores = _scores([child for (play, child) in plays], color)
+            best = max(range(len(plays)), key=scores.__getitem__)
+            decision["best"] = format_turn(color, dice, plays[best][0]).partition(": ")[2]
+            decision["error"] = scores[best] - scores[played]
+        decisions.append(decision)
+        position = plays[played][1]
+    return decisions
+
+
+def analyze_chunk(games):
+    """
+    Analyzes a chunk of games; runs inside a worker process.
+
+    Parameters:
+        games (list): (source, number, first, turns) per game.
+
+    Returns:
+        tuple: Per game (source, number, decisions or error message), then the positions
+        scored and the cache hits during the chunk.
+    """
+    counts = _cache[2]
+    hits, misses = counts
+    results = []
+    for (source, number, first, turns) in games:
+        try:
+            results.append((source, number, analyze_game(first, turns)))
+        except ValueError as e:
+            results.append((source, number, str(e)))
+    return results, counts[0] + counts[1] - hits - misses, counts[0] - hits
+
+
+def _chunks(paths):
+    """
+    Streams the games of several files in chunks of CHUNK_SIZE.
+
+    Parameters:
+        paths (list): Move-list or game-record files.
+
+    Yields:
+        list: (source, number, first, turns) per game.
+    """
+    chunk = []
+    for path in paths:
+        for number, (first, turns, winner, gammon) in enumerate(read_game_file(path), 1):
+            chunk.append((path, number, first, turns))
+            if len(chunk) == CHUNK_SIZE:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _results(paths, evaluator, workers, cache_entries):
+    """
+    Analyzes the games of several files, keeping at most two chunks per worker in flight.
+
+    Parameters:
+        paths (list): Move-list or game-record files.
+        evaluator (str): Name in EVALUATORS.
+        workers (int): Worker processes; 1 analyzes in this process.
+        cache_entries (int): Position cache capacity per worker.
+
+    Yields:
+        tuple: analyze_chunk results, in file order.
+    """
+    if workers == 1:
+        _init_worker(evaluator, cache_entries)
+        for chunk in _chunks(paths):
+            yield analyze_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(evaluator, cache_entries)) as pool:
+        pending = []
+        for chunk in _chunks(paths):
+            pending.append(pool.submit(analyze_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def run(paths, evaluator="heuristic", workers=None, output=None, cache_entries=CACHE_ENTRIES):
+    """
+    Analyzes every game of several files and summarizes the errors.
+
+    Parameters:
+        paths (list): Move-list or game-record files.
+        evaluator (str, optional): Name in EVALUATORS. Defaults to "heuristic".
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        output (str, optional): JSON-lines file receiving one line per decision.
+        cache_entries (int, optional): Position cache capacity per worker. Defaults to CACHE_ENTRIES.
+
+    Returns:
+        dict: Games, rejected games, decisions, positions scored, cache hit rate, positions and
+        decisions per second, and per color the total and average error and the blunders.
+    """
+    workers = workers or os.cpu_count() or 1
+    summary = {"games": 0, "rejected": 0, "decisions": 0, "positions": 0}
+    totals = {color: [0, 0.0, 0] for color in COLORS}
+    hits = 0
+    out = open(output, "w") if output is not None else None
+    start = time.perf_counter()
+    try:
+        for (results, positions, chunk_hits) in _results(paths, evaluator, workers, cache_entries):
+            summary["positions"] += positions
+            hits += chunk_hits
+            for (source, number, decisions) in results:
+                summary["games"] += 1
+                if isinstance(decisions, str):
+                    summary["rejected"] += 1
+                    print(f"Skipping game {number} of {source}: {decisions}")
+                    continue
+                for decision in decisions:
+                    summary["decisions"] += 1
+                    total = totals[decision["color"]]
+                    if decision["choices"] > 1:
+                        total[0] += 1
+                        total[1] += decision["error"]
+                        total[2] += decision["error"] >= BLUNDER
+                    if out is not None:
+                        out.write(json.dumps({"source": source, "game": number, **decision}) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = elapsed
+    summary["cache_hit_rate"] = hits / summary["positions"] if summary["positions"] else 0.0
+    summary["positions_per_second"] = summary["positions"] / elapsed if elapsed else 0.0
+    summary["decisions_per_second"] = summary["decisions"] / elapsed if elapsed else 0.0
+    for color, (choices, error, blunders) in totals.items():
+        summary[f"{color}_error"] = error
+        summary[f"{color}_error_per_choice"] = error / choices if choices else 0.0
+        summary[f"{color}_blunders"] = blunders
+    return summary
+
+
+def convert(paths, output):
+    """
+    Writes the games of several files, e.g. game-record files, as one move-list file.
+
+    Parameters:
+        paths (list): Move-list or game-record files.
+        output (str): The move-list file to write.
+
+    Returns:
+        int: The number of games written.
+    """
+    count = 0
+    with open(output, "w") as f:
+        for path in paths:
+            for (first, turns, winner, gammon) in read_game_file(path):
+                write_game(f, first, turns, winner, gammon)
+                count += 1
+    return count
+
+
+def main():
+    """
+    Parses the command line and analyzes or converts the games.
+    """
+    parser = argparse.ArgumentParser(description="Rate every decision of recorded Backgammon games.")
+    parser.add_argument("files", nargs="+", help="move-list or game-record files")
+    parser.add_argument("--evaluator", choices=sorted(EVALUATORS), default="heuristic",
+                        help="position evaluator (default heuristic)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--output", help="write every decision as a JSON line to this file")
+    parser.add_argument("--cache-entries", type=int, default=CACHE_ENTRIES,
+                        help=f"positions cached per worker (default {CACHE_ENTRIES})")
+    parser.add_argument("--convert", metavar="MOVELIST", help="write the games as a move-list file instead")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    if args.convert:
+        print(f"Wrote {convert(args.files, args.convert)} games to {args.convert}")
+        return
+    summary = run(args.files, args.evaluator, args.workers, args.output, args.cache_entries)
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"{summary['games']} games ({summary['rejected']} rejected), {summary['decisions']} decisions "
+          f"in {summary['seconds']:.2f} s: {summary['positions']} positions, "
+          f"{summary['positions_per_second']:,.0f} positions/s, cache hit rate {summary['cache_hit_rate']:.2f}")
+    for color in COLORS:
+        print(f"{color}: error {summary[f'{color}_error']:.3f}, "
+              f"{summary[f'{color}_error_per_choice']:.4f} per choice, {summary[f'{color}_blunders']} blunders")
+
+
+if __name__ == "__main__":
+    main()
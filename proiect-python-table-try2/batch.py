@@ -0,0 +1,213 @@
+"""
+NumPy move generation over batches of positions.
+
+Positions use the engine layout as an (N, 26) integer array: slots 1..24 are the
+points, positive counts are white, negative counts are black, slot 25 is the white
+bar and slot 0 the black bar. The rules match Position.move_for_die; black is
+handled by mirroring the board so that every computation runs from white's side.
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from engine import BLACK, OFF, WHITE, Game, dice_for_roll
+
+SLOTS = np.arange(26)
+
+
+def mirror(positions):
+    """
+    Swaps the colors and turns the board around, so black to move looks like white to move.
+
+    Parameters:
+        positions (numpy.ndarray): An (N, 26) array of signed counts.
+
+    Returns:
+        numpy.ndarray: The mirrored (N, 26) array; mirroring twice gives the input back.
+    """
+    return -positions[:, ::-1]
+
+
+def _white_masks(positions, dice):
+    """
+    Computes single-die legality for white on every slot of every board.
+
+    Parameters:
+        positions (numpy.ndarray): An (N, 26) array of signed counts.
+        dice (numpy.ndarray): An (N, 2) array of die values.
+
+    Returns:
+        tuple: A boolean (N, 2, 26) legality mask and an (N, 2, 26) array of destinations (OFF for bear-offs).
+    """
+    n = positions.shape[0]
+    own = positions > 0
+    on_bar = own[:, 25]
+    source_ok = np.where(on_bar[:, None], SLOTS == 25, own)
+    source_ok[:, 0] = False
+
+    d = dice[:, :, None]
+    raw_dest = SLOTS[None, None, :] - d
+    on_board = raw_dest >= 1
+    landing = np.take_along_axis(
+        np.broadcast_to(positions[:, None, :], (n, 2, 26)), np.clip(raw_dest, 0, 25), axis=2
+    )
+    land_ok = on_board & (landing >= -1)
+
+    bearing = ~own[:, 7:].any(axis=1)
+    back = np.where(own, SLOTS, 0).max(axis=1)
+    exact = d == SLOTS
+    over = (d > SLOTS) & (back[:, None, None] == SLOTS)
+    off_ok = ~on_board & bearing[:, None, None] & (exact | over)
+
+    mask = source_ok[:, None, :] & (land_ok | off_ok)
+    dests = np.where(on_board, raw_dest, OFF)
+    return mask, dests
+
+
+def _white_apply(positions, rows, sources, dests):
+    """
+    Plays one white checker on each selected board.
+
+    Parameters:
+        positions (numpy.ndarray): An (N, 26) array of signed counts.
+        rows (numpy.ndarray): Board index of each move.
+        sources (numpy.ndarray): Starting slot of each move.
+        dests (numpy.ndarray): Destination slot of each move (OFF for bear-offs).
+
+    Returns:
+        numpy.ndarray: An (M, 26) array with the resulting positions.
+    """
+    result = positions[rows].copy()
+    m = np.arange(len(rows))
+    result[m, sources] -= 1
+    landing = dests != OFF
+    lm = m[landing]
+    ld = dests[landing]
+    hit = result[lm, ld] == -1
+    result[lm[hit], ld[hit]] = 0
+    result[lm[hit], 0] -= 1
+    result[lm, ld] += 1
+    return result
+
+
+def legal_moves(positions, dice, color=WHITE):
+    """
+    Finds every legal single-die move on a batch of boards and plays each one.
+
+    Parameters:
+        positions (numpy.ndarray): An (N, 26) array of signed counts.
+        dice (numpy.ndarray): An (N, 2) array with the roll for each board.
+        color (str, optional): The color to move on every board. Defaults to white.
+
+    Returns:
+        tuple: (mask, dests, moves, results) where mask is a boolean (N, 2, 26) array
+        marking the legal (die, source slot) pairs, dests is the (N, 2, 26) array of
+        destinations (OFF for bear-offs), moves is an (M, 4) array of
+        (board, die index, source, destination) rows for the legal moves and results
+        is the (M, 26) array of resulting positions in the same order.
+    """
+    positions = np.asarray(positions, dtype=np.int16)
+    dice = np.asarray(dice, dtype=np.int16)
+    view = mirror(positions) if color == BLACK else positions
+    mask, dests = _white_masks(view, dice)
+    rows, die_idx, sources = np.nonzero(mask)
+    move_dests = dests[rows, die_idx, sources]
+    results = _white_apply(view, rows, sources, move_dests)
+    if color == BLACK:
+        mask = mask[:, :, ::-1]
+        dests = np.where(dests[:, :, ::-1] == OFF, OFF, 25 - dests[:, :, ::-1])
+        sources = 25 - sources
+        move_dests = np.where(move_dests == OFF, OFF, 25 - move_dests)
+        results = mirror(results)
+    moves = np.stack([rows, die_idx, sources, move_dests], axis=1)
+    return mask, dests, moves, results
+
+
+def sample_positions(count, seed=0):
+    """
+    Collects positions (with the color to move and its roll) from random self-play games.
+
+    Parameters:
+        count (int): Number of positions to collect.
+        seed (int, optional): Seed for the games. Defaults to 0.
+
+    Returns:
+        list: Tuples (Position, color, (d1, d2)).
+    """
+    rng = random.Random(seed)
+    samples = []
+    while len(samples) < count:
+        game = Game(rng)
+        game.reset()
+        game.roll_opening()
+        while not game.winner and len(samples) < count:
+            d1, d2 = game.roll_dice_once()
+            samples.append((game.position.copy(), game.current_player, (d1, d2)))
+            game.dice = dice_for_roll(d1, d2)
+            moves = game.legal_moves()
+            while moves and not game.winner:
+                game.play(*rng.choice(moves)[:2])
+                moves = game.legal_moves()
+            if not game.winner:
+                game.end_turn()
+    return samples
+
+
+def scalar_moves(samples, color):
+    """
+    Generates the same moves as legal_moves, one board at a time with the engine.
+
+    Parameters:
+        samples (list): Tuples (Position, (d1, d2)).
+        color (str): The color to move.
+
+    Returns:
+        list: Tuples (board, die index, source, destination, resulting counts).
+    """
+    moves = []
+    for row, (position, roll) in enumerate(samples):
+        for k, die in enumerate(roll):
+            for spoint in range(26):
+                dest = position.move_for_die(color, spoint, die)
+                if dest is not None:
+                    after = position.copy()
+                    after.apply_move(color, spoint, dest)
+                    moves.append((row, k, spoint, dest, tuple(after.points)))
+    return moves
+
+
+def main(count=20000):
+    """
+    Checks the batched rules against the engine and reports positions per second for both.
+
+    Parameters:
+        count (int, optional): Number of sample positions. Defaults to 20000.
+    """
+    samples = sample_positions(count)
+    for color in (WHITE, BLACK):
+        boards = [(p, d) for (p, c, d) in samples if c == color]
+        positions = np.array([p.points for (p, d) in boards], dtype=np.int16)
+        dice = np.array([d for (p, d) in boards], dtype=np.int16)
+
+        start = time.perf_counter()
+        expected = scalar_moves(boards, color)
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mask, dests, moves, results = legal_moves(positions, dice, color)
+        batch_time = time.perf_counter() - start
+
+        got = [tuple(move) + (tuple(result),) for move, result in zip(moves.tolist(), results.tolist())]
+        if sorted(got) != sorted(expected):
+            print(f"{color}: batched and scalar move generation differ")
+            sys.exit(1)
+        print(f"{color}: {len(boards)} positions, {len(expected)} moves, results match")
+        print(f"  scalar: {len(boards) / scalar_time:,.0f} positions/s")
+        print(f"  batch:  {len(boards) / batch_time:,.0f} positions/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,338 @@
+"""
+One-sided bear-off database.
+
+For every way of placing up to 15 checkers on the 6 home points (54264 positions)
+the database stores the expected number of rolls needed to bear them all off with
+best play, and the probability of needing exactly 0, 1, 2, ... rolls. Home
+points are counted from the edge: index 0 is the point one pip from off.
+
+File layout (little endian): a header "BGBO", version, checkers, points, bins
+(all uint16), then one record per position in rank order: the expected rolls as a
+float32 followed by `bins` uint16 probabilities scaled by 65535. The last bin
+holds the probability of needing that many rolls or more. Lookups read a single
+record straight from the memory-mapped file.
+
+Running this module builds the file, one pip-count level at a time, with the
+positions of each level split over a process pool.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from engine import ROLLS, WHITE, dice_for_roll
+
+MAGIC = b"BGBO"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHH")
+MAX_CHECKERS = 15
+HOME_POINTS = 6
+BINS = 32
+SCALE = 65535
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bearoff.bin")
+
+# Positions handed to a worker at once.
+TASK_SIZE = 256
+
+# _BINOMIAL[n][k] for the combinatorial ranking of positions.
+_BINOMIAL = [[0] * (HOME_POINTS + 2) for _ in range(MAX_CHECKERS + HOME_POINTS + 2)]
+for _n in range(MAX_CHECKERS + HOME_POINTS + 2):
+    _BINOMIAL[_n][0] = 1
+    for _k in range(1, min(_n, HOME_POINTS + 1) + 1):
+        _BINOMIAL[_n][_k] = _BINOMIAL[_n - 1][_k - 1] + _BINOMIAL[_n - 1][_k]
+
+POSITIONS = _BINOMIAL[MAX_CHECKERS + HOME_POINTS][HOME_POINTS]
+
+
+def position_rank(counts):
+    """
+    Maps a home-board distribution to its record number.
+
+    The checkers on the 6 points plus the ones already off are 15 stars split by
+    6 bars; the rank is the combinatorial-number-system index of the bar positions.
+
+    Parameters:
+        counts (tuple): Checkers on each home point, nearest-to-off first.
+
+    Returns:
+        int: The record number, from 0 to POSITIONS - 1.
+    """
+    rank = 0
+    slot = -1
+    for k in range(HOME_POINTS):
+        slot += counts[k] + 1
+        rank += _BINOMIAL[slot][k + 1]
+    return rank
+
+
+def all_positions():
+    """
+    Lists every distribution of up to 15 checkers over the home points.
+
+    Returns:
+        list: The distributions as tuples, nearest-to-off point first.
+    """
+    result = []
+
+    def place(prefix, left):
+        if len(prefix) == HOME_POINTS:
+            result.append(tuple(prefix))
+            return
+        for n in range(left + 1):
+            place(prefix + [n], left - n)
+
+    place([], MAX_CHECKERS)
+    return result
+
+
+def home_counts(position, color):
+    """
+    Extracts a color's home-board distribution from an engine position.
+
+    Parameters:
+        position (engine.Position): The position.
+        color (str): The color whose checkers are read.
+
+    Returns:
+        tuple: Checkers on each home point, nearest-to-off first.
+    """
+    if color == WHITE:
+        return tuple(position.points[1:7])
+    return tuple(-position.points[24 - k] for k in range(HOME_POINTS))
+
+
+def play_results(counts, dice):
+    """
+    Lists the distributions reachable by playing a roll, bearing off by the usual rules.
+
+    With every checker at home each die can always be played, so every die is used
+    until the last checker is off.
+
+    Parameters:
+        counts (tuple): Checkers on each home point, nearest-to-off first.
+        dice (list): The dice to play.
+
+    Returns:
+        set: The resulting distributions.
+    """
+    results = set()
+
+    def expand(c, remaining):
+        if not remaining or not any(c):
+            results.add(c)
+            return
+        die = remaining[0]
+        highest = max(k for k in range(HOME_POINTS) if c[k]) + 1
+        for point in range(1, HOME_POINTS + 1):
+            if not c[point - 1]:
+                continue
+            if point > die:
+                child = list(c)
+                child[point - 1] -= 1
+                child[point - die - 1] += 1
+            elif point == die or point == highest:
+                child = list(c)
+                child[point - 1] -= 1
+            else:
+                continue
+            expand(tuple(child), remaining[1:])
+
+    expand(counts, dice)
+    if len(dice) == 2:
+        expand(counts, dice[::-1])
+    return results
+
+
+class BearoffDatabase:
+    """
+    Read-only view of a bear-off database file through mmap.
+
+    Attributes:
+        path (str): The file path.
+        bins (int): Number of roll-count bins per record.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Opens and maps the database file.
+
+        Parameters:
+            path (str, optional): The database file. Defaults to bearoff.bin next to this module.
+
+        Raises:
+            ValueError: If the file is not a bear-off database of a supported version.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, checkers, points, bins = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or checkers != MAX_CHECKERS or points != HOME_POINTS:
+            raise ValueError(f"{path} is not a supported bear-off database")
+        self.bins = bins
+        self._record = struct.Struct(f"<f{bins}H")
+
+    def close(self):
+        """
+        Unmaps and closes the file.
+        """
+        self._map.close()
+        self._file.close()
+
+    def lookup(self, counts):
+        """
+        Reads the record of a home-board distribution.
+
+        Parameters:
+            counts (tuple): Checkers on each home point, nearest-to-off first.
+
+        Returns:
+            tuple: The expected number of rolls and the list of probabilities of needing exactly n rolls.
+        """
+        values = self._record.unpack_from(self._map, HEADER.size + position_rank(counts) * self._record.size)
+        return values[0], [v / SCALE for v in values[1:]]
+
+    def expected_rolls(self, counts):
+        """
+        Returns the expected number of rolls to bear off a distribution.
+
+        Parameters:
+            counts (tuple): Checkers on each home point, nearest-to-off first.
+
+        Returns:
+            float: The expected number of rolls.
+        """
+        offset = HEADER.size + position_rank(counts) * self._record.size
+        return struct.unpack_from("<f", self._map, offset)[0]
+
+    def win_probability(self, on_roll, other):
+        """
+        Probability that the side on roll bears off first in a pure bear-off race.
+
+        Parameters:
+            on_roll (tuple): Home-board distribution of the side about to roll.
+            other (tuple): Home-board distribution of the other side.
+
+        Returns:
+            float: The probability that the side on roll wins.
+        """
+        mine = self.lookup(on_roll)[1]
+        theirs = self.lookup(other)[1]
+        # The side on roll wins if it needs n rolls and the other side needs at least n.
+        theirs_at_least = 1.0
+        win = 0.0
+        for n in range(self.bins):
+            win += mine[n] * theirs_at_least
+            theirs_at_least -= theirs[n]
+        return min(1.0, max(0.0, win))
+
+
+_default = None
+
+
+def default_database():
+    """
+    Opens the database at DEFAULT_PATH once and shares it.
+
+    Returns:
+        BearoffDatabase or None: The database, or None if the file has not been built.
+    """
+    global _default
+    if _default is None and os.path.exists(DEFAULT_PATH):
+        _default = BearoffDatabase(DEFAULT_PATH)
+    return _default
+
+
+_shared = None
+
+
+def _attach(expected_name, dist_name):
+    global _shared
+    expected_shm = shared_memory.SharedMemory(name=expected_name)
+    dist_shm = shared_memory.SharedMemory(name=dist_name)
+    _shared = (
+        expected_shm,
+        dist_shm,
+        np.ndarray((POSITIONS,), dtype=np.float64, buffer=expected_shm.buf),
+        np.ndarray((POSITIONS, BINS), dtype=np.float64, buffer=dist_shm.buf),
+    )
+
+
+def _solve(task):
+    """
+    Computes the records of a batch of positions whose successors are already solved; runs in a worker.
+
+    Parameters:
+        task (list): The distributions to solve.
+    """
+    expected, dist = _shared[2], _shared[3]
+    for counts in task:
+        rank = position_rank(counts)
+        row = np.zeros(BINS)
+        if not any(counts):
+            expected[rank] = 0.0
+            row[0] = 1.0
+            dist[rank] = row
+            continue
+        total = 0.0
+        for (roll, probability) in ROLLS:
+            best = min((position_rank(child) for child in play_results(counts, dice_for_roll(*roll))),
+                       key=lambda child_rank: expected[child_rank])
+            total += probability * (1.0 + expected[best])
+            child = dist[best]
+            row[1:] += probability * child[:-1]
+            row[-1] += probability * child[-1]
+        expected[rank] = total
+        dist[rank] = row
+
+
+def build(path=DEFAULT_PATH, workers=None):
+    """
+    Builds the database file.
+
+    Parameters:
+        path (str, optional): Where to write the file. Defaults to DEFAULT_PATH.
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+    """
+    by_pips = {}
+    for counts in all_positions():
+        pips = sum((k + 1) * n for k, n in enumerate(counts))
+        by_pips.setdefault(pips, []).append(counts)
+
+    expected_shm = shared_memory.SharedMemory(create=True, size=POSITIONS * 8)
+    dist_shm = shared_memory.SharedMemory(create=True, size=POSITIONS * BINS * 8)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_attach,
+                                 initargs=(expected_shm.name, dist_shm.name)) as pool:
+            # Every play lowers the pip count, so a level only needs the levels below it.
+            for pips in sorted(by_pips):
+                level = by_pips[pips]
+                tasks = [level[i:i + TASK_SIZE] for i in range(0, len(level), TASK_SIZE)]
+                list(pool.map(_solve, tasks))
+
+        expected = np.ndarray((POSITIONS,), dtype=np.float64, buffer=expected_shm.buf)
+        dist = np.ndarray((POSITIONS, BINS), dtype=np.float64, buffer=dist_shm.buf)
+        records = np.zeros(POSITIONS, dtype=np.dtype([("expected", "<f4"), ("dist", "<u2", (BINS,))]))
+        records["expected"] = expected
+        records["dist"] = np.rint(np.clip(dist, 0.0, 1.0) * SCALE)
+        del expected, dist
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, MAX_CHECKERS, HOME_POINTS, BINS))
+            f.write(records.tobytes())
+    finally:
+        expected_shm.close()
+        expected_shm.unlink()
+        dist_shm.close()
+        dist_shm.unlink()
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    build(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH)
+    print(f"Built {POSITIONS} positions in {time.perf_counter() - start:.1f} s")
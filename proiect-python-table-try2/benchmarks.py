@@ -0,0 +1,378 @@
+"""
+Micro-benchmarks of the rules, rendering and networking hot paths.
+
+Every benchmark runs over the same corpus of positions, collected from seeded
+random self-play, so two runs measure the same work. Each one is repeated for a
+number of rounds and reports the median and best time per operation. Results
+are written as JSON and can be compared against a saved baseline; the exit
+status is 1 when a benchmark got slower than the baseline by more than the
+threshold.
+
+The GUI benchmarks run under the SDL dummy video driver, so no window is opened.
+
+Example:
+    python benchmarks.py --output baseline.json
+    python benchmarks.py --baseline baseline.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from batch import sample_positions
+from dice import BlockDice
+from engine import MOVE_CACHE, dice_for_roll
+from table import GUI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server import ServerInstance
+
+CORPUS_SEED = 2024
+CORPUS_SIZE = 200
+MOUSE_SEED = 7
+WINDOW_SIZE = (1200, 800)
+
+
+def measure(run, items, rounds, prepare=None):
+    """
+    Times an operation over a list of inputs.
+
+    Parameters:
+        run (callable): The operation, called with one item; only this call is timed.
+        items (list): The inputs, all used once per round.
+        rounds (int): Number of passes over the inputs.
+        prepare (callable, optional): Untimed setup called with each item before run.
+
+    Returns:
+        dict: "ops" performed and the "median_us", "min_us" and "stdev_us" time per operation over the rounds.
+    """
+    clock = time.perf_counter
+    per_op = []
+    for _ in range(rounds):
+        total = 0.0
+        for item in items:
+            if prepare is not None:
+                prepare(item)
+            start = clock()
+            run(item)
+            total += clock() - start
+        per_op.append(1e6 * total / len(items))
+    return {
+        "ops": rounds * len(items),
+        "median_us": statistics.median(per_op),
+        "min_us": min(per_op),
+        "stdev_us": statistics.stdev(per_op) if rounds > 1 else 0.0,
+    }
+
+
+class Suite:
+    """
+    The benchmark cases and the fixtures they share.
+
+    Attributes:
+        corpus (list): Tuples (Position, color, (d1, d2)) every case runs over.
+        gui (table.GUI): A GUI drawing to a dummy display.
+        rounds (int): Passes over the corpus per case.
+    """
+
+    CASES = (
+        "collect_all_valid_moves",
+        "check_if_has_moves",
+        "execute_move",
+        "find_piece_at",
+        "update_hover_states",
+        "draw_backgammon_table",
+        "render_hover",
+        "server_round_trip",
+    )
+
+    def __init__(self, rounds=5):
+        """
+        Builds the corpus and the GUI.
+
+        Parameters:
+            rounds (int, optional): Passes over the corpus per case. Defaults to 5.
+        """
+        self.rounds = rounds
+        self.corpus = sample_positions(CORPUS_SIZE, CORPUS_SEED)
+        self.gui = GUI(*WINDOW_SIZE, "Backgammon benchmarks")
+        self.mouse = self._mouse_positions()
+
+    def close(self):
+        """
+        Stops the GUI's AI worker and closes pygame.
+        """
+        self.gui.ai_worker.stop()
+        self.gui.ai_player.shutdown()
+        pygame.quit()
+
+    def load(self, sample):
+        """
+        Puts a corpus position on the GUI as a started game with the dice thrown.
+
+        Parameters:
+            sample (tuple): A corpus entry (Position, color, (d1, d2)).
+        """
+        position, color, roll = sample
+        # Every operation starts cold, as the first lookup of a turn does.
+        MOVE_CACHE.clear()
+        game = self.gui.game
+        game.position = position.copy()
+        game.current_player = color
+        game.dice = dice_for_roll(*roll)
+        game.winner = None
+        self.gui.game_started = True
+        self.gui.current_player_thrown_dice = True
+        self.gui.selected_piece = None
+        self.gui.hovered_piece = None
+        self.gui.possible_moves.clear()
+
+    def _mouse_positions(self):
+        """
+        Picks one mouse position per corpus entry: on a checker of the player to move half of the time.
+
+        Returns:
+            list: Tuples (corpus entry, (x, y)).
+        """
+        rng = random.Random(MOUSE_SEED)
+        items = []
+        for sample in self.corpus:
+            position, color, roll = sample
+            own = [point for point in range(1, 25) if position.color_at(point) == color]
+            if own and rng.random() < 0.5:
+                point = rng.choice(own)
+                x, y = self.gui.piece_center(point, position.count(point, color) - 1)
+                items.append((sample, (int(x), int(y))))
+            else:
+                items.append((sample, (rng.randrange(WINDOW_SIZE[0]), rng.randrange(WINDOW_SIZE[1]))))
+        return items
+
+    def collect_all_valid_moves(self):
+        """
+        Generates the valid first moves of the player to move.
+        """
+        return measure(lambda sample: self.gui.collect_all_valid_moves(sample[1]),
+                       self.corpus, self.rounds, prepare=self.load)
+
+    def check_if_has_moves(self):
+        """
+        Checks whether the player to move can play, ending the turn if not.
+        """
+        return measure(lambda sample: self.gui.check_if_has_moves(), self.corpus, self.rounds, prepare=self.load)
+
+    def execute_move(self):
+        """
+        Plays the first legal move of each position through the GUI.
+        """
+        items = []
+        for sample in self.corpus:
+            moves = sample[0].legal_first_moves(sample[1], dice_for_roll(*sample[2]))
+            if moves:
+                spoint, dest, die = moves[0]
+                items.append((sample, (spoint, sample[0].count(spoint, sample[1]) - 1, dest, die)))
+        return measure(lambda item: self.gui.execute_move(*item[1]), items, self.rounds,
+                       prepare=lambda item: self.load(item[0]))
+
+    def find_piece_at(self):
+        """
+        Hit-tests a mouse position against every checker.
+        """
+        return measure(lambda item: self.gui.find_piece_at(item[1]), self.mouse, self.rounds,
+                       prepare=lambda item: self.load(item[0]))
+
+    def update_hover_states(self):
+        """
+        Updates the hovered checker from the mouse position.
+        """
+        # The dummy video driver has no pointer, so the mouse position is fed in directly.
+        current = [(0, 0)]
+
+        def prepare(item):
+            self.load(item[0])
+            current[0] = item[1]
+
+        get_pos = pygame.mouse.get_pos
+        pygame.mouse.get_pos = lambda: current[0]
+        try:
+            return measure(lambda item: self.gui.update_hover_states(), self.mouse, self.rounds, prepare=prepare)
+        finally:
+            pygame.mouse.get_pos = get_pos
+
+    def draw_backgammon_table(self):
+        """
+        Draws a full frame, with a checker hovered and selected where the mouse is on one.
+        """
+        def prepare(item):
+            sample, pos = item
+            self.load(sample)
+            point, index = self.gui.find_piece_at(pos)
+            if point and self.gui.board.color_at(point) == sample[1]:
+                self.gui.hovered_piece = (point, index)
+                self.gui.selected_piece = (point, index)
+                self.gui.calculate_possible_moves()
+
+        return measure(lambda item: self.gui.draw_backgammon_table(), self.mouse, self.rounds, prepare=prepare)
+
+    def render_hover(self):
+        """
+        Renders the frame after the hovered checker changed, redrawing only the dirty rectangles.
+        """
+        items = []
+        for (sample, pos) in self.mouse:
+            position, color, roll = sample
+            own = [point for point in range(1, 25) if position.color_at(point) == color]
+            if own:
+                point = own[len(items) % len(own)]
+                items.append((sample, (point, position.count(point, color) - 1)))
+
+        def prepare(item):
+            self.load(item[0])
+            self.gui.render()
+            self.gui.hovered_piece = item[1]
+
+        return measure(lambda item: self.gui.render(), items, self.rounds, prepare=prepare)
+
+    def server_round_trip(self):
+        """
+        Sends roll_dice requests from a local client and waits for each broadcast state update.
+        """
+        loop = asyncio.new_event_loop()
+        with contextlib.redirect_stdout(io.StringIO()):
+            server = ServerInstance(port=0, dice_source=BlockDice(CORPUS_SEED))
+            client = socket.socket()
+            client.setblocking(False)
+            loop.create_task(server.accept_clients())
+            loop.run_until_complete(loop.sock_connect(client, (server.host, server.port)))
+            request = json.dumps({"type": "roll_dice"}).encode()
+
+            async def round_trip():
+                await loop.sock_sendall(client, request)
+                data = b""
+                while True:
+                    data += await loop.sock_recv(client, 4096)
+                    try:
+                        return json.loads(data.decode())
+                    except ValueError:
+                        continue
+
+            try:
+                return measure(lambda sample: loop.run_until_complete(round_trip()), self.corpus, self.rounds)
+            finally:
+                client.close()
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                loop.run_until_complete(server.shutdown())
+                loop.close()
+
+    def run(self, names=None):
+        """
+        Runs the selected cases.
+
+        Parameters:
+            names (list, optional): Case names to run. Defaults to all of CASES.
+
+        Returns:
+            dict: The results, keyed by case name.
+        """
+        return {name: getattr(self, name)() for name in (names or self.CASES)}
+
+
+def environment():
+    """
+    Describes the machine and library versions, stored next to the results.
+
+    Returns:
+        dict: Python, pygame and platform versions, the CPU count and the corpus parameters.
+    """
+    return {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "corpus_seed": CORPUS_SEED,
+        "corpus_size": CORPUS_SIZE,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares median times against a baseline.
+
+    Parameters:
+        results (dict): Current results, keyed by case name.
+        baseline (dict): Baseline results in the same format.
+        threshold (float): Allowed relative slowdown, e.g. 0.1 for 10%.
+
+    Returns:
+        list: Tuples (name, baseline median, current median, ratio, regressed) for the cases in both.
+    """
+    rows = []
+    for name, result in results.items():
+        if name in baseline:
+            before = baseline[name]["median_us"]
+            after = result["median_us"]
+            ratio = after / before if before else float("inf")
+            rows.append((name, before, after, ratio, ratio > 1.0 + threshold))
+    return rows
+
+
+def main():
+    """
+    Parses the command line, runs the suite, saves and compares the results.
+
+    Returns:
+        int: The exit status, 1 if any case regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Run the Backgammon micro-benchmarks.")
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default: all of {', '.join(Suite.CASES)})")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over the corpus per case (default 5)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown counted as a regression (default 0.10)")
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in Suite.CASES:
+            parser.error(f"unknown case {name}")
+
+    suite = Suite(args.rounds)
+    try:
+        results = suite.run(args.cases)
+    finally:
+        suite.close()
+
+    for name, result in results.items():
+        print(f"{name:26} median {result['median_us']:10.1f} us   min {result['min_us']:10.1f} us")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print()
+        for (name, before, after, ratio, regressed) in compare(results, baseline, args.threshold):
+            print(f"{name:26} {before:10.1f} -> {after:10.1f} us  x{ratio:.2f}{'  REGRESSION' if regressed else ''}")
+            status |= regressed
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+Bitboard position: the engine Position plus per-color masks over the 26 slots.
+
+Bit i of a mask stands for slot i. Every color keeps two masks, updated with
+each move: the slots it occupies and its blots (exactly one checker); its made
+points (two or more) are the occupied slots that are not blots. Single-die legality for every checker at once is then a
+shift of the occupied mask by the die, masked with the points the opponent has
+not made. Hit chances, blocked points and primes come out of the same masks.
+
+BitboardPosition is a drop-in replacement for Position: pass it as
+Game(position_class=BitboardPosition) or use --board bitboard in selfplay.py.
+Running this module compares move generation speed of both representations.
+"""
+
+import sys
+import time
+
+from engine import BLACK, MOVE_CACHE, OFF, WHITE, Position, dice_for_roll, opponent
+
+# Slots 1..24, the points a checker can land on.
+BOARD_MASK = ((1 << 25) - 1) & ~1
+
+# Slots outside each color's home board, bar included.
+OUTSIDE_MASK = {WHITE: ((1 << 26) - 1) & ~0b1111111, BLACK: (1 << 19) - 1}
+
+
+def _bits(mask):
+    """
+    Yields the set bit indices of a mask, lowest first.
+
+    Parameters:
+        mask (int): The mask.
+
+    Returns:
+        generator: The slot indices.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitboardPosition(Position):
+    """
+    Position that also keeps occupied and blot masks per color; made points are the occupied slots that are not blots.
+
+    Attributes:
+        occupied (dict): Per color, the mask of slots holding at least one checker.
+        blots (dict): Per color, the mask of slots holding exactly one checker.
+    """
+
+    __slots__ = ("occupied", "blots")
+
+    def __init__(self, points=None, off=None):
+        """
+        Initializes a position and its masks, empty unless counts are given.
+
+        Parameters:
+            points (list, optional): 26 signed checker counts. Defaults to an empty board.
+            off (dict, optional): Borne-off counts per color. Defaults to zero for both.
+        """
+        super().__init__(points, off)
+        self.occupied = {WHITE: 0, BLACK: 0}
+        self.blots = {WHITE: 0, BLACK: 0}
+        for slot in range(26):
+            self._refresh(slot, WHITE)
+            self._refresh(slot, BLACK)
+
+    def _refresh(self, slot, color):
+        """
+        Recomputes one color's mask bits of one slot from its checker count.
+
+        Parameters:
+            slot (int): The slot index.
+            color (str): The color whose masks are updated.
+        """
+        bit = 1 << slot
+        n = self.points[slot] if color == WHITE else -self.points[slot]
+        if n <= 0:
+            self.occupied[color] &= ~bit
+            self.blots[color] &= ~bit
+        elif n == 1:
+            self.occupied[color] |= bit
+            self.blots[color] |= bit
+        else:
+            self.occupied[color] |= bit
+            self.blots[color] &= ~bit
+
+    def made(self, color):
+        """
+        Returns the points a color has made.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+
+        Returns:
+            int: The mask of slots holding two or more checkers of the color.
+        """
+        return self.occupied[color] & ~self.blots[color]
+
+    def copy(self):
+        """
+        Returns an independent copy of the position and its masks.
+
+        Returns:
+            BitboardPosition: The copied position.
+        """
+        clone = BitboardPosition.__new__(BitboardPosition)
+        clone.points = self.points[:]
+        clone.off = self.off.copy()
+        clone.pips = self.pips.copy()
+        clone.outside = self.outside.copy()
+        clone.back = self.back.copy()
+        clone.hash = self.hash
+        clone.occupied = self.occupied.copy()
+        clone.blots = self.blots.copy()
+        return clone
+
+    def apply_move(self, color, spoint, dest_point):
+        """
+        Moves one checker like Position.apply_move and updates the masks of the touched slots.
+
+        Parameters:
+            color (str): The color of the checker ("white" or "black").
+            spoint (int): The starting slot index.
+            dest_point (int): The destination point, or OFF (-1) to bear off.
+
+        Returns:
+            bool: True if an opposing blot was hit.
+        """
+        hit = Position.apply_move(self, color, spoint, dest_point)
+        self._touch(color, spoint, dest_point, hit)
+        return hit
+
+    def _touch(self, color, spoint, dest_point, hit):
+        """
+        Updates the masks of the slots a move changed.
+
+        Parameters:
+            color (str): The color that moved.
+            spoint (int): The starting slot index.
+            dest_point (int): The destination point, or OFF (-1) for a bear-off.
+            hit (bool): Whether an opposing blot was hit.
+        """
+        points = self.points
+        occupied = self.occupied[color]
+        blots = self.blots[color]
+        for slot in ((spoint,) if dest_point == OFF else (spoint, dest_point)):
+            bit = 1 << slot
+            n = points[slot] if color == WHITE else -points[slot]
+            if n <= 0:
+                occupied &= ~bit
+                blots &= ~bit
+            elif n == 1:
+                occupied |= bit
+                blots |= bit
+            else:
+                occupied |= bit
+                blots &= ~bit
+        self.occupied[color] = occupied
+        self.blots[color] = blots
+        if hit:
+            other = opponent(color)
+            self._refresh(dest_point, other)
+            self._refresh(0 if color == WHITE else 25, other)
+
+    def make_move(self, color, spoint, dest_point):
+        """
+        Plays one checker like Position.make_move; the undo record also keeps the masks.
+
+        Parameters:
+            color (str): The color of the checker ("white" or "black").
+            spoint (int): The starting slot index.
+            dest_point (int): The destination point, or OFF (-1) to bear off.
+
+        Returns:
+            tuple: Position's undo record followed by the masks before the move.
+        """
+        masks = (self.occupied[WHITE], self.occupied[BLACK], self.blots[WHITE], self.blots[BLACK])
+        return Position.make_move(self, color, spoint, dest_point) + (masks,)
+
+    def unmake_move(self, record):
+        """
+        Takes back a move made with make_move and restores the masks of the touched slots.
+
+        Parameters:
+            record (tuple): The undo record returned by make_move.
+        """
+        Position.unmake_move(self, record[:7])
+        self.occupied[WHITE], self.occupied[BLACK], self.blots[WHITE], self.blots[BLACK] = record[7]
+
+    def can_land_on(self, dest_point, color):
+        """
+        Determines if a checker of the given color can land on a point.
+
+        Parameters:
+            dest_point (int): The destination point index (1-24).
+            color (str): The color of the checker ("white" or "black").
+
+        Returns:
+            bool: True if the opponent has not made the point.
+        """
+        return not (self.made(opponent(color)) >> dest_point) & 1
+
+    def landing_mask(self, color, die):
+        """
+        Computes, for every checker of a color at once, where a die lands on the board.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+            die (int): The die value.
+
+        Returns:
+            int: The mask of legal landing points (bear-offs excluded).
+        """
+        sources = self.occupied[color]
+        if color == WHITE:
+            if sources >> 25 & 1:
+                sources = 1 << 25
+            reach = sources >> die
+        else:
+            if sources & 1:
+                sources = 1
+            reach = sources << die
+        return reach & BOARD_MASK & ~self.made(opponent(color))
+
+    def hit_targets(self, color, die):
+        """
+        Returns the opposing blots a color can hit with one die.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+            die (int): The die value.
+
+        Returns:
+            int: The mask of hittable blots.
+        """
+        return self.landing_mask(color, die) & self.blots[opponent(color)]
+
+    def blocked_points(self, color):
+        """
+        Returns the points a color cannot land on.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+
+        Returns:
+            int: The mask of points made by the opponent.
+        """
+        return self.made(opponent(color)) & BOARD_MASK
+
+    def prime_length(self, color):
+        """
+        Returns the length of a color's longest run of consecutive made points.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+
+        Returns:
+            int: The longest prime, 0 without made points.
+        """
+        run = self.made(color) & BOARD_MASK
+        length = 0
+        while run:
+            run &= run >> 1
+            length += 1
+        return length
+
+    def is_bearing_mode(self, color):
+        """
+        Checks if every checker of a color is in its home board (or already borne off).
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+
+        Returns:
+            bool: True if the color may bear off.
+        """
+        return not self.occupied[color] & OUTSIDE_MASK[color]
+
+    def single_moves(self, color, dice):
+        """
+        Lists every legal single-die move for a color, in the same order as Position.single_moves.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+            dice (list): The remaining dice values.
+
+        Returns:
+            list: Tuples (start_point, dest_point, die), with dest_point OFF for bear-offs.
+        """
+        moves = []
+        if not dice:
+            return moves
+        own = self.occupied[color]
+        bearing = not own & OUTSIDE_MASK[color]
+        back = self.back[color]
+        for die in sorted(set(dice), reverse=True):
+            landing = self.landing_mask(color, die)
+            if color == WHITE:
+                # Bear-offs start on the lowest points, so they come before the board moves.
+                if bearing:
+                    for spoint in _bits(own & ((1 << (die + 1)) - 1) & ~1):
+                        if spoint == die or spoint == back:
+                            moves.append((spoint, OFF, die))
+                for dest in _bits(landing):
+                    moves.append((dest + die, dest, die))
+            else:
+                for dest in _bits(landing):
+                    moves.append((dest - die, dest, die))
+                if bearing:
+                    for spoint in _bits(own & ~((1 << (25 - die)) - 1) & BOARD_MASK):
+                        if 25 - spoint == die or 25 - spoint == back:
+                            moves.append((spoint, OFF, die))
+        return moves
+
+
+def main(count=2000, seed=0):
+    """
+    Generates the legal plays of a corpus of self-play positions with both representations and prints the speed.
+
+    Parameters:
+        count (int, optional): Number of positions. Defaults to 2000.
+        seed (int, optional): Seed for the positions. Defaults to 0.
+    """
+    from batch import sample_positions
+
+    samples = sample_positions(count, seed)
+    capacity = MOVE_CACHE.capacity
+    MOVE_CACHE.capacity = 0
+    try:
+        timings = {}
+        plays = {}
+        for cls in (Position, BitboardPosition):
+            positions = [(cls(position.points, position.off), color, dice_for_roll(*roll))
+                         for (position, color, roll) in samples]
+            start = time.perf_counter()
+            single = [position.single_moves(color, dice) for (position, color, dice) in positions]
+            middle = time.perf_counter()
+            plays[cls] = [sorted(child.key() for (moves, child) in position.legal_plays(color, dice))
+                          for (position, color, dice) in positions]
+            end = time.perf_counter()
+            timings[cls] = (middle - start, end - middle)
+            plays[cls].append(single)
+    finally:
+        MOVE_CACHE.capacity = capacity
+    if plays[Position] != plays[BitboardPosition]:
+        print("Mismatch between the representations")
+        return
+    for cls, (single, full) in timings.items():
+        print(f"{cls.__name__:17} single_moves {1e6 * single / count:7.1f} us   legal_plays {1e6 * full / count:7.1f} us")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
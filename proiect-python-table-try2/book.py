@@ -0,0 +1,247 @@
+"""
+Opening book: precomputed plays for the first rolls of a game.
+
+Every game starts from the same position, so the plays for the opening rolls
+and the replies to them can be chosen once, offline, and looked up instead of
+searched. Entries are keyed by the Zobrist hash of the position, the color to
+move and the roll. The book is a JSON file read the first time it is used.
+
+Running this module rebuilds the book with one of the engines in ai.ENGINES:
+
+    python book.py --engine expectiminimax --time-budget 2000 --replies 1
+"""
+
+import argparse
+import json
+import os
+import time
+
+from engine import COLORS, ROLLS, Position, dice_for_roll, find_play, opponent
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.json")
+VERSION = 1
+
+
+def book_key(position, color, dice):
+    """
+    Builds the book key of a position and a full roll.
+
+    Parameters:
+        position (engine.Position): The position.
+        color (str): The color to move.
+        dice (list): The dice to play.
+
+    Returns:
+        str or None: The key, or None if the dice are not a whole unplayed roll.
+    """
+    if len(dice) == 2 and dice[0] != dice[1]:
+        low, high = sorted(dice)
+    elif len(dice) == 4 and len(set(dice)) == 1:
+        low = high = dice[0]
+    else:
+        return None
+    return f"{position.hash:016x}:{color}:{low}{high}"
+
+
+class OpeningBook:
+    """
+    Lazily loaded table of precomputed plays.
+
+    Attributes:
+        path (str): The book file.
+        hits (int): Lookups answered by the book.
+        misses (int): Lookups the book had no entry for.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Initializes the book; the file is read on the first lookup.
+
+        Parameters:
+            path (str, optional): The book file. Defaults to opening_book.json next to this module.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+
+    def _load(self):
+        """
+        Reads the book file; a missing or unreadable file gives an empty book.
+
+        Returns:
+            dict: The entries, key to tuple of moves.
+        """
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path) as f:
+                        data = json.load(f)
+                    if data.get("version") == VERSION:
+                        self._entries = {key: tuple(tuple(move) for move in moves)
+                                         for key, moves in data["entries"].items()}
+                except (OSError, ValueError) as e:
+                    print(f"Could not read opening book {self.path}: {e}")
+        return self._entries
+
+    def __len__(self):
+        return len(self._load())
+
+    def lookup(self, position, color, dice):
+        """
+        Finds the book play for a position and roll.
+
+        Parameters:
+            position (engine.Position): The position.
+            color (str): The color to move.
+            dice (list): The dice to play.
+
+        Returns:
+            tuple or None: The moves as (start_point, dest_point, die) tuples, or None if out of book.
+        """
+        key = book_key(position, color, dice)
+        moves = self._load().get(key) if key is not None else None
+        if moves is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return moves
+
+
+_default = None
+
+
+def default_book():
+    """
+    Returns the book at DEFAULT_PATH, shared by every BookPlayer.
+
+    Returns:
+        OpeningBook: The book.
+    """
+    global _default
+    if _default is None:
+        _default = OpeningBook(DEFAULT_PATH)
+    return _default
+
+
+class BookPlayer:
+    """
+    Plays from the opening book while in book and hands over to another player afterwards.
+
+    Attributes:
+        player (object): The player used out of book, see ai.ENGINES.
+        book (OpeningBook): The book.
+        name (str): The wrapped player's name.
+    """
+
+    def __init__(self, player, book=None):
+        """
+        Wraps a player.
+
+        Parameters:
+            player (object): The player used out of book.
+            book (OpeningBook, optional): The book. Defaults to default_book().
+        """
+        self.player = player
+        self.book = book if book is not None else default_book()
+        self.name = player.name
+
+    def choose_play(self, position, color, dice, stop=None):
+        """
+        Returns the book play if there is a legal one, otherwise asks the wrapped player.
+
+        Parameters:
+            position (engine.Position): The current position.
+            color (str): The color to move.
+            dice (list): The dice to play.
+            stop (threading.Event, optional): Passed on to the wrapped player. Defaults to None.
+
+        Returns:
+            tuple: The chosen moves as (start_point, dest_point, die) tuples.
+        """
+        moves = self.book.lookup(position, color, dice)
+        if moves is not None:
+            # Matched by resulting position, as legal plays are merged; the legal play's own moves are returned.
+            plays = position.legal_plays(color, dice)
+            index = find_play(position, color, plays, moves)
+            if index is not None:
+                return plays[index][0]
+        return self.player.choose_play(position, color, dice, stop)
+
+    def shutdown(self):
+        """
+        Releases the wrapped player's resources.
+        """
+        self.player.shutdown()
+
+
+def build(player, path=DEFAULT_PATH, replies=1, engine_name=""):
+    """
+    Builds a book from the starting position with a player's choices and writes it.
+
+    Both colors may move first, so the book covers every roll for either color,
+    then every roll of the replies to each book play, `replies` plies deep.
+
+    Parameters:
+        player (object): The player choosing the book plays.
+        path (str, optional): The file to write. Defaults to DEFAULT_PATH.
+        replies (int, optional): Plies of replies after the opening play. Defaults to 1.
+        engine_name (str, optional): Name of the engine, stored in the file.
+
+    Returns:
+        int: The number of entries written.
+    """
+    entries = {}
+    frontier = [(Position.initial(), color) for color in COLORS]
+    start = time.perf_counter()
+    for ply in range(replies + 1):
+        following = []
+        for (position, color) in frontier:
+            for (roll, probability) in ROLLS:
+                dice = dice_for_roll(*roll)
+                key = book_key(position, color, dice)
+                if key in entries:
+                    continue
+                moves = player.choose_play(position, color, dice)
+                entries[key] = [list(move) for move in moves]
+                child = position.copy()
+                for (spoint, dest, die) in moves:
+                    child.apply_move(color, spoint, dest)
+                following.append((child, opponent(color)))
+        print(f"ply {ply}: {len(entries)} entries after {time.perf_counter() - start:.0f} s")
+        frontier = following
+    with open(path, "w") as f:
+        json.dump({"version": VERSION, "engine": engine_name, "replies": replies, "entries": entries}, f)
+    return len(entries)
+
+
+def main():
+    """
+    Parses the command line and rebuilds the book.
+    """
+    from ai import ENGINES
+
+    parser = argparse.ArgumentParser(description="Rebuild the opening book.")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="expectiminimax",
+                        help="engine choosing the plays (default expectiminimax)")
+    parser.add_argument("--time-budget", type=int, default=2000,
+                        help="milliseconds per play for engines with a time budget (default 2000)")
+    parser.add_argument("--replies", type=int, default=1, help="plies of replies after the opening (default 1)")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="book file (default opening_book.json)")
+    args = parser.parse_args()
+
+    cls = ENGINES[args.engine]
+    try:
+        player = cls(time_budget_ms=args.time_budget)
+    except TypeError:
+        player = cls()
+    try:
+        count = build(player, args.output, args.replies, args.engine)
+    finally:
+        player.shutdown()
+    print(f"Wrote {count} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
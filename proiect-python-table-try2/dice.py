@@ -0,0 +1,178 @@
+"""
+Dice sources: where the rolls of a game come from.
+
+A dice source has one method, roll(), returning the two dice of the next roll
+as a tuple. Game.roll_dice_once draws from the game's source:
+
+    LiveDice    a random generator rolled on demand, for real play
+    BlockDice   a seeded NumPy generator that makes rolls in blocks, for simulations
+    ReplayDice  the rolls of a recorded game, read back in order
+
+BlockDice gives the same sequence for the same seed on every platform and
+moves the random number generation out of the turn loop; with a fixed seed
+self-play and benchmarks repeat bit for bit.
+"""
+
+import random
+
+# Rolls made at once by BlockDice.
+BLOCK_SIZE = 4096
+
+
+class LiveDice:
+    """
+    Rolls two dice on demand with a random generator.
+
+    Attributes:
+        rng (random.Random): The generator, or the random module.
+    """
+
+    def __init__(self, rng=None):
+        """
+        Initializes the source.
+
+        Parameters:
+            rng (random.Random, optional): Random generator. Defaults to the random module.
+        """
+        self.rng = rng if rng is not None else random
+
+    def roll(self):
+        """
+        Rolls two six-sided dice.
+
+        Returns:
+            tuple: A pair of integers representing the dice results.
+        """
+        return (self.rng.randint(1, 6), self.rng.randint(1, 6))
+
+
+class BlockDice:
+    """
+    Serves rolls pre-generated in blocks by a seeded NumPy generator.
+
+    Attributes:
+        seed (int): The seed of the sequence.
+        block_size (int): Rolls generated at once.
+    """
+
+    def __init__(self, seed=0, block_size=BLOCK_SIZE):
+        """
+        Initializes the source at the start of its sequence.
+
+        Parameters:
+            seed (int, optional): The seed. Defaults to 0.
+            block_size (int, optional): Rolls generated at once. Defaults to BLOCK_SIZE.
+        """
+        self.seed = seed
+        self.block_size = block_size
+        self.rewind()
+
+    def rewind(self):
+        """
+        Goes back to the first roll of the sequence.
+        """
+        import numpy as np
+
+        self._generator = np.random.default_rng(self.seed)
+        self._rolls = []
+        self._next = 0
+
+    def _refill(self):
+        """
+        Generates the next block of rolls.
+        """
+        block = self._generator.integers(1, 7, size=(self.block_size, 2), dtype="int8")
+        self._rolls = list(map(tuple, block.tolist()))
+        self._next = 0
+
+    def roll(self):
+        """
+        Returns the next roll of the sequence.
+
+        Returns:
+            tuple: A pair of integers representing the dice results.
+        """
+        if self._next == len(self._rolls):
+            self._refill()
+        roll = self._rolls[self._next]
+        self._next += 1
+        return roll
+
+
+class ReplayDice:
+    """
+    Serves the rolls of a recorded game in order.
+
+    Game records keep who moved first but not the opening rolls, so the opening
+    is replayed as (2, 1) against (1, 1), which gives the recorded first player
+    the first turn.
+
+    Attributes:
+        rolls (list): The rolls still to serve.
+        fallback (object): Dice source used once the recorded rolls run out, or None.
+    """
+
+    def __init__(self, rolls, fallback=None):
+        """
+        Initializes the source.
+
+        Parameters:
+            rolls (list): The rolls, as pairs of dice.
+            fallback (object, optional): Dice source for rolls past the end of the record.
+                Defaults to None, which makes running out an error.
+        """
+        self.rolls = [tuple(roll) for roll in rolls]
+        self.fallback = fallback
+        self._next = 0
+
+    @staticmethod
+    def game_rolls(first, turns):
+        """
+        Lists the rolls a game needs, opening included.
+
+        Parameters:
+            first (str): The color that moved first.
+            turns (list): The recorded turns, as records.Turn records.
+
+        Returns:
+            list: The rolls in the order Game.roll_dice_once draws them.
+        """
+        opening = [(2, 1), (1, 1)] if first == "white" else [(1, 1), (2, 1)]
+        return opening + [turn.dice for turn in turns]
+
+    def roll(self):
+        """
+        Returns the next recorded roll.
+
+        Returns:
+            tuple: A pair of integers representing the dice results.
+
+        Raises:
+            IndexError: If the record has no more rolls and there is no fallback.
+        """
+        if self._next == len(self.rolls):
+            if self.fallback is None:
+                raise IndexError("The recorded game has no more rolls")
+            return self.fallback.roll()
+        roll = self.rolls[self._next]
+        self._next += 1
+        return roll
+
+
+def replay_games(path, fallback=None):
+    """
+    Streams one ReplayDice per game of a game-record file.
+
+    Parameters:
+        path (str): The game-record file, see records.py.
+        fallback (callable, optional): Called with the game number (0-based) to build the
+            fallback source of each game. Defaults to no fallback.
+
+    Yields:
+        ReplayDice: The dice of each recorded game.
+    """
+    from records import read_games
+
+    for number, (start, turns, end) in enumerate(read_games(path)):
+        yield ReplayDice(ReplayDice.game_rolls(start.first, turns),
+                         fallback(number) if fallback is not None else None)
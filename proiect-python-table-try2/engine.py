@@ -0,0 +1,971 @@
+"""
+Headless Backgammon rules engine.
+
+The position is kept as a 26-slot signed-count list: slots 1..24 are the board
+points, positive counts are white checkers and negative counts are black ones.
+Slot 25 is the white bar (white moves from 24 down to 1 and re-enters at 25 - die)
+and slot 0 is the black bar (black moves from 1 up to 24 and re-enters at die).
+Borne-off checkers are kept in a separate per-color counter.
+"""
+
+import random
+import threading
+from collections import OrderedDict
+
+from dice import LiveDice
+from tracing import TRACER
+
+WHITE = "white"
+BLACK = "black"
+COLORS = (WHITE, BLACK)
+
+OFF = -1
+WHITE_BAR = 25
+BLACK_BAR = 0
+CHECKERS_PER_SIDE = 15
+
+# Zobrist keys indexed [slot][signed count + 15]; an empty slot hashes to 0. The
+# off counts follow from the checkers left on the board, so they need no keys.
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_KEYS = [
+    [0 if count == 0 else _zobrist_rng.getrandbits(64) for count in range(-15, 16)]
+    for _ in range(26)
+]
+del _zobrist_rng
+
+# Entries kept by the shared legal-move cache; one entry holds every play of one roll.
+MOVE_CACHE_ENTRIES = 1024
+
+# The 21 distinct rolls with their probabilities: doubles 1/36, the others 2/36.
+ROLLS = [((d1, d2), (1 if d1 == d2 else 2) / 36) for d1 in range(1, 7) for d2 in range(d1, 7)]
+
+
+def dice_for_roll(d1, d2):
+    """
+    Expands a roll into the dice to be played; doubles are played four times.
+
+    Parameters:
+        d1 (int): The first die.
+        d2 (int): The second die.
+
+    Returns:
+        list: The dice values to play.
+    """
+    return [d1, d2] if d1 != d2 else [d1] * 4
+
+
+def opponent(color):
+    """
+    Returns the color of the other player.
+
+    Parameters:
+        color (str): The color of the player ("white" or "black").
+
+    Returns:
+        str: The opposing color.
+    """
+    return BLACK if color == WHITE else WHITE
+
+
+def sign_of(color):
+    """
+    Returns the sign used for a color's checkers in the signed-count array.
+
+    Parameters:
+        color (str): The color of the player ("white" or "black").
+
+    Returns:
+        int: 1 for white, -1 for black.
+    """
+    return 1 if color == WHITE else -1
+
+
+def bar_point(color):
+    """
+    Returns the slot index holding a color's checkers on the bar.
+
+    Parameters:
+        color (str): The color of the player ("white" or "black").
+
+    Returns:
+        int: 25 for white, 0 for black.
+    """
+    return WHITE_BAR if color == WHITE else BLACK_BAR
+
+
+def distance_to_off(color, point):
+    """
+    Returns how many pips a checker on a point still has to travel to be borne off.
+
+    Parameters:
+        color (str): The color of the checker ("white" or "black").
+        point (int): The slot index of the checker (bar slots included).
+
+    Returns:
+        int: The pip distance to the off tray.
+    """
+    return point if color == WHITE else 25 - point
+
+
+class LegalMoveCache:
+    """
+    LRU-bounded cache of the legal plays of a position for a color and the dice left.
+
+    Entries are keyed by the Zobrist hash of the position, so a move, which changes
+    the hash, makes the next lookup miss; Game.play also drops the entry it has just
+    played from. The cached plays and their positions are shared between callers
+    and must not be modified. The cache is safe to use from several threads.
+
+    Attributes:
+        capacity (int): Maximum number of entries.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to generate the plays.
+    """
+
+    def __init__(self, capacity=MOVE_CACHE_ENTRIES):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+            capacity (int, optional): Maximum number of entries, 0 to disable caching. Defaults to MOVE_CACHE_ENTRIES.
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(position, color, dice):
+        """
+        Builds the cache key of a lookup.
+
+        Parameters:
+            position (Position): The position.
+            color (str): The color to move.
+            dice (list): The dice values still to play.
+
+        Returns:
+            tuple: The position hash and class, the color and the sorted dice.
+        """
+        return (position.hash, position.__class__, color, tuple(sorted(dice)))
+
+    def get(self, key):
+        """
+        Looks up an entry and marks it as recently used.
+
+        Parameters:
+            key (tuple): A key built with key().
+
+        Returns:
+            tuple or None: The cached (plays, first moves), or None on a miss.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """
+        Stores an entry, evicting the least recently used one when full.
+
+        Parameters:
+            key (tuple): A key built with key().
+            value (tuple): The (plays, first moves) to cache.
+        """
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """
+        Removes an entry if it is cached.
+
+        Parameters:
+            key (tuple): A key built with key().
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Reports the cache counters.
+
+        Returns:
+            dict: "entries", "hits", "misses" and the "hit_rate".
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Legal plays shared by the GUI, the AI players and Game.play's validation.
+MOVE_CACHE = LegalMoveCache()
+
+
+class Position:
+    """
+    Compact Backgammon position without any rendering or turn state.
+
+    The pip counts, the number of checkers outside home and the distance of the
+    rearmost checker are running counters kept up to date by apply_move, so the
+    bear-off checks do not have to scan the board.
+
+    Attributes:
+        points (list): 26 signed checker counts, see the module docstring for the layout.
+        off (dict): Number of checkers borne off per color.
+        pips (dict): Pip count per color.
+        outside (dict): Number of checkers per color outside their home board, bar included.
+        back (dict): Distance to off of each color's rearmost checker (0 once all are off).
+        hash (int): 64-bit Zobrist hash of the checker counts, updated on every move.
+    """
+
+    __slots__ = ("points", "off", "pips", "outside", "back", "hash")
+
+    def __init__(self, points=None, off=None):
+        """
+        Initializes a position, empty unless counts are given.
+
+        Parameters:
+            points (list, optional): 26 signed checker counts. Defaults to an empty board.
+            off (dict, optional): Borne-off counts per color. Defaults to zero for both.
+        """
+        self.points = list(points) if points is not None else [0] * 26
+        self.off = dict(off) if off is not None else {WHITE: 0, BLACK: 0}
+        self.pips = {}
+        self.outside = {}
+        self.back = {}
+        for color in COLORS:
+            self._recount(color)
+        self.hash = 0
+        for point in range(26):
+            self.hash ^= ZOBRIST_KEYS[point][self.points[point] + 15]
+
+    def _recount(self, color):
+        """
+        Recomputes the running counters of one color from the checker counts.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+        """
+        s = sign_of(color)
+        pips = 0
+        outside = 0
+        back = 0
+        for point in range(26):
+            n = self.points[point] * s
+            if n > 0:
+                dist = distance_to_off(color, point)
+                pips += n * dist
+                if dist > 6:
+                    outside += n
+                if dist > back:
+                    back = dist
+        self.pips[color] = pips
+        self.outside[color] = outside
+        self.back[color] = back
+
+    def _find_back(self, color, start):
+        """
+        Finds the rearmost checker of a color at or below a given distance to off.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+            start (int): The largest distance to look at.
+
+        Returns:
+            int: The distance of the rearmost checker, or 0 if none is left on the board.
+        """
+        s = sign_of(color)
+        for dist in range(start, 0, -1):
+            # distance_to_off is its own inverse, so it also maps a distance back to a point.
+            if self.points[distance_to_off(color, dist)] * s > 0:
+                return dist
+        return 0
+
+    @classmethod
+    def initial(cls):
+        """
+        Builds the standard starting position.
+
+        Returns:
+            Position: A new position with all 30 checkers in their starting places.
+        """
+        points = [0] * 26
+        points[1] = -2
+        points[6] = 5
+        points[8] = 3
+        points[12] = -5
+        points[13] = 5
+        points[17] = -3
+        points[19] = -5
+        points[24] = 2
+        return cls(points)
+
+    def copy(self):
+        """
+        Returns an independent copy of the position.
+
+        Returns:
+            Position: The copied position.
+        """
+        clone = Position.__new__(Position)
+        clone.points = self.points[:]
+        clone.off = self.off.copy()
+        clone.pips = self.pips.copy()
+        clone.outside = self.outside.copy()
+        clone.back = self.back.copy()
+        clone.hash = self.hash
+        return clone
+
+    def key(self):
+        """
+        Returns a hashable value identifying the position.
+
+        Returns:
+            tuple: The signed counts followed by the white and black off counts.
+        """
+        return tuple(self.points) + (self.off[WHITE], self.off[BLACK])
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self.key() == other.key()
+
+    def __hash__(self):
+        return self.hash
+
+    def __repr__(self):
+        return f"Position({self.points!r}, {self.off!r})"
+
+    def count(self, point, color):
+        """
+        Returns how many checkers of a color sit on a point.
+
+        Parameters:
+            point (int): The slot index.
+            color (str): The color of the checkers ("white" or "black").
+
+        Returns:
+            int: The number of checkers of that color on the point.
+        """
+        n = self.points[point] * sign_of(color)
+        return n if n > 0 else 0
+
+    def color_at(self, point):
+        """
+        Returns the color owning a point.
+
+        Parameters:
+            point (int): The slot index.
+
+        Returns:
+            str or None: The owning color, or None if the point is empty.
+        """
+        n = self.points[point]
+        if n > 0:
+            return WHITE
+        if n < 0:
+            return BLACK
+        return None
+
+    def bar(self, color):
+        """
+        Returns how many checkers of a color are on the bar.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+
+        Returns:
+            int: The number of checkers on the bar.
+        """
+        return self.count(bar_point(color), color)
+
+    def pip_count(self, color):
+        """
+        Returns the total pip distance a color still has to travel to bear off every checker.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+
+        Returns:
+            int: The pip count.
+        """
+        return self.pips[color]
+
+    def can_land_on(self, dest_point, color):
+        """
+        Determines if a checker of the given color can land on a point.
+
+        Parameters:
+            dest_point (int): The destination point index (1-24).
+            color (str): The color of the checker ("white" or "black").
+
+        Returns:
+            bool: True if the point is empty, owned by the color, or holds a single opposing blot.
+        """
+        return self.points[dest_point] * sign_of(color) >= -1
+
+    def is_bearing_mode(self, color):
+        """
+        Checks if every checker of a color is in its home board (or already borne off).
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+
+        Returns:
+            bool: True if the color may bear off.
+        """
+        return self.outside[color] == 0
+
+    def can_bear_off(self, color, spoint, die):
+        """
+        Determines if a checker can be borne off from a point with a given die.
+
+        A die equal to the checker's distance always works; a larger die only works
+        when no checker of the same color sits further from home.
+
+        Parameters:
+            color (str): The color of the checker ("white" or "black").
+            spoint (int): The point the checker is on.
+            die (int): The die value being used.
+
+        Returns:
+            bool: True if the bear-off is legal.
+        """
+        if not self.is_bearing_mode(color):
+            return False
+        dist = distance_to_off(color, spoint)
+        if die == dist:
+            return True
+        return die > dist and self.back[color] == dist
+
+    def destination(self, color, spoint, die):
+        """
+        Returns where a checker would end up after moving by a die value.
+
+        Parameters:
+            color (str): The color of the checker ("white" or "black").
+            spoint (int): The starting slot index.
+            die (int): The die value.
+
+        Returns:
+            int: The destination point, or OFF (-1) if the move leaves the board.
+        """
+        if color == WHITE:
+            dest = spoint - die
+            return dest if dest >= 1 else OFF
+        dest = spoint + die
+        return dest if dest <= 24 else OFF
+
+    def move_for_die(self, color, spoint, die):
+        """
+        Returns the destination of a legal single-die move, if there is one.
+
+        Parameters:
+            color (str): The color of the checker ("white" or "black").
+            spoint (int): The starting slot index.
+            die (int): The die value.
+
+        Returns:
+            int or None: The destination point (OFF for a bear-off), or None if the move is illegal.
+        """
+        if self.points[spoint] * sign_of(color) <= 0:
+            return None
+        if self.bar(color) > 0 and spoint != bar_point(color):
+            return None
+        dest = self.destination(color, spoint, die)
+        if dest == OFF:
+            return OFF if self.can_bear_off(color, spoint, die) else None
+        return dest if self.can_land_on(dest, color) else None
+
+    def single_moves(self, color, dice):
+        """
+        Lists every legal single-die move for a color.
+
+        Stacked checkers are interchangeable, so each (start, destination) appears once.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+            dice (list): The remaining dice values.
+
+        Returns:
+            list: Tuples (start_point, dest_point, die), with dest_point OFF for bear-offs.
+        """
+        moves = []
+        if not dice:
+            return moves
+        s = sign_of(color)
+        bar = bar_point(color)
+        if self.points[bar] * s > 0:
+            sources = (bar,)
+        else:
+            sources = [p for p in range(1, 25) if self.points[p] * s > 0]
+        for die in sorted(set(dice), reverse=True):
+            for spoint in sources:
+                dest = self.move_for_die(color, spoint, die)
+                if dest is not None:
+                    moves.append((spoint, dest, die))
+        return moves
+
+    def _search_plays(self, color, dice):
+        """
+        Walks every move sequence for a roll and keeps the ones using the most dice.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+            dice (list): The dice values to play.
+
+        Returns:
+            tuple: The list of (moves, position) plays merged by resulting position, and the
+            list of distinct first moves over all maximal sequences before merging.
+        """
+        key = MOVE_CACHE.key(self, color, dice)
+        cached = MOVE_CACHE.get(key)
+        if cached is not None:
+            return cached
+        results = {}
+        reach_by_opener = {}
+        seen = {}
+        best = [0]
+
+        # The walk makes and unmakes moves on one working copy; only the final
+        # positions of new plays are copied.
+        position = self.copy()
+
+        def expand(remaining, moves):
+            # Different move orders often reach the same intermediate position with the
+            # same dice left; its subtree has already been walked, only its reach is needed.
+            node = (position.hash, remaining)
+            reach = seen.get(node)
+            if reach is None:
+                reach = len(moves)
+                for (spoint, dest, die) in position.single_moves(color, remaining):
+                    undo = position.make_move(color, spoint, dest)
+                    rest = list(remaining)
+                    rest.remove(die)
+                    reach = max(reach, expand(tuple(rest), moves + ((spoint, dest, die),)))
+                    position.unmake_move(undo)
+                if reach == len(moves) and reach >= best[0]:
+                    if reach > best[0]:
+                        best[0] = reach
+                        results.clear()
+                    key = position.key()
+                    if key not in results:
+                        results[key] = (moves, position.copy())
+                seen[node] = reach
+            if len(moves) == 1:
+                reach_by_opener[moves[0]] = max(reach, reach_by_opener.get(moves[0], 0))
+            return reach
+
+        expand(tuple(sorted(dice)), ())
+        plays = list(results.values())
+        openers = [move for (move, reach) in reach_by_opener.items() if reach == best[0]]
+        if best[0] == 1 and len(dice) == 2 and dice[0] != dice[1]:
+            high = max(dice)
+            if any(move[2] == high for move in openers):
+                plays = [play for play in plays if play[0][0][2] == high]
+                openers = [move for move in openers if move[2] == high]
+        MOVE_CACHE.put(key, (plays, openers))
+        if TRACER.enabled:
+            TRACER.count("move_searches")
+            TRACER.count("plays_generated", len(plays))
+        return plays, openers
+
+    def legal_plays(self, color, dice):
+        """
+        Lists every legal full play for a roll, one per distinct resulting position.
+
+        A play uses as many dice as possible (four moves for doubles); when only one
+        of two different dice can be played, the larger one must be used if it can be.
+        Move orders or checker choices that end in the same position are merged.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+            dice (list): The dice values to play.
+
+        Returns:
+            list: Tuples (moves, position) where moves is a tuple of (start_point, dest_point, die)
+            and position is the resulting Position. An unplayable roll gives [((), copy)].
+            The list is shared through MOVE_CACHE and must not be modified.
+        """
+        return self._search_plays(color, dice)[0]
+
+    def legal_first_moves(self, color, dice):
+        """
+        Lists the single-die moves that begin some legal full play.
+
+        Parameters:
+            color (str): The color of the player ("white" or "black").
+            dice (list): The dice values still to play.
+
+        Returns:
+            list: Tuples (start_point, dest_point, die).
+        """
+        return self._search_plays(color, dice)[1]
+
+    def apply_move(self, color, spoint, dest_point):
+        """
+        Moves one checker, sending a hit blot to the bar and counting bear-offs.
+
+        The move is assumed to be legal.
+
+        Parameters:
+            color (str): The color of the checker ("white" or "black").
+            spoint (int): The starting slot index.
+            dest_point (int): The destination point, or OFF (-1) to bear off.
+
+        Returns:
+            bool: True if an opposing blot was hit.
+        """
+        s = sign_of(color)
+        points = self.points
+        keys = ZOBRIST_KEYS
+        h = self.hash ^ keys[spoint][points[spoint] + 15]
+        points[spoint] -= s
+        h ^= keys[spoint][points[spoint] + 15]
+        start_dist = distance_to_off(color, spoint)
+        if dest_point == OFF:
+            self.off[color] += 1
+            dest_dist = 0
+            hit = False
+        else:
+            dest_dist = distance_to_off(color, dest_point)
+            h ^= keys[dest_point][points[dest_point] + 15]
+            hit = points[dest_point] == -s
+            if hit:
+                other = opponent(color)
+                other_bar = bar_point(other)
+                points[dest_point] = 0
+                h ^= keys[other_bar][points[other_bar] + 15]
+                points[other_bar] -= s
+                h ^= keys[other_bar][points[other_bar] + 15]
+                other_dist = distance_to_off(other, dest_point)
+                self.pips[other] += 25 - other_dist
+                if other_dist <= 6:
+                    self.outside[other] += 1
+                self.back[other] = 25
+            points[dest_point] += s
+            h ^= keys[dest_point][points[dest_point] + 15]
+        self.hash = h
+        self.pips[color] -= start_dist - dest_dist
+        if start_dist > 6 >= dest_dist:
+            self.outside[color] -= 1
+        if start_dist == self.back[color] and points[spoint] * s <= 0:
+            self.back[color] = self._find_back(color, start_dist - 1)
+        return hit
+
+    def make_move(self, color, spoint, dest_point):
+        """
+        Plays one checker like apply_move and returns what is needed to take it back.
+
+        The move is assumed to be legal. Searches can make and unmake moves on a single
+        position instead of copying it for every move.
+
+        Parameters:
+            color (str): The color of the checker ("white" or "black").
+            spoint (int): The starting slot index.
+            dest_point (int): The destination point, or OFF (-1) to bear off.
+
+        Returns:
+            tuple: The undo record (color, spoint, dest_point, hit, white back, black back, hash).
+        """
+        record = (color, spoint, dest_point, False, self.back[WHITE], self.back[BLACK], self.hash)
+        if self.apply_move(color, spoint, dest_point):
+            record = record[:3] + (True,) + record[4:]
+        return record
+
+    def unmake_move(self, record):
+        """
+        Takes back a move made with make_move, restoring the exact previous state.
+
+        Moves must be unmade in the reverse order they were made.
+
+        Parameters:
+            record (tuple): The undo record returned by make_move.
+        """
+        color, spoint, dest_point, hit, white_back, black_back, h = record
+        s = sign_of(color)
+        points = self.points
+        start_dist = distance_to_off(color, spoint)
+        if dest_point == OFF:
+            self.off[color] -= 1
+            dest_dist = 0
+        else:
+            dest_dist = distance_to_off(color, dest_point)
+            points[dest_point] -= s
+            if hit:
+                other = opponent(color)
+                points[dest_point] = -s
+                points[bar_point(other)] += s
+                other_dist = distance_to_off(other, dest_point)
+                self.pips[other] -= 25 - other_dist
+                if other_dist <= 6:
+                    self.outside[other] -= 1
+        points[spoint] += s
+        self.pips[color] += start_dist - dest_dist
+        if start_dist > 6 >= dest_dist:
+            self.outside[color] += 1
+        self.back[WHITE] = white_back
+        self.back[BLACK] = black_back
+        self.hash = h
+
+    def winner(self):
+        """
+        Returns the color that has borne off all its checkers, if any.
+
+        Returns:
+            str or None: The winning color, or None while the game is running.
+        """
+        for color in COLORS:
+            if self.off[color] >= CHECKERS_PER_SIDE:
+                return color
+        return None
+
+
+def find_play(position, color, plays, moves):
+    """
+    Finds the legal play made of the given checker moves.
+
+    Legal plays are merged by resulting position, so the recorded moves are played on a
+    copy of the position and matched by where they lead: 24/20 20/14 finds the play kept
+    as 24/18 18/14.
+
+    Parameters:
+        position (engine.Position): The position before the play.
+        color (str): The color to move.
+        plays (list): The legal (moves, child) plays.
+        moves (list): The checker moves as recorded, (start_point, dest_point) pairs or
+            (start_point, dest_point, die) tuples.
+
+    Returns:
+        int or None: The index of the play, None if no legal play matches.
+    """
+    child = position.copy()
+    remaining = [tuple(move[:2]) for move in moves]
+    if any(not 0 <= spoint <= 25 or not (dest == OFF or 1 <= dest <= 24) for (spoint, dest) in remaining):
+        return None
+    # Steps may be written in any order; one whose checker is not there yet waits for the step bringing it.
+    while remaining:
+        ready = [move for move in remaining if child.count(move[0], color)]
+        if not ready:
+            return None
+        child.apply_move(color, *ready[0])
+        remaining.remove(ready[0])
+    key = child.key()
+    for k, (play, result) in enumerate(plays):
+        if result.key() == key:
+            return k
+    return None
+
+
+class Game:
+    """
+    Turn state of a Backgammon game on top of a Position.
+
+    Attributes:
+        position (Position): The current position.
+        current_player (str): The color to move, or None before the opening roll.
+        dice (list): The dice values still to be played this turn.
+        winner (str): The winner's color, if any.
+        rng (random.Random): Random generator behind the default dice source.
+        position_class (type): The board representation, Position or a subclass such as bitboard.BitboardPosition.
+        dice_source (object): Where the rolls come from, see dice.py.
+    """
+
+    def __init__(self, rng=None, position_class=Position, dice_source=None):
+        """
+        Initializes an empty game; call reset() to set up the checkers.
+
+        Parameters:
+            rng (random.Random, optional): Random generator for the dice. Defaults to the random module.
+            position_class (type, optional): The board representation. Defaults to Position.
+            dice_source (object, optional): Dice source such as dice.BlockDice or dice.ReplayDice.
+                Defaults to dice.LiveDice rolling with `rng`.
+        """
+        self.rng = rng if rng is not None else random
+        self.dice_source = dice_source if dice_source is not None else LiveDice(self.rng)
+        self.position_class = position_class
+        self.position = position_class()
+        self.current_player = None
+        self.dice = []
+        self.winner = None
+
+    def reset(self):
+        """
+        Places the checkers in the starting position and clears the turn state.
+        """
+        self.position = self.position_class.initial()
+        self.current_player = None
+        self.dice = []
+        self.winner = None
+
+    def roll_dice_once(self):
+        """
+        Rolls two six-sided dice, taking the next roll of the dice source.
+
+        Returns:
+            tuple: A pair of integers representing the dice results.
+        """
+        return self.dice_source.roll()
+
+    def roll_opening(self):
+        """
+        Decides who starts: both players roll two dice until the sums differ.
+
+        Returns:
+            tuple: The white roll and the black roll that decided the opening.
+        """
+        white_roll = self.roll_dice_once()
+        black_roll = self.roll_dice_once()
+        while sum(white_roll) == sum(black_roll):
+            white_roll = self.roll_dice_once()
+            black_roll = self.roll_dice_once()
+        self.current_player = WHITE if sum(white_roll) > sum(black_roll) else BLACK
+        return white_roll, black_roll
+
+    def roll(self):
+        """
+        Rolls the dice for the current player; doubles are played four times.
+
+        Returns:
+            list: The dice values to be played.
+        """
+        self.dice = dice_for_roll(*self.roll_dice_once())
+        return self.dice
+
+    def legal_plays(self):
+        """
+        Lists the legal full plays for the current player's remaining dice.
+
+        Returns:
+            list: Tuples (moves, position), see Position.legal_plays.
+        """
+        if self.winner or not self.current_player:
+            return []
+        return self.position.legal_plays(self.current_player, self.dice)
+
+    def legal_moves(self):
+        """
+        Lists the single-die moves that start a legal full play for the current player.
+
+        Moves that would leave a die unplayable when another order plays them all are excluded.
+
+        Returns:
+            list: Tuples (start_point, dest_point, die).
+        """
+        if self.winner or not self.current_player:
+            return []
+        return self.position.legal_first_moves(self.current_player, self.dice)
+
+    def has_moves(self):
+        """
+        Checks if the current player can play any of the remaining dice.
+
+        Returns:
+            bool: True if at least one move is legal.
+        """
+        return bool(self.legal_moves())
+
+    def die_for_move(self, spoint, dest_point):
+        """
+        Picks the die a move would consume, preferring the smallest one that keeps the play legal.
+
+        Parameters:
+            spoint (int): The starting slot index.
+            dest_point (int): The destination point, or OFF (-1) to bear off.
+
+        Returns:
+            int or None: The die used, or None if no remaining die makes the move legal.
+        """
+        dice = [die for (start, dest, die) in self.legal_moves() if start == spoint and dest == dest_point]
+        return min(dice) if dice else None
+
+    def play(self, spoint, dest_point, die=None):
+        """
+        Plays one checker for the current player and consumes the matching die.
+
+        Parameters:
+            spoint (int): The starting slot index (the bar slot for re-entry).
+            dest_point (int): The destination point, or OFF (-1) to bear off.
+            die (int, optional): The die to use. Defaults to the smallest die that makes the move legal.
+
+        Returns:
+            int: The die that was used.
+
+        Raises:
+            ValueError: If the move is not legal with the remaining dice.
+        """
+        if die is None:
+            die = self.die_for_move(spoint, dest_point)
+        elif (spoint, dest_point, die) not in self.legal_moves():
+            die = None
+        if die is None:
+            raise ValueError(f"Illegal move {spoint} -> {dest_point} with dice {self.dice}")
+        MOVE_CACHE.discard(MOVE_CACHE.key(self.position, self.current_player, self.dice))
+        self.position.apply_move(self.current_player, spoint, dest_point)
+        self.dice.remove(die)
+        self.winner = self.position.winner()
+        return die
+
+    def make_move(self, spoint, dest_point, die):
+        """
+        Plays one checker for the current player without validation or turn handling.
+
+        Unlike play(), the move is assumed to be legal and the turn never ends, so
+        searches and rollouts can try moves on the game and take them back.
+
+        Parameters:
+            spoint (int): The starting slot index (the bar slot for re-entry).
+            dest_point (int): The destination point, or OFF (-1) to bear off.
+            die (int): The die the move consumes.
+
+        Returns:
+            tuple: The undo record: the position's record, the die, its index in the dice and the previous winner.
+        """
+        index = self.dice.index(die)
+        record = (self.position.make_move(self.current_player, spoint, dest_point), die, index, self.winner)
+        del self.dice[index]
+        self.winner = self.position.winner()
+        return record
+
+    def unmake_move(self, record):
+        """
+        Takes back a move made with make_move: the checkers, any hit or bear-off, the die and the winner.
+
+        Parameters:
+            record (tuple): The undo record returned by make_move.
+        """
+        position_record, die, index, winner = record
+        self.position.unmake_move(position_record)
+        self.dice.insert(index, die)
+        self.winner = winner
+
+    def end_turn(self):
+        """
+        Passes the turn to the other player and discards any unplayed dice.
+        """
+        self.current_player = opponent(self.current_player)
+        self.dice = []
@@ -0,0 +1,422 @@
+"""
+TD(lambda) neural network evaluator in the style of TD-Gammon.
+
+A multilayer perceptron with one sigmoid hidden layer estimates the probability
+that a player wins from the position just after that player has moved, i.e.
+with the opponent on roll. Boards are encoded from the mover's side (black is
+mirrored, see batch.mirror), so one network plays both colors. All candidate
+positions of a roll are encoded and scored in a single matrix multiply.
+
+The weights are trained by TD(lambda) self-play and stored in an .npz file.
+Run `python neural.py train --games N` to train and `python neural.py match`
+to play the trained network against the random and greedy players.
+"""
+
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from batch import mirror
+from engine import BLACK, CHECKERS_PER_SIDE, WHITE, Game, dice_for_roll, opponent
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "neural_weights.npz")
+
+# Four units per point and side, plus bar and off counts for both sides.
+INPUTS = 2 * 24 * 4 + 4
+HIDDEN = 40
+
+# The evaluator returned by NeuralEvaluator.default(), loaded once per process.
+_default = None
+
+
+def encode(boards):
+    """
+    Encodes boards seen from the side that has just moved.
+
+    Each side gets four units per point (at least one, two and three checkers, and
+    half the checkers beyond three), half its bar count and the fraction borne off.
+
+    Parameters:
+        boards (numpy.ndarray): An (N, 26) array of signed counts with the mover as white.
+
+    Returns:
+        numpy.ndarray: The (N, INPUTS) float input matrix.
+    """
+    n = boards.shape[0]
+    features = np.empty((n, INPUTS))
+    for k, counts in enumerate((np.maximum(boards[:, 1:25], 0), np.maximum(-boards[:, 1:25], 0))):
+        units = features[:, k * 96:(k + 1) * 96].reshape(n, 24, 4)
+        units[:, :, 0] = counts >= 1
+        units[:, :, 1] = counts >= 2
+        units[:, :, 2] = counts >= 3
+        units[:, :, 3] = np.maximum(counts - 3, 0) / 2.0
+    mine = np.maximum(boards, 0)
+    theirs = np.maximum(-boards, 0)
+    features[:, 192] = mine[:, 25] / 2.0
+    features[:, 193] = theirs[:, 0] / 2.0
+    features[:, 194] = (CHECKERS_PER_SIDE - mine.sum(axis=1)) / CHECKERS_PER_SIDE
+    features[:, 195] = (CHECKERS_PER_SIDE - theirs.sum(axis=1)) / CHECKERS_PER_SIDE
+    return features
+
+
+def boards_for(positions, color):
+    """
+    Stacks engine positions into a board array seen from `color`'s side.
+
+    Parameters:
+        positions (list): engine.Position objects.
+        color (str): The color that has just moved.
+
+    Returns:
+        numpy.ndarray: The (N, 26) array of signed counts with `color` as white.
+    """
+    boards = np.array([position.points for position in positions], dtype=np.int64)
+    return mirror(boards) if color == BLACK else boards
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def has_trained_weights(path=DEFAULT_PATH):
+    """
+    Checks whether trained weights have been saved.
+
+    Parameters:
+        path (str, optional): The weights file. Defaults to DEFAULT_PATH.
+
+    Returns:
+        bool: True if the weights file exists.
+    """
+    return os.path.exists(path)
+
+
+class NeuralEvaluator:
+    """
+    Win-probability network with one hidden layer.
+
+    Called as evaluator(position, color) it returns a score in [-1, 1], so it can be
+    given to ai.ExpectiminimaxPlayer in place of ai.evaluate.
+
+    Attributes:
+        w1 (numpy.ndarray): Input-to-hidden weights, (INPUTS, hidden).
+        b1 (numpy.ndarray): Hidden biases.
+        w2 (numpy.ndarray): Hidden-to-output weights.
+        b2 (float): Output bias.
+        games_trained (int): Self-play games the weights have been trained on.
+    """
+
+    def __init__(self, hidden=HIDDEN, seed=0):
+        """
+        Initializes small random weights.
+
+        Parameters:
+            hidden (int, optional): Number of hidden units. Defaults to HIDDEN.
+            seed (int, optional): Seed for the initial weights. Defaults to 0.
+        """
+        rng = np.random.default_rng(seed)
+        self.w1 = rng.normal(0.0, 0.1, (INPUTS, hidden))
+        self.b1 = np.zeros(hidden)
+        self.w2 = rng.normal(0.0, 0.1, hidden)
+        self.b2 = 0.0
+        self.games_trained = 0
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        """
+        Loads weights saved with save().
+
+        Parameters:
+            path (str, optional): The .npz file. Defaults to DEFAULT_PATH.
+
+        Returns:
+            NeuralEvaluator: The evaluator with the stored weights.
+        """
+        with np.load(path) as data:
+            evaluator = cls(hidden=data["w1"].shape[1])
+            evaluator.w1 = data["w1"].astype(np.float64)
+            evaluator.b1 = data["b1"].astype(np.float64)
+            evaluator.w2 = data["w2"].astype(np.float64)
+            evaluator.b2 = float(data["b2"])
+            evaluator.games_trained = int(data["games_trained"])
+        return evaluator
+
+    @classmethod
+    def default(cls):
+        """
+        Loads the weights at DEFAULT_PATH, or starts untrained, with a warning, if they have not been trained yet.
+
+        The evaluator is loaded on the first call and shared by every later one in the process,
+        so the file is read and the warning printed only once.
+
+        Returns:
+            NeuralEvaluator: The evaluator.
+        """
+        global _default
+        if _default is None:
+            if has_trained_weights():
+                _default = cls.load(DEFAULT_PATH)
+            else:
+                print(f"Warning: no trained weights at {DEFAULT_PATH}, the neural network plays untrained; "
+                      f"run `python neural.py train` first.")
+                _default = cls()
+        return _default
+
+    def save(self, path=DEFAULT_PATH):
+        """
+        Saves the weights as float32 arrays in a compressed .npz file.
+
+        Parameters:
+            path (str, optional): The file to write. Defaults to DEFAULT_PATH.
+        """
+        np.savez_compressed(path, w1=self.w1.astype(np.float32), b1=self.b1.astype(np.float32),
+                            w2=self.w2.astype(np.float32), b2=np.float32(self.b2),
+                            games_trained=self.games_trained)
+
+    def win_probabilities(self, positions, color):
+        """
+        Scores a batch of positions in one pass.
+
+        Parameters:
+            positions (list): engine.Position objects, each just after `color` moved.
+            color (str): The color that has just moved.
+
+        Returns:
+            numpy.ndarray: The estimated probability that `color` wins from each position.
+        """
+        hidden = _sigmoid(encode(boards_for(positions, color)) @ self.w1 + self.b1)
+        return _sigmoid(hidden @ self.w2 + self.b2)
+
+    def __call__(self, position, color):
+        """
+        Scores one position for the search.
+
+        Parameters:
+            position (engine.Position): The position, just after `color` played.
+            color (str): The player whose point of view is used.
+
+        Returns:
+            float: The score, 1 for a win and -1 for a loss.
+        """
+        winner = position.winner()
+        if winner:
+            return 1.0 if winner == color else -1.0
+        return 2.0 * float(self.win_probabilities([position], color)[0]) - 1.0
+
+    def best_play(self, position, color, dice):
+        """
+        Picks the legal play with the highest estimated win probability.
+
+        Parameters:
+            position (engine.Position): The position to move from.
+            color (str): The color to move.
+            dice (list): The dice to play.
+
+        Returns:
+            tuple: The chosen (moves, resulting position) and its win probability.
+        """
+        plays = position.legal_plays(color, dice)
+        children = [child for (moves, child) in plays]
+        for k, child in enumerate(children):
+            if child.winner() == color:
+                return plays[k], 1.0
+        values = self.win_probabilities(children, color)
+        best = int(np.argmax(values))
+        return plays[best], float(values[best])
+
+    def _gradient(self, position, color):
+        """
+        Computes the win probability of one position and its gradient with respect to every weight.
+
+        Parameters:
+            position (engine.Position): The position, just after `color` moved.
+            color (str): The color that has just moved.
+
+        Returns:
+            tuple: The probability and the gradients (w1, b1, w2, b2).
+        """
+        x = encode(boards_for([position], color))[0]
+        hidden = _sigmoid(x @ self.w1 + self.b1)
+        value = _sigmoid(hidden @ self.w2 + self.b2)
+        d_out = value * (1.0 - value)
+        d_hidden = self.w2 * d_out * hidden * (1.0 - hidden)
+        return value, (np.outer(x, d_hidden), d_hidden, hidden * d_out, d_out)
+
+    def train_game(self, rng, alpha=0.1, lam=0.7):
+        """
+        Plays one self-play game with the current weights and updates them by TD(lambda).
+
+        The values are tracked as white's win probability, so the targets of both
+        players' positions chain into one temporal-difference sequence that ends at
+        the result of the game.
+
+        Parameters:
+            rng (random.Random): Source of the dice.
+            alpha (float, optional): Learning rate. Defaults to 0.1.
+            lam (float, optional): Trace decay lambda. Defaults to 0.7.
+
+        Returns:
+            tuple: The winner's color and the number of turns played.
+        """
+        weights = (self.w1, self.b1, self.w2)
+        traces = [np.zeros_like(w) for w in weights]
+        trace_b2 = 0.0
+        previous = None
+
+        def update(delta):
+            for w, trace in zip(weights, traces):
+                w += alpha * delta * trace
+            self.b2 += alpha * delta * trace_b2
+
+        game = Game(rng)
+        game.reset()
+        game.roll_opening()
+        position = game.position
+        color = game.current_player
+        turns = 0
+        while True:
+            (moves, position), _ = self.best_play(position, color, dice_for_roll(*game.roll_dice_once()))
+            turns += 1
+            if position.winner():
+                break
+            value, gradients = self._gradient(position, color)
+            sign = 1.0 if color == WHITE else -1.0
+            white_value = value if color == WHITE else 1.0 - value
+            if previous is not None:
+                update(white_value - previous)
+            for trace, gradient in zip(traces, gradients[:3]):
+                trace *= lam
+                trace += sign * gradient
+            trace_b2 = lam * trace_b2 + sign * gradients[3]
+            previous = white_value
+            color = opponent(color)
+        outcome = 1.0 if color == WHITE else 0.0
+        if previous is not None:
+            update(outcome - previous)
+        self.games_trained += 1
+        return color, turns
+
+
+class NeuralPlayer:
+    """
+    Plays the legal play the network rates highest, one batched evaluation per move.
+
+    Attributes:
+        evaluator (NeuralEvaluator): The network.
+    """
+
+    name = "neural"
+
+    def __init__(self, evaluator=None):
+        """
+        Initializes the player.
+
+        Parameters:
+            evaluator (NeuralEvaluator, optional): The network. Defaults to NeuralEvaluator.default().
+        """
+        self.evaluator = evaluator if evaluator is not None else NeuralEvaluator.default()
+
+    def choose_play(self, position, color, dice, stop=None):
+        """
+        Picks the play with the highest estimated win probability.
+
+        Parameters:
+            position (engine.Position): The current position.
+            color (str): The color to move.
+            dice (list): The dice to play.
+            stop (threading.Event, optional): Ignored; one evaluation is instant. Defaults to None.
+
+        Returns:
+            tuple: The chosen moves as (start_point, dest_point, die) tuples.
+        """
+        return self.evaluator.best_play(position, color, dice)[0][0]
+
+    def shutdown(self):
+        """
+        Releases the player's resources; there are none to release.
+        """
+
+
+def train(games, path=DEFAULT_PATH, alpha=0.1, lam=0.7, seed=0, resume=True, report_every=100):
+    """
+    Trains the network by self-play and saves it periodically.
+
+    Parameters:
+        games (int): Number of self-play games.
+        path (str, optional): The weights file. Defaults to DEFAULT_PATH.
+        alpha (float, optional): Learning rate. Defaults to 0.1.
+        lam (float, optional): Trace decay lambda. Defaults to 0.7.
+        seed (int, optional): Seed for the dice and new weights. Defaults to 0.
+        resume (bool, optional): Continue from the weights in `path` if it exists. Defaults to True.
+        report_every (int, optional): Games between progress reports and saves. Defaults to 100.
+
+    Returns:
+        NeuralEvaluator: The trained evaluator.
+    """
+    evaluator = NeuralEvaluator.load(path) if resume and has_trained_weights(path) else NeuralEvaluator(seed=seed)
+    rng = random.Random(seed + evaluator.games_trained)
+    start = time.perf_counter()
+    turns = 0
+    for game in range(1, games + 1):
+        turns += evaluator.train_game(rng, alpha, lam)[1]
+        if game % report_every == 0 or game == games:
+            elapsed = time.perf_counter() - start
+            print(f"{evaluator.games_trained} games trained, {game / elapsed:.1f} games/s, "
+                  f"{1000 * elapsed / turns:.2f} ms per move")
+            evaluator.save(path)
+    return evaluator
+
+
+def match(games, path=DEFAULT_PATH, seed=1):
+    """
+    Plays the network against the random and the greedy player, alternating colors, and prints the score.
+
+    Parameters:
+        games (int): Number of games.
+        path (str, optional): The weights file. Defaults to DEFAULT_PATH.
+        seed (int, optional): Seed for the dice. Defaults to 1.
+    """
+    from ai import RandomPlayer
+    from selfplay import GreedyPlayer, play_game
+
+    evaluator = NeuralEvaluator.load(path)
+    rng = random.Random(seed)
+    player = NeuralPlayer(evaluator)
+    wins = {}
+    start = time.perf_counter()
+    for other in (RandomPlayer(rng), GreedyPlayer()):
+        wins[other.name] = 0
+        for game in range(games):
+            neural_color = WHITE if game % 2 == 0 else BLACK
+            players = {neural_color: player, opponent(neural_color): other}
+            wins[other.name] += play_game(players, rng)["winner"] == neural_color
+    elapsed = time.perf_counter() - start
+    for name, won in wins.items():
+        print(f"neural vs {name}: {won}/{games}")
+    print(f"{2 * games / elapsed:.1f} games/s")
+
+
+def main():
+    """
+    Parses the command line and trains or tests the network.
+    """
+    parser = argparse.ArgumentParser(description="Train or test the TD(lambda) network.")
+    parser.add_argument("command", choices=("train", "match"))
+    parser.add_argument("--games", type=int, default=1000, help="games to train or play (default 1000)")
+    parser.add_argument("--weights", default=DEFAULT_PATH, help="weights file (default neural_weights.npz)")
+    parser.add_argument("--alpha", type=float, default=0.1, help="learning rate (default 0.1)")
+    parser.add_argument("--lam", type=float, default=0.7, help="trace decay lambda (default 0.7)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default 0)")
+    parser.add_argument("--fresh", action="store_true", help="start from new weights instead of resuming")
+    args = parser.parse_args()
+    if args.command == "train":
+        train(args.games, args.weights, args.alpha, args.lam, args.seed, resume=not args.fresh)
+    else:
+        match(args.games, args.weights, args.seed)
+
+
+if __name__ == "__main__":
+    main()
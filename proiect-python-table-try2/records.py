@@ -0,0 +1,346 @@
+"""
+Compact position IDs and an append-only game-record file format.
+
+Position IDs follow GNU Backgammon: for each player, the player on roll first,
+the checkers on each of its 24 points from its ace point up, then its bar, are
+written as that many 1 bits followed by a 0 bit. The 80 bits are packed
+least-significant bit first into 10 bytes, and shown as 14 base64 characters;
+the starting position is "4HPwATDgc/ABMA".
+
+A game-record file starts with the header b"BGGR" and a version byte, followed
+by records of a type byte, a little-endian uint16 payload length and the
+payload:
+
+    S  game start    first player (0 white, 1 black)
+    T  turn          position ID before the roll, player, two dice, move count,
+                     then per move start slot, destination (255 for off) and die
+    E  game end      winner (0 white, 1 black, 255 unfinished), gammon flag
+
+Writers only ever append, and readers stream the file record by record, so
+files with millions of turns are never loaded into memory.
+"""
+
+import base64
+import struct
+from collections import namedtuple
+
+from engine import BLACK, CHECKERS_PER_SIDE, OFF, WHITE, Position, opponent
+
+POSITION_ID_BYTES = 10
+MAGIC = b"BGGR"
+VERSION = 1
+RECORD_HEADER = struct.Struct("<cH")
+OFF_CODE = 255
+
+# Shortest valid payload per record type; a turn also needs three bytes per move after its move count.
+MIN_PAYLOAD = {b"T": POSITION_ID_BYTES + 4, b"S": 1, b"E": 2}
+
+COLOR_CODES = {WHITE: 0, BLACK: 1}
+CODE_COLORS = {0: WHITE, 1: BLACK}
+
+GameStart = namedtuple("GameStart", "first")
+Turn = namedtuple("Turn", "position_id color dice moves")
+GameEnd = namedtuple("GameEnd", "winner gammon")
+
+
+def _player_slots(color):
+    """
+    Lists a player's slots in position-ID order: its ace point up to its 24 point, then its bar.
+
+    Parameters:
+        color (str): The player's color.
+
+    Returns:
+        list: 25 slot indices.
+    """
+    if color == WHITE:
+        return list(range(1, 26))
+    return list(range(24, -1, -1))
+
+
+_SLOTS = {color: _player_slots(color) for color in (WHITE, BLACK)}
+
+
+def position_id_bytes(position, color):
+    """
+    Encodes a position as a 10-byte position ID.
+
+    Parameters:
+        position (engine.Position): The position.
+        color (str): The player on roll, whose checkers are encoded first.
+
+    Returns:
+        bytes: The 10-byte key.
+    """
+    key = 0
+    bit = 0
+    for player in (color, opponent(color)):
+        s = 1 if player == WHITE else -1
+        for slot in _SLOTS[player]:
+            n = position.points[slot] * s
+            if n > 0:
+                key |= ((1 << n) - 1) << bit
+                bit += n
+            bit += 1
+    return key.to_bytes(POSITION_ID_BYTES, "little")
+
+
+def position_from_id_bytes(data, color, position_class=Position):
+    """
+    Decodes a 10-byte position ID.
+
+    Parameters:
+        data (bytes): The key written by position_id_bytes.
+        color (str): The player on roll when the ID was made.
+        position_class (type, optional): The board representation to build. Defaults to Position.
+
+    Returns:
+        engine.Position: The position; checkers missing from the board are counted as borne off.
+
+    Raises:
+        ValueError: If the key does not describe a valid position.
+    """
+    key = int.from_bytes(data, "little")
+    points = [0] * 26
+    on_board = {}
+    for player in (color, opponent(color)):
+        s = 1 if player == WHITE else -1
+        total = 0
+        for slot in _SLOTS[player]:
+            n = 0
+            while key & 1:
+                n += 1
+                key >>= 1
+            key >>= 1
+            if n:
+                if points[slot]:
+                    raise ValueError(f"Position ID puts both colors on slot {slot}")
+                points[slot] = s * n
+            total += n
+        if total > CHECKERS_PER_SIDE:
+            raise ValueError(f"Position ID has {total} {player} checkers")
+        on_board[player] = total
+    return position_class(points, {player: CHECKERS_PER_SIDE - n for player, n in on_board.items()})
+
+
+def position_id(position, color):
+    """
+    Returns the 14-character base64 position ID, as shown by GNU Backgammon.
+
+    Parameters:
+        position (engine.Position): The position.
+        color (str): The player on roll.
+
+    Returns:
+        str: The position ID.
+    """
+    return base64.b64encode(position_id_bytes(position, color)).decode("ascii").rstrip("=")
+
+
+def position_from_id(text, color, position_class=Position):
+    """
+    Decodes a 14-character base64 position ID.
+
+    Parameters:
+        text (str): The position ID.
+        color (str): The player on roll.
+        position_class (type, optional): The board representation to build. Defaults to Position.
+
+    Returns:
+        engine.Position: The position.
+    """
+    return position_from_id_bytes(base64.b64decode(text + "=="), color, position_class)
+
+
+def position_to_server_state(position):
+    """
+    Converts a position to the board dict the server sends (see server.ServerInstance.initialize_board).
+
+    Parameters:
+        position (engine.Position): The position; bar and borne-off checkers have no place in that format.
+
+    Returns:
+        dict: 0-based point index to ("White" or "Black", count), for occupied points only.
+    """
+    state = {}
+    for point in range(1, 25):
+        n = position.points[point]
+        if n:
+            state[point - 1] = ("White" if n > 0 else "Black", abs(n))
+    return state
+
+
+def position_from_server_state(state, position_class=Position):
+    """
+    Converts the server's board dict, as built or after a JSON round trip, to a position.
+
+    Parameters:
+        state (dict): 0-based point index (int or str) to (color name, count).
+        position_class (type, optional): The board representation to build. Defaults to Position.
+
+    Returns:
+        engine.Position: The position; checkers not on the board are counted as borne off.
+
+    Raises:
+        ValueError: If an index, color or count is out of range.
+    """
+    points = [0] * 26
+    for index, (name, count) in state.items():
+        index = int(index)
+        if not 0 <= index < 24 or name not in ("White", "Black") or count < 0:
+            raise ValueError(f"Invalid board entry {index}: {name} {count}")
+        points[index + 1] = count if name == "White" else -count
+    on_board = {WHITE: sum(n for n in points if n > 0), BLACK: -sum(n for n in points if n < 0)}
+    if max(on_board.values()) > CHECKERS_PER_SIDE:
+        raise ValueError("More than 15 checkers of one color on the board")
+    return position_class(points, {color: CHECKERS_PER_SIDE - n for color, n in on_board.items()})
+
+
+class GameRecordWriter:
+    """
+    Appends game records to a file.
+
+    Usable as a context manager; records reach the disk at the latest on close().
+
+    Attributes:
+        path (str): The record file.
+    """
+
+    def __init__(self, path):
+        """
+        Opens a record file for appending, writing the header if the file is new.
+
+        Parameters:
+            path (str): The record file.
+        """
+        self.path = path
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC + bytes([VERSION]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def _write(self, kind, payload):
+        self._file.write(RECORD_HEADER.pack(kind, len(payload)) + payload)
+
+    def start_game(self, first):
+        """
+        Records the start of a game.
+
+        Parameters:
+            first (str): The color that moves first.
+        """
+        self._write(b"S", bytes([COLOR_CODES[first]]))
+
+    def turn(self, position, color, roll, moves):
+        """
+        Records one turn.
+
+        Parameters:
+            position (engine.Position): The position before the roll.
+            color (str): The player on roll.
+            roll (tuple): The two dice.
+            moves (tuple): The moves played, as (start_point, dest_point, die) tuples.
+        """
+        payload = bytearray(position_id_bytes(position, color))
+        payload += bytes([COLOR_CODES[color], roll[0], roll[1], len(moves)])
+        for (spoint, dest, die) in moves:
+            payload += bytes([spoint, OFF_CODE if dest == OFF else dest, die])
+        self._write(b"T", bytes(payload))
+
+    def end_game(self, winner, gammon=False):
+        """
+        Records the end of a game.
+
+        Parameters:
+            winner (str): The winner's color, or None if the game was abandoned.
+            gammon (bool, optional): Whether the win was a gammon. Defaults to False.
+        """
+        self._write(b"E", bytes([COLOR_CODES.get(winner, OFF_CODE), int(bool(gammon))]))
+
+    def flush(self):
+        """
+        Pushes buffered records to the operating system.
+        """
+        self._file.flush()
+
+    def close(self):
+        """
+        Flushes and closes the file.
+        """
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_records(path):
+    """
+    Streams the records of a game-record file.
+
+    Parameters:
+        path (str): The record file.
+
+    Yields:
+        GameStart, Turn or GameEnd: The records in file order. Turn.position_id holds the
+        raw 10 bytes; decode it with position_from_id_bytes(turn.position_id, turn.color).
+
+    Raises:
+        ValueError: If the file is not a game-record file, ends inside a record or holds a record
+            too short for its type.
+    """
+    with open(path, "rb") as f:
+        header = f.read(len(MAGIC) + 1)
+        if header[:len(MAGIC)] != MAGIC or header[len(MAGIC):] != bytes([VERSION]):
+            raise ValueError(f"{path} is not a version {VERSION} game-record file")
+        while True:
+            head = f.read(RECORD_HEADER.size)
+            if not head:
+                return
+            if len(head) < RECORD_HEADER.size:
+                raise ValueError(f"{path} ends inside a record")
+            kind, length = RECORD_HEADER.unpack(head)
+            payload = f.read(length)
+            if len(payload) < length:
+                raise ValueError(f"{path} ends inside a record")
+            if len(payload) < MIN_PAYLOAD.get(kind, 0) or (
+                    kind == b"T" and len(payload) < MIN_PAYLOAD[kind] + 3 * payload[POSITION_ID_BYTES + 3]):
+                raise ValueError(f"{path} has a truncated {kind.decode()} record")
+            if kind == b"T":
+                color = CODE_COLORS[payload[10]]
+                moves = tuple((payload[k], OFF if payload[k + 1] == OFF_CODE else payload[k + 1], payload[k + 2])
+                              for k in range(14, 14 + 3 * payload[13], 3))
+                yield Turn(payload[:POSITION_ID_BYTES], color, (payload[11], payload[12]), moves)
+            elif kind == b"S":
+                yield GameStart(CODE_COLORS[payload[0]])
+            elif kind == b"E":
+                yield GameEnd(CODE_COLORS.get(payload[0]), bool(payload[1]))
+            # Unknown record types are skipped, so newer writers stay readable.
+
+
+def read_games(path):
+    """
+    Streams the games of a game-record file.
+
+    Parameters:
+        path (str): The record file.
+
+    Yields:
+        tuple: The GameStart, the list of Turns and the GameEnd (None if the file stops mid-game) of each game.
+    """
+    start = None
+    turns = []
+    for record in read_records(path):
+        if isinstance(record, GameStart):
+            if start is not None:
+                yield start, turns, None
+            start, turns = record, []
+        elif isinstance(record, Turn):
+            turns.append(record)
+        elif start is not None:
+            yield start, turns, record
+            start, turns = None, []
+    if start is not None:
+        yield start, turns, None
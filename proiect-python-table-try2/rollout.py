@@ -0,0 +1,358 @@
+"""
+Monte Carlo rollout evaluation of candidate plays, spread over a process pool.
+
+Each candidate play is scored by playing many games from its resulting position
+to the end with a fast greedy policy. Rollout number i uses the same dice
+sequence for every candidate, so the differences between candidates are not
+drowned in dice luck.
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from dice import BlockDice
+from engine import WHITE, Position, dice_for_roll, opponent
+
+# Games handed to a worker at once; larger chunks mean less pickling per game. A chunk rolls
+# out a block of seeds for a slice of the candidates, so its size does not grow with their number.
+CHUNK_GAMES = 16
+
+# How often a wait for results checks whether the caller asked to stop.
+ABORT_POLL_SECONDS = 0.1
+
+# A game that has not finished after this many turns is counted as unfinished.
+MAX_TURNS = 1000
+
+# Rolls pre-generated per rollout; a typical game needs fewer, longer ones generate more.
+ROLLOUT_ROLLS = 128
+
+
+def quick_score(position, color):
+    """
+    Cheap position score used by the rollout policy.
+
+    Parameters:
+        position (engine.Position): The position to score.
+        color (str): The player whose point of view is used.
+
+    Returns:
+        float: Higher is better for `color`.
+    """
+    other = opponent(color)
+    score = position.pips[other] - position.pips[color] + 8 * position.bar(other)
+    s = 1 if color == WHITE else -1
+    for point in range(1, 25):
+        n = position.points[point] * s
+        if n == 1:
+            score -= 3
+        elif n >= 2:
+            score += 2
+    return score
+
+
+def greedy_play(position, color, dice):
+    """
+    Picks the play whose resulting position has the best quick_score.
+
+    Parameters:
+        position (engine.Position): The position to move from.
+        color (str): The color to move.
+        dice (list): The dice to play.
+
+    Returns:
+        engine.Position: The position after the chosen play.
+    """
+    best = None
+    best_score = None
+    for (moves, child) in position.legal_plays(color, dice):
+        score = quick_score(child, color)
+        if best_score is None or score > best_score:
+            best = child
+            best_score = score
+    return best
+
+
+def play_out(position, color, dice_source):
+    """
+    Plays a game to the end with the greedy policy on both sides.
+
+    Parameters:
+        position (engine.Position): The starting position; it is modified in place.
+        color (str): The color to roll first.
+        dice_source (object): Source of the dice, see dice.py.
+
+    Returns:
+        tuple: The winner's color (None if the game did not finish) and whether it was a gammon.
+    """
+    for _ in range(MAX_TURNS):
+        winner = position.winner()
+        if winner:
+            return winner, position.off[opponent(winner)] == 0
+        dice = dice_for_roll(*dice_source.roll())
+        position = greedy_play(position, color, dice)
+        color = opponent(color)
+    return None, False
+
+
+# The evaluation the worker processes are running chunks for, shared with the parent
+# process; see RolloutPlayer._pool.
+_generation = None
+
+
+def _init_worker(generation):
+    """
+    Keeps the shared evaluation counter in a worker process.
+
+    Parameters:
+        generation (multiprocessing.Value): The counter, see RolloutPlayer.
+    """
+    global _generation
+    _generation = generation
+
+
+def rollout_chunk(candidates, color, seeds, deadline=None, generation=None):
+    """
+    Rolls out every candidate once per seed; runs inside a worker process.
+
+    The chunk stops early, keeping the games already played, once the wall-clock deadline
+    has passed or the evaluation it belongs to is over.
+
+    Parameters:
+        candidates (list): The positions after each candidate play.
+        color (str): The color that made the play.
+        seeds (list): One dice seed per rollout, shared by all candidates.
+        deadline (float, optional): time.time() after which no game is started. Defaults to none.
+        generation (int, optional): The evaluation the chunk belongs to. Defaults to none.
+
+    Returns:
+        list: Per candidate, [wins, gammon wins, losses, gammon losses, games].
+    """
+    totals = [[0, 0, 0, 0, 0] for _ in candidates]
+    for seed in seeds:
+        dice_source = BlockDice(seed, ROLLOUT_ROLLS)
+        for (total, candidate) in zip(totals, candidates):
+            if deadline is not None and time.time() >= deadline:
+                return totals
+            if generation is not None and _generation is not None and _generation.value != generation:
+                return totals
+            dice_source.rewind()
+            winner, gammon = play_out(candidate.copy(), opponent(color), dice_source)
+            if winner == color:
+                total[0] += 1
+                total[1] += gammon
+            elif winner is not None:
+                total[2] += 1
+                total[3] += gammon
+            total[4] += 1
+    return totals
+
+
+class RolloutPlayer:
+    """
+    Chooses the play with the best rollout equity.
+
+    Rolling out stops at the rollout count or at the time budget, whichever comes first.
+    Work is handed out in chunks of about CHUNK_GAMES games, each a block of seeds for a
+    slice of the candidates, and chunks still running when the evaluation ends stop at
+    their next game.
+
+    Attributes:
+        rollouts (int): Rollouts per candidate, or None for no limit.
+        time_budget_ms (int): Wall-clock budget per move, or None for no limit.
+        workers (int): Number of worker processes.
+        seed (int): Base seed of the shared dice sequences.
+        last_results (list): Per-candidate statistics of the last decision, see evaluate_plays.
+    """
+
+    name = "rollout"
+
+    def __init__(self, rollouts=144, time_budget_ms=5000, workers=None, seed=None):
+        """
+        Initializes the player; the process pool is started on first use.
+
+        Parameters:
+            rollouts (int, optional): Rollouts per candidate, None for no limit. Defaults to 144.
+            time_budget_ms (int, optional): Wall-clock budget per move, None for no limit. Defaults to 5000.
+            workers (int, optional): Worker processes. Defaults to the number of CPUs.
+            seed (int, optional): Base dice seed. Defaults to a random one.
+        """
+        self.rollouts = rollouts
+        self.time_budget_ms = time_budget_ms
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.last_results = []
+        self._executor = None
+        # Moved on whenever an evaluation ends, which tells its running chunks to stop.
+        self._generation = multiprocessing.Value("q", 0, lock=False)
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self._generation,))
+        return self._executor
+
+    def shutdown(self):
+        """
+        Stops the worker processes without waiting for them; running chunks stop at their next game.
+        """
+        if self._executor is not None:
+            self._generation.value += 1
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def evaluate_plays(self, position, color, dice, stop=None):
+        """
+        Rolls out every legal play and estimates its outcome probabilities.
+
+        Parameters:
+            position (engine.Position): The current position.
+            color (str): The color to move.
+            dice (list): The dice to play.
+            stop (threading.Event, optional): Set from another thread to return early with the
+                rollouts finished so far. Defaults to None.
+
+        Returns:
+            list: One dict per candidate with the keys "moves", "games", "win", "gammon",
+            "lose_gammon" (probabilities) and "equity", best equity first. If the budget ran
+            out before every candidate finished a rollout, they are ordered by quick_score
+            instead, and the equities only describe the games that did finish.
+        """
+        plays = position.legal_plays(color, dice)
+        candidates = [child for (moves, child) in plays]
+        totals = [[0, 0, 0, 0, 0] for _ in plays]
+        next_rollout = 0
+
+        if len(plays) > 1:
+            deadline = None
+            wall_deadline = None
+            if self.time_budget_ms is not None:
+                deadline = time.perf_counter() + self.time_budget_ms / 1000.0
+                wall_deadline = time.time() + self.time_budget_ms / 1000.0
+            generation = self._generation.value
+            seeds_per_chunk = max(1, CHUNK_GAMES // len(candidates))
+            slice_size = max(1, CHUNK_GAMES // seeds_per_chunk)
+            pool = self._pool()
+            pending = {}
+
+            def chunks():
+                # Every slice of the candidates gets a seed block before the next block starts,
+                # so all candidates have about as many games whenever rolling out stops.
+                nonlocal next_rollout
+                while self.rollouts is None or next_rollout < self.rollouts:
+                    size = seeds_per_chunk
+                    if self.rollouts is not None:
+                        size = min(size, self.rollouts - next_rollout)
+                    seeds = [self.seed + next_rollout + i for i in range(size)]
+                    next_rollout += size
+                    for first in range(0, len(candidates), slice_size):
+                        yield first, candidates[first:first + slice_size], seeds
+
+            work = chunks()
+
+            def submit():
+                item = next(work, None)
+                if item is None:
+                    return False
+                first, chunk, seeds = item
+                pending[pool.submit(rollout_chunk, chunk, color, seeds, wall_deadline, generation)] = first
+                return True
+
+            def more_wanted():
+                if stop is not None and stop.is_set():
+                    return False
+                return deadline is None or time.perf_counter() < deadline
+
+            while more_wanted() and len(pending) < 2 * self.workers and submit():
+                pass
+            try:
+                while pending:
+                    timeout = ABORT_POLL_SECONDS
+                    if deadline is not None:
+                        timeout = min(timeout, max(0.0, deadline - time.perf_counter()))
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    expired = deadline is not None and time.perf_counter() >= deadline
+                    if not done and (expired or (stop is not None and stop.is_set())):
+                        break
+                    for future in done:
+                        first = pending.pop(future)
+                        for (total, chunk_total) in zip(totals[first:], future.result()):
+                            for k in range(5):
+                                total[k] += chunk_total[k]
+                        if more_wanted():
+                            submit()
+            finally:
+                # Chunks still queued are dropped; running ones see the new generation and stop.
+                self._generation.value += 1
+                for future in pending:
+                    future.cancel()
+
+        results = []
+        for ((moves, child), (wins, gammons, losses, lose_gammons, games)) in zip(plays, totals):
+            n = max(games, 1)
+            result = {
+                "moves": moves,
+                "games": games,
+                "win": wins / n,
+                "gammon": gammons / n,
+                "lose_gammon": lose_gammons / n,
+            }
+            result["equity"] = (wins - losses + gammons - lose_gammons) / n
+            results.append(result)
+        if all(result["games"] for result in results):
+            results.sort(key=lambda result: result["equity"], reverse=True)
+        else:
+            # Without a rollout for every candidate the equities cannot be compared.
+            order = sorted(range(len(results)), key=lambda k: quick_score(candidates[k], color), reverse=True)
+            results = [results[k] for k in order]
+        self.last_results = results
+        self.seed += next_rollout
+        return results
+
+    def choose_play(self, position, color, dice, stop=None):
+        """
+        Picks the play with the highest rollout equity.
+
+        Parameters:
+            position (engine.Position): The current position.
+            color (str): The color to move.
+            dice (list): The dice to play.
+            stop (threading.Event, optional): Set from another thread to choose from the
+                rollouts finished so far. Defaults to None.
+
+        Returns:
+            tuple: The chosen moves as (start_point, dest_point, die) tuples.
+        """
+        return self.evaluate_plays(position, color, dice, stop)[0]["moves"]
+
+
+def main(rollouts=96):
+    """
+    Rolls out the opening 3-1 for white with 1, 2, 4... workers up to the CPU count and prints the speed.
+
+    Parameters:
+        rollouts (int, optional): Rollouts per candidate. Defaults to 96.
+    """
+    position = Position.initial()
+    workers = 1
+    while True:
+        player = RolloutPlayer(rollouts=rollouts, time_budget_ms=None, workers=workers, seed=0)
+        start = time.perf_counter()
+        results = player.evaluate_plays(position, WHITE, [3, 1])
+        elapsed = time.perf_counter() - start
+        player.shutdown()
+        games = sum(result["games"] for result in results)
+        print(f"{workers} workers: {games / elapsed:,.0f} games/s")
+        if workers >= (os.cpu_count() or 1):
+            break
+        workers = min(workers * 2, os.cpu_count() or 1)
+    for result in results[:3]:
+        print(f"{result['moves']}: win {result['win']:.3f} gammon {result['gammon']:.3f} "
+              f"lose gammon {result['lose_gammon']:.3f} equity {result['equity']:+.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 96)
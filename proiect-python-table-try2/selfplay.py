@@ -0,0 +1,330 @@
+"""
+Headless self-play: plays games between computer policies without opening a window.
+
+Games are spread over worker processes. Game i uses the dice seed `seed + i`, so
+a run is reproducible whatever the number of workers; by default the dice come
+pre-generated from dice.BlockDice, --dice live rolls them turn by turn, and
+--replay plays the dice of each game of a game-record file again. The summary reports the
+throughput, game length, win and gammon rates and the time spent in each stage
+of a turn; --output additionally writes one JSON line per game with its rolls
+and plays, and --record appends the games to a binary game-record file (see
+records.py).
+
+Example:
+    python selfplay.py --games 1000 --white random --black greedy --workers 4
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ai import ExpectiminimaxPlayer, RandomPlayer
+from bitboard import BitboardPosition
+from dice import BlockDice, replay_games
+from engine import BLACK, COLORS, MOVE_CACHE, WHITE, Game, Position, opponent
+from neural import NeuralEvaluator, NeuralPlayer
+from records import GameRecordWriter
+from rollout import quick_score
+
+STAGES = ("roll", "choose", "apply")
+
+# Games handed to a worker at once.
+CHUNK_SIZE = 16
+
+# A game that has not finished after this many turns is counted as unfinished.
+MAX_TURNS = 1000
+
+# Rolls pre-generated per game with --dice block; longer games generate more.
+GAME_ROLLS = 256
+
+# Dice sources selectable on the command line.
+DICE = ("block", "live")
+
+
+class GreedyPlayer:
+    """
+    Plays the legal play with the best rollout.quick_score, the policy used inside rollouts.
+    """
+
+    name = "greedy"
+
+    def __init__(self, rng=None):
+        """
+        Initializes the player.
+
+        Parameters:
+            rng (random.Random, optional): Unused; accepted so every policy is built the same way.
+        """
+
+    def choose_play(self, position, color, dice, stop=None):
+        """
+        Picks the play whose resulting position scores best.
+
+        Parameters:
+            position (engine.Position): The current position.
+            color (str): The color to move.
+            dice (list): The dice to play.
+            stop (threading.Event, optional): Ignored; the greedy choice is instant. Defaults to None.
+
+        Returns:
+            tuple: The chosen moves as (start_point, dest_point, die) tuples.
+        """
+        return max(position.legal_plays(color, dice), key=lambda play: quick_score(play[1], color))[0]
+
+    def shutdown(self):
+        """
+        Releases the player's resources; there are none to release.
+        """
+
+
+def _expectiminimax(rng):
+    return ExpectiminimaxPlayer(time_budget_ms=100, max_depth=1, table_mb=4)
+
+
+def _neural(rng):
+    return NeuralPlayer(NeuralEvaluator.default())
+
+
+# Board representations, by name.
+BOARDS = {"list": Position, "bitboard": BitboardPosition}
+
+# Policies that can run inside a worker process, by name. Each factory takes the game's random generator.
+POLICIES = {
+    RandomPlayer.name: RandomPlayer,
+    GreedyPlayer.name: GreedyPlayer,
+    ExpectiminimaxPlayer.name: _expectiminimax,
+    NeuralPlayer.name: _neural,
+}
+
+
+def play_game(players, rng, record=False, position_class=Position, dice_source=None):
+    """
+    Plays one game to the end.
+
+    Parameters:
+        players (dict): The player of each color.
+        rng (random.Random): Source of the dice unless a dice source is given.
+        record (bool, optional): Whether to keep the rolls and plays. Defaults to False.
+        position_class (type, optional): The board representation. Defaults to engine.Position.
+        dice_source (object, optional): Source of the dice, see dice.py. Defaults to rolling with `rng`.
+
+    Returns:
+        dict: The game's "winner" (None if unfinished), "gammon", "turns" and per-stage
+        "timings" in seconds, plus "first" and "turns_played" when recorded.
+    """
+    timings = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter
+    game = Game(rng, position_class, dice_source)
+    game.reset()
+    game.roll_opening()
+    result = {"first": game.current_player, "turns_played": []} if record else {}
+    turns = 0
+    while not game.winner and turns < MAX_TURNS:
+        color = game.current_player
+        t0 = clock()
+        dice = list(game.roll())
+        t1 = clock()
+        play = players[color].choose_play(game.position, color, game.dice)
+        t2 = clock()
+        for (spoint, dest_point, die) in play:
+            game.play(spoint, dest_point, die)
+        game.end_turn()
+        t3 = clock()
+        timings["roll"] += t1 - t0
+        timings["choose"] += t2 - t1
+        timings["apply"] += t3 - t2
+        if record:
+            result["turns_played"].append({"color": color, "dice": dice, "play": [list(move) for move in play]})
+        turns += 1
+    winner = game.winner
+    result.update({
+        "winner": winner,
+        "gammon": bool(winner) and game.position.off[opponent(winner)] == 0,
+        "turns": turns,
+        "timings": timings,
+    })
+    return result
+
+
+def play_games(white, black, seeds, record=False, board="list", dice="block", replays=None):
+    """
+    Plays a batch of games; runs inside a worker process.
+
+    Parameters:
+        white (str): Policy name for white, see POLICIES.
+        black (str): Policy name for black.
+        seeds (list): One dice seed per game.
+        record (bool, optional): Whether to keep the rolls and plays. Defaults to False.
+        board (str, optional): Board representation, see BOARDS. Defaults to "list".
+        dice (str, optional): Dice source, see DICE. Defaults to "block".
+        replays (list, optional): One dice.ReplayDice per game, used instead of `dice`.
+
+    Returns:
+        list: The play_game result of every game, with its "seed" and the legal-move cache
+        "cache_hits" and "cache_misses" added.
+    """
+    results = []
+    for k, seed in enumerate(seeds):
+        rng = random.Random(seed)
+        players = {WHITE: POLICIES[white](random.Random(rng.getrandbits(32))),
+                   BLACK: POLICIES[black](random.Random(rng.getrandbits(32)))}
+        if replays is not None:
+            dice_source = replays[k]
+        elif dice == "block":
+            dice_source = BlockDice(seed, GAME_ROLLS)
+        else:
+            dice_source = None
+        hits, misses = MOVE_CACHE.hits, MOVE_CACHE.misses
+        result = play_game(players, rng, record, BOARDS[board], dice_source)
+        result["seed"] = seed
+        result["cache_hits"] = MOVE_CACHE.hits - hits
+        result["cache_misses"] = MOVE_CACHE.misses - misses
+        for player in players.values():
+            player.shutdown()
+        results.append(result)
+    return results
+
+
+def summarize(results, elapsed):
+    """
+    Aggregates game results into the report figures.
+
+    Parameters:
+        results (list): play_game results.
+        elapsed (float): Wall-clock time of the run in seconds.
+
+    Returns:
+        dict: Games, games per second, average turns, the legal-move cache hit rate, win and
+        gammon rates per color and the average time per turn of each stage in microseconds.
+    """
+    games = len(results)
+    turns = sum(result["turns"] for result in results)
+    summary = {
+        "games": games,
+        "seconds": elapsed,
+        "games_per_second": games / elapsed if elapsed else 0.0,
+        "average_turns": turns / games if games else 0.0,
+        "unfinished": sum(1 for result in results if result["winner"] is None),
+    }
+    lookups = sum(result["cache_hits"] + result["cache_misses"] for result in results)
+    summary["move_cache_hit_rate"] = sum(result["cache_hits"] for result in results) / lookups if lookups else 0.0
+    for color in COLORS:
+        won = [result for result in results if result["winner"] == color]
+        summary[f"{color}_win_rate"] = len(won) / games if games else 0.0
+        summary[f"{color}_gammon_rate"] = sum(result["gammon"] for result in won) / games if games else 0.0
+    for stage in STAGES:
+        total = sum(result["timings"][stage] for result in results)
+        summary[f"{stage}_us_per_turn"] = 1e6 * total / turns if turns else 0.0
+    return summary
+
+
+def write_record(writer, result):
+    """
+    Appends a recorded play_game result to a game-record file.
+
+    Parameters:
+        writer (records.GameRecordWriter): The open record file.
+        result (dict): A play_game result made with record=True.
+    """
+    position = Position.initial()
+    writer.start_game(result["first"])
+    for turn in result["turns_played"]:
+        color = turn["color"]
+        moves = [tuple(move) for move in turn["play"]]
+        writer.turn(position, color, turn["dice"], moves)
+        for (spoint, dest_point, die) in moves:
+            position.apply_move(color, spoint, dest_point)
+    writer.end_game(result["winner"], result["gammon"])
+
+
+def run(games, white="random", black="random", workers=None, seed=0, output=None, board="list", record_path=None,
+        dice="block", replay=None):
+    """
+    Plays a series of games over a process pool and summarizes them.
+
+    Parameters:
+        games (int): Number of games.
+        white (str, optional): Policy for white. Defaults to "random".
+        black (str, optional): Policy for black. Defaults to "random".
+        workers (int, optional): Worker processes; 1 plays in this process. Defaults to the number of CPUs.
+        seed (int, optional): Seed of the first game. Defaults to 0.
+        output (str, optional): JSON-lines file receiving every game's rolls and plays.
+        board (str, optional): Board representation, see BOARDS. Defaults to "list".
+        record_path (str, optional): Game-record file the games are appended to.
+        dice (str, optional): Dice source, see DICE. Defaults to "block".
+        replay (str, optional): Game-record file whose dice are played again, one game per recorded
+            game, instead of `games` games with `dice`; rolls past a recorded game's end come from
+            dice.BlockDice.
+
+    Returns:
+        dict: See summarize.
+    """
+    workers = workers or os.cpu_count() or 1
+    record = output is not None or record_path is not None
+    replays = None
+    if replay is not None:
+        replays = list(replay_games(replay, lambda number: BlockDice(seed + number, GAME_ROLLS)))
+        games = len(replays)
+    seeds = list(range(seed, seed + games))
+    chunks = [seeds[i:i + CHUNK_SIZE] for i in range(0, games, CHUNK_SIZE)]
+    replay_chunks = [replays[i:i + CHUNK_SIZE] if replays is not None else None for i in range(0, games, CHUNK_SIZE)]
+    start = time.perf_counter()
+    if workers == 1:
+        batches = [play_games(white, black, chunk, record, board, dice, replay_chunk)
+                   for chunk, replay_chunk in zip(chunks, replay_chunks)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batches = list(pool.map(play_games, [white] * len(chunks), [black] * len(chunks),
+                                    chunks, [record] * len(chunks), [board] * len(chunks),
+                                    [dice] * len(chunks), replay_chunks))
+    elapsed = time.perf_counter() - start
+    results = [result for batch in batches for result in batch]
+    if output is not None:
+        with open(output, "w") as f:
+            for result in results:
+                f.write(json.dumps({key: result[key] for key in
+                                    ("seed", "first", "winner", "gammon", "turns_played")}) + "\n")
+    if record_path is not None:
+        with GameRecordWriter(record_path) as writer:
+            for result in results:
+                write_record(writer, result)
+    return summarize(results, elapsed)
+
+
+def main():
+    """
+    Parses the command line, runs the games and prints the summary.
+    """
+    parser = argparse.ArgumentParser(description="Play Backgammon games between computer policies.")
+    parser.add_argument("--games", type=int, default=100, help="number of games (default 100)")
+    parser.add_argument("--white", choices=sorted(POLICIES), default="random", help="policy for white")
+    parser.add_argument("--black", choices=sorted(POLICIES), default="random", help="policy for black")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0, help="dice seed of the first game (default 0)")
+    parser.add_argument("--output", help="write every game as a JSON line to this file")
+    parser.add_argument("--record", help="append every game to this game-record file")
+    parser.add_argument("--board", choices=sorted(BOARDS), default="list", help="board representation (default list)")
+    parser.add_argument("--dice", choices=DICE, default="block", help="dice source (default block)")
+    parser.add_argument("--replay", help="play the dice of every game of this game-record file again")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = run(args.games, args.white, args.black, args.workers, args.seed, args.output, args.board, args.record,
+                  args.dice, args.replay)
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"{summary['games']} games in {summary['seconds']:.2f} s: {summary['games_per_second']:,.1f} games/s, "
+          f"{summary['average_turns']:.1f} turns per game, {summary['unfinished']} unfinished, "
+          f"move cache hit rate {summary['move_cache_hit_rate']:.2f}")
+    for color in COLORS:
+        print(f"{color} ({getattr(args, color.lower())}): win {summary[f'{color}_win_rate']:.3f} "
+              f"gammon {summary[f'{color}_gammon_rate']:.3f}")
+    print("per turn: " + ", ".join(f"{stage} {summary[f'{stage}_us_per_turn']:.1f} us" for stage in STAGES))
+
+
+if __name__ == "__main__":
+    main()
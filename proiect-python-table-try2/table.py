@@ -1,7 +1,41 @@
-import pygame
-import random
+import argparse
 import time
 
+import pygame
+
+from ai import ENGINES, ExpectiminimaxPlayer
+from ai_worker import AIWorker
+from book import BookPlayer
+from engine import BLACK, CHECKERS_PER_SIDE, OFF, WHITE, Game, bar_point
+from neural import NeuralPlayer, has_trained_weights
+from tracing import TRACER, span
+
+# Most frames drawn per second, and the wake-up interval of the loop while something animates.
+FPS = 60
+FRAME_MS = 1000 // FPS
+
+# Pause after the AI rolls, and duration of each AI checker slide, in milliseconds.
+AI_ROLL_PAUSE_MS = 500
+AI_MOVE_MS = 500
+
+# Height of the strip at the top holding the buttons and texts, and of the overlay strip at the bottom.
+UI_STRIP_HEIGHT = 125
+OVERLAY_HEIGHT = 35
+
+# Above this share of the window, a frame is redrawn whole and flipped instead of updated by rectangles.
+FULL_REDRAW_FRACTION = 0.5
+
+# Dirty rectangles start on a multiple of this many pixels: SDL copies rows starting on a 64-byte boundary
+# (16 pixels at 32 bits) an order of magnitude faster than unaligned ones.
+BLIT_ALIGN = 16
+
+# Rendered texts kept before the cache starts over.
+TEXT_CACHE_ENTRIES = 256
+
+# Distance from a checker sprite's top-left corner to the center of its circle; the sprite is
+# one pixel wider than the circle on every side.
+SPRITE_OFFSET = 16
+
 
 def color_map(col):
     """
@@ -24,6 +58,9 @@ class GUI:
     """
     Represents the graphical user interface for the Backgammon game.
 
+    The rules and the game state live in an engine.Game; the GUI only keeps
+    view state (hover, selection, highlighted destinations) on top of it.
+
     Attributes:
         width (int): Width of the game window.
         height (int): Height of the game window.
@@ -32,24 +69,39 @@ class GUI:
         running (bool): Flag to control the main loop.
         screen (pygame.Surface): The main display surface.
         background_color (tuple): RGB color for the background.
-        white_off_count (int): Number of white pieces borne off.
-        black_off_count (int): Number of black pieces borne off.
         bearing_off_coords (dict): Coordinates for bearing off areas.
         font (pygame.font.Font): Font object for rendering text.
         buttons (dict): Dictionary of button rectangles.
         dice_result (str): String representation of dice results.
-        board (dict): Dictionary representing the game board.
+        game (engine.Game): The headless game holding the position, dice and current player.
         game_started (bool): Flag indicating if the game has started.
-        current_player (str): The current player's color.
         current_player_thrown_dice (bool): Flag indicating if the current player has thrown dice.
-        current_dice (list): List of current dice values.
         current_player_can_win (bool): Flag indicating if the current player can win.
         possible_moves (list): List of possible moves.
         selected_piece (tuple): Currently selected piece (point, index).
-        bar (dict): Dictionary tracking pieces on the bar.
+        hovered_piece (tuple): Piece under the mouse (point, index), if it belongs to the current player.
         point_coords (dict): Coordinates for each point on the board.
-        winner (str): The winner's color, if any.
         vs_ai (bool): Flag indicating if the game is against AI.
+        ai_engine (str): Name of the AI engine selected with the engine button, a key of ai.ENGINES.
+        ai_player (book.BookPlayer): The AI player choosing black's plays, answering from the opening book when it can.
+        ai_worker (ai_worker.AIWorker): Background thread the AI player thinks on.
+        ai_thinking (bool): True while the AI is choosing its play.
+        ai_pending_moves (list): Moves of the chosen AI play that have not been shown yet.
+        ai_animation (tuple): The AI move being animated (spoint, dest_point, die, start_ms), if any.
+        ai_wait_until (int): Tick count (ms) before which the AI takes no further step.
+        show_overlay (bool): Whether the frame time overlay is drawn; F3 toggles it.
+        text_cache (dict): Rendered text surfaces by (text, color).
+        board_layer (pygame.Surface): The static board drawn once off-screen and copied every frame, None until first drawn.
+        regions (dict): Screen rectangles that are redrawn independently: the twelve point columns, the bar,
+            the two off trays, the UI strip and the overlay strip.
+        region_state (dict): What each region showed when it was last drawn, see region_signatures.
+        full_redraw (bool): Whether the next frame must be drawn whole and flipped.
+        frame_ms (int): Tick count (ms) the frame being drawn shows; animations are drawn at this time.
+        animation_rect (pygame.Rect): Where the AI animation checker was last drawn, if anywhere.
+        sprites (dict): Pre-rendered checker and move hint surfaces, see render_sprites.
+        stack_slots (dict): Point index to the sprite blit positions of its stack, bottom checker first.
+        hit_points (list): Per screen x, the points whose checkers can cover that x, see calculate_hit_index.
+        nearest_points (list): Per screen x, the (top, bottom) pair of points nearest to it.
     """
 
     def __init__(self, width, height, caption, background_color=(128, 128, 128)):
@@ -68,14 +120,12 @@ class GUI:
         self.stack_offset = 30
         self.clock = pygame.time.Clock()
         self.running = True
-        self.screen = pygame.display.set_mode((self.width, self.height))
+        self.screen = pygame.display.set_mode((self.width, self.height), pygame.RESIZABLE)
         pygame.display.set_caption(caption)
+        self.sprites = self.render_sprites()
         self.background_color = background_color
         self.screen.fill(self.background_color)
 
-        self.white_off_count = 0
-        self.black_off_count = 0
-
         self.bearing_off_coords = {
             "white": (-550, 0),
             "black": (550, 0)
@@ -88,25 +138,78 @@ class GUI:
             "ai": pygame.Rect(50, 10, 130, 30),
             "friend": pygame.Rect(190, 10, 170, 30),
             "dice": pygame.Rect(370, 10, 120, 30),
+            "engine": pygame.Rect(960, 10, 230, 30),
         }
         self.dice_result = ""
 
-        self.board = {i: [] for i in range(1, 25)}
+        self.game = Game()
         self.game_started = False
-        self.current_player = None
         self.current_player_thrown_dice = False
-        self.current_dice = []
         self.current_player_can_win = False
         self.possible_moves = []
         self.selected_piece = None
+        self.hovered_piece = None
 
-        self.bar = {"white": 0, "black": 0}
         self.point_coords = {}
         self.calculate_point_positions()
 
-        self.winner = None
-
         self.vs_ai = False
+        self.ai_engine = ExpectiminimaxPlayer.name
+        self.ai_player = BookPlayer(ENGINES[self.ai_engine]())
+        self.ai_worker = AIWorker()
+        self.ai_thinking = False
+        self.ai_pending_moves = []
+        self.ai_animation = None
+        self.ai_wait_until = 0
+        self.show_overlay = False
+        self.text_cache = {}
+        self.board_layer = None
+        self.region_state = {}
+        self.full_redraw = True
+        self.animation_rect = None
+        self.frame_ms = 0
+
+    @property
+    def board(self):
+        """
+        engine.Position: The position currently shown on the board.
+        """
+        return self.game.position
+
+    @property
+    def current_player(self):
+        """
+        str: The color whose turn it is.
+        """
+        return self.game.current_player
+
+    @property
+    def current_dice(self):
+        """
+        list: The dice values still to be played this turn.
+        """
+        return self.game.dice
+
+    @property
+    def winner(self):
+        """
+        str: The winner's color, if any.
+        """
+        return self.game.winner
+
+    @property
+    def white_off_count(self):
+        """
+        int: Number of white pieces borne off.
+        """
+        return self.game.position.off[WHITE]
+
+    @property
+    def black_off_count(self):
+        """
+        int: Number of black pieces borne off.
+        """
+        return self.game.position.off[BLACK]
 
     def calculate_point_positions(self):
         """
@@ -135,6 +238,75 @@ class GUI:
             self.point_coords[point_index] = (center_x, center_y)
 
         self.bar_position = (self.width // 2, self.height // 2)
+        self.stack_slots = {point_idx: [self.sprite_position(self.piece_center(point_idx, i))
+                                        for i in range(CHECKERS_PER_SIDE)]
+                            for point_idx in range(1, 25)}
+        self.calculate_regions()
+        self.calculate_hit_index()
+
+    def calculate_regions(self):
+        """
+        Calculates the screen rectangles tracked for dirty-rectangle rendering.
+
+        A column holds a top point and the bottom point below it, with room for their
+        tallest stacks; the bar region holds both bar stacks.
+        """
+        board_left = 100
+        board_top = 50
+        board_w = self.width - 200
+        board_h = self.height - 200
+        gap = board_w // (12 + 1)
+        radius = 15
+
+        self.regions = {}
+        for i in range(12):
+            offset = 1 if i >= 6 else 0
+            self.regions[("column", i)] = pygame.Rect(board_left + (i + offset) * gap, board_top, gap, board_h)
+        bar_x, bar_y = self.bar_position
+        bar_top = max(0, bar_y - 14 * self.stack_offset - radius)
+        self.regions["bar"] = pygame.Rect(bar_x - 50 - radius - 2, bar_top, 100 + 2 * radius + 4, bar_y + radius + 2 - bar_top)
+        for color in (WHITE, BLACK):
+            cx, cy = self.off_tray_center(color)
+            self.regions[("off", color)] = pygame.Rect(cx - radius - 2, cy - radius - 2, 2 * radius + 4, 2 * radius + 4)
+        self.regions["ui"] = pygame.Rect(0, 0, self.width, UI_STRIP_HEIGHT)
+        self.regions["overlay"] = pygame.Rect(0, self.height - OVERLAY_HEIGHT, self.width, OVERLAY_HEIGHT)
+
+    def calculate_hit_index(self):
+        """
+        Builds the lookup tables that map a mouse position to a point without scanning the board.
+
+        Each screen column of pixels gets the points whose checkers reach it, in the order
+        find_piece_at tries them, and the top and bottom point whose centers are nearest.
+        Only the geometry is indexed: stack heights are read from the position at lookup
+        time, so moves never have to update the index.
+        """
+        radius = 15
+        order = sorted(self.point_coords)
+        self.hit_points = [tuple(p for p in order if abs(x - self.point_coords[p][0]) <= radius)
+                           for x in range(self.width)]
+        # Point 12 - i sits above point 13 + i; ties go to the leftmost pair, as in a scan from point 12 down.
+        pairs = [(12 - i, 13 + i) for i in range(12)]
+        self.nearest_points = [min(pairs, key=lambda pair: abs(x - self.point_coords[pair[0]][0]))
+                               for x in range(self.width)]
+
+    def render_text(self, text, color):
+        """
+        Renders a text with the GUI font, reusing the surface rendered the last time the same text was drawn.
+
+        Parameters:
+            text (str): The text.
+            color (tuple): The RGB color.
+
+        Returns:
+            pygame.Surface: The rendered text.
+        """
+        key = (text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= TEXT_CACHE_ENTRIES:
+                self.text_cache.clear()
+            surface = self.text_cache[key] = self.font.render(text, True, color)
+        return surface
 
     def draw_buttons(self):
         """
@@ -143,34 +315,78 @@ class GUI:
         pygame.draw.rect(self.screen, (200, 200, 200), self.buttons["ai"])
         pygame.draw.rect(self.screen, (200, 200, 200), self.buttons["friend"])
         pygame.draw.rect(self.screen, (200, 200, 200), self.buttons["dice"])
+        pygame.draw.rect(self.screen, (200, 200, 200), self.buttons["engine"])
 
-        ai_text = self.font.render("Play with AI", True, (0, 0, 0))
-        friend_text = self.font.render("Play with Friend", True, (0, 0, 0))
-        dice_text = self.font.render("Throw Dice", True, (0, 0, 0))
-        result_text = self.font.render(self.dice_result, True, (0, 0, 0))
+        ai_text = self.render_text("Play with AI", (0, 0, 0))
+        friend_text = self.render_text("Play with Friend", (0, 0, 0))
+        dice_text = self.render_text("Throw Dice", (0, 0, 0))
+        engine_text = self.render_text(f"AI: {self.ai_engine}", (0, 0, 0))
+        result_text = self.render_text(self.dice_result, (0, 0, 0))
 
         self.screen.blit(ai_text, (self.buttons["ai"].x + 5, self.buttons["ai"].y + 5))
         self.screen.blit(friend_text, (self.buttons["friend"].x + 5, self.buttons["friend"].y + 5))
         self.screen.blit(dice_text, (self.buttons["dice"].x + 5, self.buttons["dice"].y + 5))
+        self.screen.blit(engine_text, (self.buttons["engine"].x + 5, self.buttons["engine"].y + 5))
         self.screen.blit(result_text, (520, 15))
 
-        white_off_text = self.font.render(f"White Off: {self.white_off_count}", True, (255, 255, 255))
-        black_off_text = self.font.render(f"Black Off: {self.black_off_count}", True, (0, 0, 0))
+        white_off_text = self.render_text(
+            f"White Off: {self.white_off_count}  Pips: {self.board.pip_count(WHITE)}", (255, 255, 255)
+        )
+        black_off_text = self.render_text(
+            f"Black Off: {self.black_off_count}  Pips: {self.board.pip_count(BLACK)}", (0, 0, 0)
+        )
         self.screen.blit(white_off_text, (10, 40))
         self.screen.blit(black_off_text, (10, 70))
 
         if self.winner:
-            winner_text = self.font.render(f"Winner: {self.winner.capitalize()}", True, (255, 0, 0))
+            winner_text = self.render_text(f"Winner: {self.winner.capitalize()}", (255, 0, 0))
             self.screen.blit(winner_text, (10, 100))
+        elif self.ai_thinking:
+            dots = "." * (self.frame_ms // 300 % 4)
+            thinking_text = self.render_text(f"AI is thinking{dots}", (255, 255, 0))
+            self.screen.blit(thinking_text, (10, 100))
 
     def draw_backgammon_table(self):
         """
         Renders the Backgammon board, including points, pieces, buttons, and game status.
         """
-        self.screen.fill(self.background_color)
+        # During a partial redraw the screen is clipped to a dirty rectangle; text outside it is not rendered.
+        clip = self.screen.get_clip()
+        with span("draw_board"):
+            self.draw_board()
+
+        if clip.colliderect(self.regions["ui"]):
+            with span("draw_buttons"):
+                self.draw_buttons()
+
+        if self.game_started:
+            with span("draw_pieces"):
+                self.draw_pieces()
+            with span("draw_possible_moves"):
+                self.draw_possible_moves()
+            with span("draw_bar"):
+                self.draw_bar()
+            with span("draw_ai_animation"):
+                self.draw_ai_animation()
+            if self.winner and clip.colliderect(self.regions["ui"]):
+                winner_text = self.render_text(f"{self.winner.upper()} WINS!", (255, 0, 0))
+                self.screen.blit(winner_text, (self.width // 2 - 50, 10))
+
+        if self.show_overlay and clip.colliderect(self.regions["overlay"]):
+            self.draw_overlay()
+
+    def render_board_layer(self):
+        """
+        Renders the static part of the table, background, board and points, to an off-screen surface.
+
+        Returns:
+            pygame.Surface: The board layer, the size of the window.
+        """
+        layer = pygame.Surface((self.width, self.height)).convert()
+        layer.fill(self.background_color)
         board_color = (185, 122, 87)
         pygame.draw.rect(
-            self.screen,
+            layer,
             board_color,
             (100, 50, self.width - 200, self.height - 200)
         )
@@ -192,7 +408,7 @@ class GUI:
             base_right_x = base_left_x + point_width
             base_right_y = base_left_y
             pygame.draw.polygon(
-                self.screen,
+                layer,
                 color,
                 [(tip_x, tip_y), (base_left_x, base_left_y), (base_right_x, base_right_y)]
             )
@@ -207,59 +423,163 @@ class GUI:
             base_right_x = base_left_x + point_width
             base_right_y = base_left_y
             pygame.draw.polygon(
-                self.screen,
+                layer,
                 color,
                 [(tip_x, tip_y), (base_left_x, base_left_y), (base_right_x, base_right_y)]
             )
+        return layer
+
+    def draw_board(self):
+        """
+        Copies the static board layer to the screen, rendering it first if the window size changed.
+        """
+        if self.board_layer is None or self.board_layer.get_size() != (self.width, self.height):
+            self.board_layer = self.render_board_layer()
+        self.screen.blit(self.board_layer, (0, 0))
 
-        self.draw_buttons()
+    def resize(self, width, height):
+        """
+        Adapts the window and the board geometry to a new size; the board layer is rendered again on the next frame.
 
-        if self.game_started:
-            self.draw_pieces()
-            self.draw_possible_moves()
-            self.draw_bar()
-            if self.winner:
-                winner_text = self.font.render(f"{self.winner.upper()} WINS!", True, (255, 0, 0))
-                self.screen.blit(winner_text, (self.width // 2 - 50, 10))
+        Parameters:
+            width (int): New width of the window.
+            height (int): New height of the window.
+        """
+        self.width = width
+        self.height = height
+        self.screen = pygame.display.set_mode((self.width, self.height), pygame.RESIZABLE)
+        self.point_coords.clear()
+        self.calculate_point_positions()
+        self.board_layer = None
+        self.full_redraw = True
+
+    def draw_overlay(self):
+        """
+        Renders the frame time percentiles of the recent frames and the tracing counters.
+        """
+        percentiles = TRACER.frame_percentiles()
+        if not percentiles:
+            return
+        text = "frame " + "  ".join(f"p{p} {ms:.1f} ms" for p, ms in percentiles.items())
+        if TRACER.counters:
+            text += "  |  " + "  ".join(f"{name} {value}" for name, value in sorted(TRACER.counters.items()))
+        # The figures change every frame, so the text is not worth caching.
+        overlay_text = self.font.render(text, True, (255, 255, 0))
+        self.screen.blit(overlay_text, (10, self.height - 30))
+
+    def piece_center(self, point_idx, i):
+        """
+        Returns the screen position of a piece in a stack.
+
+        Parameters:
+            point_idx (int): The point index (1-24).
+            i (int): The index of the piece within the stack.
+
+        Returns:
+            tuple: The (x, y) center of the piece.
+        """
+        radius = 15
+        cx, cy = self.point_coords[point_idx]
+        if point_idx <= 12:
+            return cx, cy + i * self.stack_offset + radius
+        return cx, cy - i * self.stack_offset - radius
+
+    def off_tray_center(self, color):
+        """
+        Returns the screen position where a color's borne-off pieces go.
+
+        Parameters:
+            color (str): The color of the pieces ("white" or "black").
+
+        Returns:
+            tuple: The (x, y) center of the off tray.
+        """
+        cx, cy = self.bar_position
+        cx += 550 if color == "white" else -550
+        return cx, cy
+
+    def render_sprites(self):
+        """
+        Pre-renders the checkers in each color and state, and the move hint marker.
+
+        Each sprite is a square with the circle centered at SPRITE_OFFSET pixels from
+        its top-left corner, drawn exactly as pygame.draw.circle draws it on the screen.
+
+        Returns:
+            dict: (color, state) to checker surface for the states "normal", "hovered" and
+            "selected", plus "hint" for the translucent destination marker.
+        """
+        radius = 15
+        size = 2 * SPRITE_OFFSET + 1
+        center = (SPRITE_OFFSET, SPRITE_OFFSET)
+        sprites = {}
+        for color in (WHITE, BLACK):
+            for state, outline in (("normal", (0, 0, 0)), ("hovered", (255, 255, 0)), ("selected", (255, 255, 0))):
+                sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+                pygame.draw.circle(sprite, color_map(color), center, radius)
+                pygame.draw.circle(sprite, outline, center, radius, 2)
+                sprites[(color, state)] = sprite.convert_alpha()
+        hint = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(hint, (255, 255, 0, 130), center, radius)
+        sprites["hint"] = hint.convert_alpha()
+        return sprites
 
     def draw_pieces(self):
         """
         Renders all the game pieces on the board, highlighting hovered or selected pieces.
         """
-        radius = 15
-        for point_idx, stack in self.board.items():
-            cx, cy = self.point_coords[point_idx]
-            if point_idx <= 12:
-                for i, piece in enumerate(stack):
-                    color, hovered, selected = piece
-                    px = cx
-                    py = cy + i * self.stack_offset + radius
-                    outline = (255, 255, 0) if ((hovered or selected) and self.current_player in color) else (0, 0, 0)
-                    pygame.draw.circle(self.screen, color_map(color), (px, py), radius)
-                    pygame.draw.circle(self.screen, outline, (px, py), radius, 2)
-            else:
-                for i, piece in enumerate(stack):
-                    color, hovered, selected = piece
-                    px = cx
-                    py = cy - i * self.stack_offset - radius
-                    outline = (255, 255, 0) if ((hovered or selected) and self.current_player in color) else (0, 0, 0)
-                    pygame.draw.circle(self.screen, color_map(color), (px, py), radius)
-                    pygame.draw.circle(self.screen, outline, (px, py), radius, 2)
+        sprites = self.sprites
+        moving_from = self.ai_animation[0] if self.ai_animation else None
+        hovered = self.hovered_piece
+        selected = self.selected_piece
+        batch = []
+        for point_idx in range(1, 25):
+            n = self.board.points[point_idx]
+            if n == 0:
+                continue
+            color = WHITE if n > 0 else BLACK
+            count = abs(n)
+            if point_idx == moving_from:
+                count -= 1
+            slots = self.stack_slots[point_idx]
+            if count > len(slots):
+                slots = [self.sprite_position(self.piece_center(point_idx, i)) for i in range(count)]
+            normal = sprites[(color, "normal")]
+            stack = [(normal, slots[i]) for i in range(count)]
+            if color == self.current_player:
+                if hovered and hovered[0] == point_idx and hovered[1] < count:
+                    stack[hovered[1]] = (sprites[(color, "hovered")], slots[hovered[1]])
+                if selected and selected[0] == point_idx and selected[1] < count:
+                    stack[selected[1]] = (sprites[(color, "selected")], slots[selected[1]])
+            batch.extend(stack)
+        self.screen.blits(batch, doreturn=False)
 
     def draw_bar(self):
         """
         Renders the pieces that are currently on the bar for both players.
         """
         bar_x, bar_y = self.bar_position
-        radius = 15
+        black_on_bar = self.board.bar(BLACK)
+        if self.ai_animation and self.ai_animation[0] == bar_point(BLACK):
+            black_on_bar -= 1
+        batch = []
+        for (color, x, count) in ((WHITE, bar_x - 50, self.board.bar(WHITE)), (BLACK, bar_x + 50, black_on_bar)):
+            sprite = self.sprites[(color, "normal")]
+            batch.extend((sprite, self.sprite_position((x, bar_y - i * self.stack_offset))) for i in range(count))
+        self.screen.blits(batch, doreturn=False)
+
+    @staticmethod
+    def sprite_position(center):
+        """
+        Returns where to blit a sprite so that its circle is centered on a point.
 
-        for i in range(self.bar["white"]):
-            pygame.draw.circle(self.screen, color_map("white"), (bar_x - 50, bar_y - i * self.stack_offset), radius)
-            pygame.draw.circle(self.screen, (0, 0, 0), (bar_x - 50, bar_y - i * self.stack_offset), radius, 2)
+        Parameters:
+            center (tuple): The (x, y) center of the circle.
 
-        for i in range(self.bar["black"]):
-            pygame.draw.circle(self.screen, color_map("black"), (bar_x + 50, bar_y - i * self.stack_offset), radius)
-            pygame.draw.circle(self.screen, (0, 0, 0), (bar_x + 50, bar_y - i * self.stack_offset), radius, 2)
+        Returns:
+            tuple: The top-left (x, y) of the sprite.
+        """
+        return (center[0] - SPRITE_OFFSET, center[1] - SPRITE_OFFSET)
 
     def draw_possible_moves(self):
         """
@@ -267,24 +587,63 @@ class GUI:
         """
         if not self.possible_moves:
             return
-        s = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-        radius = 15
+        centers = []
         for (start_point, piece_index, dest_point) in self.possible_moves:
-            if dest_point == -1:
-                cx, cy = self.bar_position
-                cx += 550 if self.current_player == "white" else -550
-                color = (255, 255, 0, 130)
-                pygame.draw.circle(s, color, (cx, cy), radius)
+            if dest_point == OFF:
+                center = self.off_tray_center(self.current_player)
             else:
-                cx, cy = self.point_coords[dest_point]
-                stack_size = len(self.board[dest_point])
-                if dest_point <= 12:
-                    py = cy + stack_size * self.stack_offset + radius
-                else:
-                    py = cy - stack_size * self.stack_offset - radius
-                color = (255, 255, 0, 130)
-                pygame.draw.circle(s, color, (cx, py), radius)
-        self.screen.blit(s, (0, 0))
+                center = self.piece_center(dest_point, self.destination_stack_size(dest_point))
+            # A destination reached by several moves is marked once, so it is not blended twice.
+            if center not in centers:
+                centers.append(center)
+        hint = self.sprites["hint"]
+        self.screen.blits([(hint, self.sprite_position(center)) for center in centers], doreturn=False)
+
+    def ai_animation_position(self):
+        """
+        Returns where the sliding AI checker is drawn in the current frame.
+
+        Returns:
+            tuple or None: The (x, y) center of the checker, or None if no AI move is animated.
+        """
+        if not self.ai_animation:
+            return None
+        spoint, dest_point, die, start_ms = self.ai_animation
+        if spoint == bar_point(BLACK):
+            bar_x, bar_y = self.bar_position
+            x0, y0 = bar_x + 50, bar_y - (self.board.bar(BLACK) - 1) * self.stack_offset
+        else:
+            x0, y0 = self.piece_center(spoint, self.board.count(spoint, BLACK) - 1)
+        if dest_point == OFF:
+            x1, y1 = self.off_tray_center(BLACK)
+        else:
+            x1, y1 = self.piece_center(dest_point, self.destination_stack_size(dest_point))
+        t = min(1.0, (self.frame_ms - start_ms) / AI_MOVE_MS)
+        return (round(x0 + (x1 - x0) * t), round(y0 + (y1 - y0) * t))
+
+    def draw_ai_animation(self):
+        """
+        Draws the AI checker that is sliding to its destination, interpolated on frame time.
+        """
+        pos = self.ai_animation_position()
+        if pos is None:
+            return
+        self.screen.blit(self.sprites[(BLACK, "selected")], self.sprite_position(pos))
+
+    def destination_stack_size(self, dest_point):
+        """
+        Returns how many pieces will be under a piece landing on a point.
+
+        An opposing blot about to be hit still counts: the move hint is drawn above it,
+        where a click cannot be taken for a click on the blot itself.
+
+        Parameters:
+            dest_point (int): The destination point index.
+
+        Returns:
+            int: The stack height the landing piece is drawn on top of.
+        """
+        return abs(self.board.points[dest_point])
 
     def handle_click(self, pos):
         """
@@ -298,17 +657,31 @@ class GUI:
             self.start_game_for_ai()
         elif self.buttons["friend"].collidepoint(pos):
             self.start_game_for_friends()
+        elif self.buttons["engine"].collidepoint(pos):
+            self.cycle_ai_engine()
+        elif self.vs_ai and self.current_player == BLACK:
+            return
         elif self.buttons["dice"].collidepoint(pos):
             if self.game_started and not self.winner:
                 self.roll_and_assign_dice()
         else:
             if not self.game_started or self.winner:
                 return
-            if self.bar[self.current_player] > 0:
+            if self.board.bar(self.current_player) > 0:
                 self.try_reenter_from_bar(pos)
             else:
                 self.attempt_select_or_move(pos)
 
+    def cycle_ai_engine(self):
+        """
+        Switches the AI to the next engine in ai.ENGINES, leaving out the neural one until its weights are trained.
+        """
+        names = [name for name in ENGINES if name != NeuralPlayer.name or has_trained_weights()]
+        self.ai_engine = names[(names.index(self.ai_engine) + 1) % len(names)]
+        self.cancel_ai()
+        self.ai_player.shutdown()
+        self.ai_player = BookPlayer(ENGINES[self.ai_engine]())
+
     def start_game_for_friends(self):
         """
         Initializes a new game session for two friends (human players).
@@ -327,44 +700,21 @@ class GUI:
         """
         Performs common setup steps for starting a new game, whether against AI or a friend.
         """
+        self.cancel_ai()
         self.current_player_thrown_dice = False
         self.game_started = False
-        self.board = {i: [] for i in range(1, 25)}
-        self.bar = {"white": 0, "black": 0}
+        self.game.reset()
         self.selected_piece = None
+        self.hovered_piece = None
         self.possible_moves.clear()
-        self.current_dice.clear()
         self.dice_result = ""
-        self.winner = None
-        self.white_off_count = 0
-        self.black_off_count = 0
-
-        self.board[1] = [("black", False, False) for _ in range(2)]
-        self.board[6] = [("white", False, False) for _ in range(5)]
-        self.board[8] = [("white", False, False) for _ in range(3)]
-        self.board[12] = [("black", False, False) for _ in range(5)]
-        self.board[13] = [("white", False, False) for _ in range(5)]
-        self.board[17] = [("black", False, False) for _ in range(3)]
-        self.board[19] = [("black", False, False) for _ in range(2)]
-        self.board[24] = [("white", False, False) for _ in range(5)]
-
-        (w1, w2) = self.roll_dice_once()
-        (b1, b2) = self.roll_dice_once()
-        sum_white = w1 + w2
-        sum_black = b1 + b2
-
-        while sum_white == sum_black:
-            (w1, w2) = self.roll_dice_once()
-            (b1, b2) = self.roll_dice_once()
-            sum_white = w1 + w2
-            sum_black = b1 + b2
+
+        (w1, w2), (b1, b2) = self.game.roll_opening()
 
         self.dice_result = f"White dice: {w1},{w2} | Black dice: {b1},{b2}"
-        if sum_white > sum_black:
-            self.current_player = "white"
+        if self.current_player == "white":
             self.dice_result += " | White starts!"
         else:
-            self.current_player = "black"
             self.dice_result += " | Black starts!"
 
         self.game_started = True
@@ -376,17 +726,14 @@ class GUI:
         Returns:
             tuple: A pair of integers representing the dice results.
         """
-        return (random.randint(1, 6), random.randint(1, 6))
+        return self.game.roll_dice_once()
 
     def roll_and_assign_dice(self):
         """
         Rolls the dice for the current player and assigns the results, handling doubles.
         """
         if not self.current_player_thrown_dice:
-            d1, d2 = self.roll_dice_once()
-            self.current_dice = [d1, d2]
-            if d1 == d2:
-                self.current_dice.extend([d1, d2])
+            self.game.roll()
             self.dice_result = f"{self.current_player.capitalize()}'s turn: dice {self.current_dice}"
             self.selected_piece = None
             self.possible_moves.clear()
@@ -395,91 +742,56 @@ class GUI:
 
     def ai_move(self):
         """
-        Executes the AI's move logic, selecting and performing valid moves.
-        """
-        if not self.current_player_thrown_dice:
-            self.roll_and_assign_dice()
-            time.sleep(0.5)
+        Advances the AI's turn by one step without blocking the render loop.
 
-        moves_made = 0
-        valid_moves_all = self.collect_all_valid_moves("black")
+        Called every frame while it is black's turn: rolls, hands the position to the
+        background worker, then slides the chosen checkers one at a time, each move
+        taking AI_MOVE_MS of frame time.
+        """
+        now = pygame.time.get_ticks()
+        if now < self.ai_wait_until:
+            return
 
-        while self.current_dice and self.current_player == "black" and not self.winner and self.game_started:
-            if moves_made >= 1:
-                self.end_turn()
-                break
+        if self.ai_animation:
+            spoint, dest_point, die, start_ms = self.ai_animation
+            self.ai_animation = None
+            self.execute_move(spoint, self.board.count(spoint, BLACK) - 1, dest_point, die)
+            if self.current_player != BLACK or self.winner:
+                self.ai_pending_moves.clear()
+            return
 
-            if self.bar["black"] > 0:
-                if not self.can_reenter_somewhere_for_ai():
-                    self.end_turn()
-                    return
-                else:
-                    reentry_done = self.ai_random_reentry()
-                    time.sleep(0.5)
-                    if reentry_done:
-                        moves_made += 1
-                    else:
-                        self.end_turn()
-                        return
+        if self.ai_pending_moves:
+            spoint, dest_point, die = self.ai_pending_moves.pop(0)
+            self.ai_animation = (spoint, dest_point, die, now)
+            self.ai_wait_until = now + AI_MOVE_MS
+            return
 
-            else:
-                if not valid_moves_all:
-                    self.end_turn()
-                    return
-                move = random.choice(valid_moves_all)
-                spoint, sindex, dest_point = move
-                self.execute_move(spoint, sindex, dest_point)
-                moves_made += 1
-                time.sleep(0.5)
-
-        if not self.current_dice or moves_made >= 2:
-            self.end_turn()
+        if not self.current_player_thrown_dice:
+            self.roll_and_assign_dice()
+            self.ai_wait_until = now + AI_ROLL_PAUSE_MS
+            return
 
-    def can_reenter_somewhere_for_ai(self):
-        """
-        Determines if the AI can re-enter any pieces from the bar based on current dice.
+        if not self.ai_thinking:
+            self.ai_worker.request(self.ai_player, self.board, BLACK, self.current_dice)
+            self.ai_thinking = True
+            return
 
-        Returns:
-            bool: True if re-entry is possible, False otherwise.
-        """
-        if not self.current_dice:
-            return False
-        possible_points = [d for d in self.current_dice if 1 <= d <= 6]
-        for pt in possible_points:
-            if self.can_land_on(pt, "black"):
-                return True
-        return False
+        play = self.ai_worker.poll()
+        if play is not None:
+            self.ai_thinking = False
+            self.ai_pending_moves = list(play)
+            if not play:
+                self.end_turn()
 
-    def ai_random_reentry(self):
+    def cancel_ai(self):
         """
-        Attempts to randomly re-enter a piece from the bar for the AI.
-
-        Returns:
-            bool: True if re-entry was successful, False otherwise.
+        Drops any AI work in progress: a pending search result, queued moves and the running animation.
         """
-        if not self.current_dice:
-            return False
-        possible_moves = []
-        for d in self.current_dice:
-            if 1 <= d <= 6:
-                pt = d
-                if self.can_land_on(pt, "black"):
-                    possible_moves.append(pt)
-        if not possible_moves:
-            return False
-        chosen_pt = random.choice(possible_moves)
-        self.bar["black"] -= 1
-        if self.board[chosen_pt] and len(self.board[chosen_pt]) == 1 and self.board[chosen_pt][0][0] == "white":
-            self.board[chosen_pt].clear()
-            self.bar["white"] += 1
-
-        self.board[chosen_pt].append(("black", False, False))
-        if chosen_pt in self.current_dice:
-            self.current_dice.remove(chosen_pt)
-        else:
-            if self.current_dice:
-                self.current_dice.pop(0)
-        return True
+        self.ai_worker.cancel()
+        self.ai_thinking = False
+        self.ai_pending_moves.clear()
+        self.ai_animation = None
+        self.ai_wait_until = 0
 
     def collect_all_valid_moves(self, player_color):
         """
@@ -489,38 +801,15 @@ class GUI:
             player_color (str): The color of the player ("white" or "black").
 
         Returns:
-            list: A list of tuples representing valid moves.
+            list: A list of (start_point, piece_index, dest_point) tuples, moving the top piece of each stack.
         """
         moves = []
-        for i in range(1, 25):
-            stack = self.board[i]
-            if stack:
-                for index_in_stack, piece in enumerate(stack):
-                    if piece[0] == player_color:
-                        possible = self.calculate_possible_moves_for_piece(i, index_in_stack)
-                        moves.extend(possible)
+        for (spoint, dest, die) in self.board.legal_first_moves(player_color, self.current_dice):
+            move = (spoint, self.board.count(spoint, player_color) - 1, dest)
+            if move not in moves:
+                moves.append(move)
         return moves
 
-    def can_reenter_somewhere(self):
-        """
-        Checks if the current player can re-enter any pieces from the bar based on current dice.
-
-        Returns:
-            bool: True if re-entry is possible, False otherwise.
-        """
-        if not self.current_dice:
-            return False
-
-        if self.current_player == "white":
-            possible_points = [25 - d for d in self.current_dice if 19 <= 25 - d <= 24]
-        else:
-            possible_points = [d for d in self.current_dice if 1 <= d <= 6]
-
-        for pt in possible_points:
-            if self.can_land_on(pt, self.current_player):
-                return True
-        return False
-
     def try_reenter_from_bar(self, pos):
         """
         Attempts to re-enter a piece from the bar based on the mouse click position.
@@ -533,39 +822,11 @@ class GUI:
         candidate_point = self.find_nearest_point(pos)
         if not candidate_point:
             return
-        if self.current_player == "white":
-            valid_positions = [25 - d for d in self.current_dice if 19 <= 25 - d <= 24]
-            if candidate_point not in valid_positions:
-                return
-
-        if self.current_player == "black":
-            valid_positions = [d for d in self.current_dice if 1 <= d <= 6]
-            if candidate_point not in valid_positions:
-                return
-
-        if not self.can_land_on(candidate_point, self.current_player):
+        bar = bar_point(self.current_player)
+        if self.game.die_for_move(bar, candidate_point) is None:
             return
 
-        self.bar[self.current_player] -= 1
-        if self.board[candidate_point] and len(self.board[candidate_point]) == 1 and self.board[candidate_point][0][0] != self.current_player:
-            self.board[candidate_point].clear()
-            if self.current_player == "white":
-                self.bar["black"] += 1
-            else:
-                self.bar["white"] += 1
-
-        self.board[candidate_point].append((self.current_player, False, False))
-
-        if self.current_player == "white":
-            used_dist = 25 - candidate_point
-        else:
-            used_dist = candidate_point
-
-        if used_dist in self.current_dice:
-            self.current_dice.remove(used_dist)
-        else:
-            if self.current_dice:
-                self.current_dice.pop(0)
+        self.game.play(bar, candidate_point)
 
         if not self.current_dice:
             self.end_turn()
@@ -582,15 +843,12 @@ class GUI:
         Returns:
             int or None: The index of the nearest point, or None if no points are found.
         """
-        best_dist = float("inf")
-        best_point = None
         mx, my = pos
-        for p, (cx, cy) in self.point_coords.items():
-            dist = (mx - cx) ** 2 + (my - cy) ** 2
-            if dist < best_dist:
-                best_dist = dist
-                best_point = p
-        return best_point
+        top, bottom = self.nearest_points[min(max(int(mx), 0), self.width - 1)]
+        # Every top point shares one y, every bottom point another, so the nearer row decides.
+        if abs(my - self.point_coords[top][1]) <= abs(my - self.point_coords[bottom][1]):
+            return top
+        return bottom
 
     def attempt_select_or_move(self, pos):
         """
@@ -601,17 +859,9 @@ class GUI:
         """
         clicked_point, clicked_piece_index = self.find_piece_at(pos)
         if clicked_point:
-            piece_color, h, s = self.board[clicked_point][clicked_piece_index]
-            if piece_color != self.current_player:
+            if self.board.color_at(clicked_point) != self.current_player:
                 return
-            if self.selected_piece:
-                spoint, sindex = self.selected_piece
-                sc, sh, ss = self.board[spoint][sindex]
-                self.board[spoint][sindex] = (sc, sh, False)
-
             self.selected_piece = (clicked_point, clicked_piece_index)
-            c, hov, sel = self.board[clicked_point][clicked_piece_index]
-            self.board[clicked_point][clicked_piece_index] = (c, hov, True)
             self.calculate_possible_moves()
         else:
             if self.selected_piece:
@@ -632,21 +882,25 @@ class GUI:
         """
         radius = 15
         mx, my = pos
-        for point_idx, stack in self.board.items():
-            if point_idx <= 12:
-                for i, piece in enumerate(stack):
-                    color, hov, sel = piece
-                    px, py = self.point_coords[point_idx]
-                    py += i * self.stack_offset + radius
-                    if (mx - px) ** 2 + (my - py) ** 2 <= radius ** 2:
-                        return point_idx, i
-            else:
-                for i, piece in enumerate(stack):
-                    color, hov, sel = piece
-                    px, py = self.point_coords[point_idx]
-                    py -= i * self.stack_offset + radius
-                    if (mx - px) ** 2 + (my - py) ** 2 <= radius ** 2:
-                        return point_idx, i
+        if not 0 <= mx < self.width:
+            return (None, None)
+        offset = self.stack_offset
+        for point_idx in self.hit_points[int(mx)]:
+            count = abs(self.board.points[point_idx])
+            cx, cy = self.point_coords[point_idx]
+            # Stacks grow down from the top points and up from the bottom ones. Measured along the
+            # stack from the first checker's center, checker i is centered at i * offset, so only
+            # the checkers from the first one reaching the mouse onwards can contain it.
+            direction = 1 if point_idx <= 12 else -1
+            along = (my - cy) * direction - radius
+            i = max(0, -((radius - along) // offset))
+            while i < count:
+                d = along - i * offset
+                if d < -radius:
+                    break
+                if (mx - cx) ** 2 + d ** 2 <= radius ** 2:
+                    return point_idx, i
+                i += 1
         return (None, None)
 
     def find_move_if_valid(self, pos, spoint, sindex):
@@ -663,16 +917,11 @@ class GUI:
         """
         for (start_pt, p_idx, dest_pt) in self.possible_moves:
             if start_pt == spoint and p_idx == sindex:
-                if dest_pt == -1:
-                    return -1
+                if dest_pt == OFF:
+                    return OFF
                 else:
                     radius = 15
-                    cx, cy = self.point_coords[dest_pt]
-                    stack_size = len(self.board[dest_pt])
-                    if dest_pt <= 12:
-                        cy = cy + stack_size * self.stack_offset + radius
-                    else:
-                        cy = cy - stack_size * self.stack_offset - radius
+                    cx, cy = self.piece_center(dest_pt, self.destination_stack_size(dest_pt))
                     dx = pos[0] - cx
                     dy = pos[1] - cy
                     if dx * dx + dy * dy <= radius * radius:
@@ -683,178 +932,23 @@ class GUI:
         """
         Checks if the current player has any valid moves available. If not, ends the turn.
         """
-        if self.bar[self.current_player] > 0:
-            if not self.can_reenter_somewhere():
-                self.end_turn()
-            return
-
-        for i in range(1, 25):
-            stack = self.board[i]
-            if stack:
-                piece_color, _, _ = stack[0]
-                if piece_color == self.current_player:
-                    for idx in range(len(stack)):
-                        moves_for_piece = self.calculate_possible_moves_for_piece(i, idx)
-                        if moves_for_piece:
-                            return
-
-        if self.is_bearing_mode(self.current_player) and self.can_bear_off_piece(self.current_player):
-            return
-
-        self.end_turn()
-
-    def can_bear_off_piece(self, player):
-        """
-        Determines if the player can bear off any pieces based on the current dice.
-
-        Parameters:
-            player (str): The color of the player ("white" or "black").
-
-        Returns:
-            bool: True if the player can bear off a piece, False otherwise.
-        """
-        if not self.is_bearing_mode(player):
-            return False
-
-        if player == "white":
-            home_points = range(19, 25)
-            direction = 25
-        else:
-            home_points = range(1, 7)
-            direction = 0
-
-        for point in home_points:
-            if point in self.board and self.board[point]:
-                used_dist = abs(direction - point)
-                if used_dist in self.current_dice:
-                    return True
-                if any(die > used_dist for die in self.current_dice):
-                    can_remove_with_larger_die = True
-                    if player == "white":
-                        for p in range(19, point):
-                            if p in self.board and any(x[0] == "white" for x in self.board[p]):
-                                can_remove_with_larger_die = False
-                                break
-                    else:
-                        for p in range(point + 1, 7):
-                            if p in self.board and any(x[0] == "black" for x in self.board[p]):
-                                can_remove_with_larger_die = False
-                                break
-                    if can_remove_with_larger_die:
-                        return True
-        return False
-
-    def is_bearing_mode(self, player):
-        """
-        Checks if the player is in bearing mode, meaning all their pieces are in the home board.
-
-        Parameters:
-            player (str): The color of the player ("white" or "black").
-
-        Returns:
-            bool: True if the player is in bearing mode, False otherwise.
-        """
-        if player == "white":
-            for i in range(1, 19):
-                if i in self.board and self.board[i]:
-                    for piece in self.board[i]:
-                        if piece[0] == "white":
-                            return False
-        else:
-            for i in range(7, 25):
-                if i in self.board and self.board[i]:
-                    for piece in self.board[i]:
-                        if piece[0] == "black":
-                            return False
-        return True
+        if not self.game.has_moves():
+            self.end_turn()
 
     def calculate_possible_moves(self):
         """
         Calculates and updates the list of possible moves for the selected piece based on current dice.
         """
-        self.current_player_can_win = self.check_near_victory(self.current_player)
+        self.current_player_can_win = self.board.is_bearing_mode(self.current_player)
         self.possible_moves.clear()
         if not self.selected_piece or not self.current_dice:
             return
         spoint, sindex = self.selected_piece
-        piece_color, hov, sel = self.board[spoint][sindex]
-        for d in sorted(self.current_dice, reverse=True):
-            if piece_color == "white":
-                dest = spoint - d
-                if dest < 1:
-                    if self.all_white_in_home(spoint):
-                        self.possible_moves.append((spoint, sindex, -1))
-                else:
-                    if self.can_land_on(dest, "white"):
-                        self.possible_moves.append((spoint, sindex, dest))
-            else:
-                dest = spoint + d
-                if dest > 24:
-                    if self.all_black_in_home(spoint):
-                        self.possible_moves.append((spoint, sindex, -1))
-                else:
-                    if self.can_land_on(dest, "black"):
-                        self.possible_moves.append((spoint, sindex, dest))
-
-    def calculate_possible_moves_for_piece(self, spoint, sindex):
-        """
-        Calculates all possible moves for a specific piece based on current dice.
-
-        Parameters:
-            spoint (int): The starting point index of the piece.
-            sindex (int): The index of the piece within the starting stack.
-
-        Returns:
-            list: A list of tuples representing possible moves.
-        """
-        possible_moves = []
-        piece_color, hov, sel = self.board[spoint][sindex]
-        if not self.current_dice:
-            return possible_moves
-        print(self.current_dice)
-        for d in sorted(self.current_dice, reverse=True):
-            if piece_color == "white":
-                dest = spoint - d
-                if dest < 1:
-                    if self.all_white_in_home(spoint):
-                        possible_moves.append((spoint, sindex, -1))
-                else:
-                    if self.can_land_on(dest, piece_color):
-                        possible_moves.append((spoint, sindex, dest))
-            else:
-                dest = spoint + d
-                if dest > 24:
-                    if self.all_black_in_home(spoint):
-                        possible_moves.append((spoint, sindex, -1))
-                else:
-                    if self.can_land_on(dest, piece_color):
-                        possible_moves.append((spoint, sindex, dest))
-
-        return possible_moves
-
-    def can_land_on(self, dest_point, piece_color):
-        """
-        Determines if a piece of the specified color can land on the destination point.
-
-        Parameters:
-            dest_point (int): The destination point index.
-            piece_color (str): The color of the piece ("white" or "black").
-
-        Returns:
-            bool: True if landing is allowed, False otherwise.
-        """
-        stack = self.board[dest_point]
-        if not stack:
-            return True
-        top_color = stack[0][0]
-        if top_color == piece_color:
-            return True
-        else:
-            if len(stack) == 1:
-                return True
-        return False
+        for (start, dest, die) in self.game.legal_moves():
+            if start == spoint and (spoint, sindex, dest) not in self.possible_moves:
+                self.possible_moves.append((spoint, sindex, dest))
 
-    def execute_move(self, spoint, sindex, dest_point):
+    def execute_move(self, spoint, sindex, dest_point, die=None):
         """
         Executes a move by moving a piece from the starting point to the destination point.
 
@@ -862,196 +956,200 @@ class GUI:
             spoint (int): The starting point index.
             sindex (int): The index of the piece within the starting stack.
             dest_point (int): The destination point index (-1 if bearing off).
+            die (int, optional): The die to use. Defaults to the smallest die that makes the move legal.
         """
-        piece_color, hov, sel = self.board[spoint][sindex]
-        self.board[spoint].pop(sindex)
-
-        if dest_point == -1:
-            if piece_color == "white":
-                self.white_off_count += 1
-            else:
-                self.black_off_count += 1
-
-            self.selected_piece = None
-            self.possible_moves.clear()
-            used_dist = self.get_used_dist_for_bearing_off(piece_color, spoint)
-            if used_dist in self.current_dice:
-                self.current_dice.remove(used_dist)
-            else:
-                if self.current_dice:
-                    self.current_dice.pop(0)
-
-            self.check_for_winner()
-            if not self.current_dice and not self.winner:
-                self.end_turn()
-            else:
-                if not self.winner:
-                    self.check_if_has_moves()
-            return
-
-        if len(self.board[dest_point]) == 1:
-            other_color, ohov, osel = self.board[dest_point][0]
-            if other_color != piece_color:
-                self.board[dest_point].clear()
-                self.bar[other_color] += 1
-
-        self.board[dest_point].append((piece_color, False, False))
+        self.game.play(spoint, dest_point, die)
         self.selected_piece = None
+        self.hovered_piece = None
         self.possible_moves.clear()
 
-        used_dist = abs(dest_point - spoint)
-        if used_dist in self.current_dice:
-            self.current_dice.remove(used_dist)
-        else:
-            if self.current_dice:
-                self.current_dice.pop(0)
-
-        self.current_player_can_win = self.check_near_victory(piece_color)
-        self.check_for_winner()
         if self.winner:
             return
+        self.current_player_can_win = self.board.is_bearing_mode(self.current_player)
         if not self.current_dice:
             self.end_turn()
         else:
             self.check_if_has_moves()
 
-    def get_used_dist_for_bearing_off(self, piece_color, spoint):
+    def end_turn(self):
         """
-        Determines the distance used for bearing off based on piece color and starting point.
-
-        Parameters:
-            piece_color (str): The color of the piece ("white" or "black").
-            spoint (int): The starting point index of the piece.
-
-        Returns:
-            int: The distance used for bearing off.
+        Ends the current player's turn, switching to the other player and resetting relevant states.
         """
-        if piece_color == "white":
-            return spoint
-        else:
-            return 25 - spoint
+        self.current_player_thrown_dice = False
+        self.game.end_turn()
 
-    def check_for_winner(self):
-        """
-        Checks if either player has borne off all their pieces, declaring a winner if so.
-        """
-        if self.white_off_count >= 15:
-            self.winner = "white"
-        elif self.black_off_count >= 15:
-            self.winner = "black"
+        if not self.winner:
+            self.dice_result = f"{self.current_player.capitalize()}'s turn - throw dice!"
+        self.selected_piece = None
+        self.hovered_piece = None
+        self.possible_moves.clear()
 
-    def check_near_victory(self, piece_color):
+    def update_hover_states(self):
         """
-        Checks if the player is close to winning the game.
-
-        Parameters:
-            piece_color (str): The color of the player ("white" or "black").
-
-        Returns:
-            bool: True if the player is near victory, False otherwise.
+        Updates the hovered piece based on the current mouse position.
         """
-        if self.bar[piece_color] > 0:
-            return False
-        if piece_color == "white":
-            for pt in range(1, 19):
-                for p in self.board[pt]:
-                    if p[0] == "white":
-                        return False
+        if not self.game_started or not self.current_player or not self.current_player_thrown_dice:
+            return
+        point_idx, i = self.find_piece_at(pygame.mouse.get_pos())
+        if point_idx and self.board.color_at(point_idx) == self.current_player:
+            self.hovered_piece = (point_idx, i)
         else:
-            for pt in range(7, 25):
-                for p in self.board[pt]:
-                    if p[0] == "black":
-                        return False
-        return True
+            self.hovered_piece = None
 
-    def all_white_in_home(self, spoint):
+    def region_signatures(self):
         """
-        Checks if all white pieces are in the home board starting from a specific point.
-
-        Parameters:
-            spoint (int): The starting point index.
+        Describes what each region shows, so that a region is redrawn only when its description changes.
 
         Returns:
-            bool: True if all white pieces are in the home board, False otherwise.
-        """
-        for pt in range(7, 25):
-            for p in self.board[pt]:
-                if p[0] == "white":
-                    return False
-        return True
-
-    def all_black_in_home(self, spoint):
-        """
-        Checks if all black pieces are in the home board starting from a specific point.
+            dict: Region name, see regions, to a hashable description of its content.
+        """
+        board = self.board
+        started = self.game_started
+        player = self.current_player
+        hovered = self.hovered_piece
+        selected = self.selected_piece
+        destinations = {dest for (start, index, dest) in self.possible_moves}
+        moving_from = self.ai_animation[0] if self.ai_animation else None
+
+        def point(p):
+            return (board.points[p],
+                    hovered[1] if hovered and hovered[0] == p else None,
+                    selected[1] if selected and selected[0] == p else None,
+                    p in destinations, p == moving_from)
+
+        signatures = {}
+        for i in range(12):
+            signatures[("column", i)] = (started, player, point(12 - i), point(13 + i))
+        signatures["bar"] = (started, board.points[0], board.points[25], moving_from == bar_point(BLACK))
+        for color in (WHITE, BLACK):
+            signatures[("off", color)] = (started, OFF in destinations and player == color)
+        signatures["ui"] = (started, self.dice_result, self.ai_engine, board.off[WHITE], board.off[BLACK],
+                            board.pips[WHITE], board.pips[BLACK], self.winner,
+                            self.ai_thinking, self.ai_thinking and self.frame_ms // 300 % 4)
+        signatures["overlay"] = None
+        if self.show_overlay:
+            # The percentiles change every frame; a fresh object never equals the last one.
+            signatures["overlay"] = object()
+        return signatures
+
+    def collect_dirty_rects(self):
+        """
+        Finds the screen rectangles whose content changed since they were last drawn.
 
-        Parameters:
-            spoint (int): The starting point index.
+        Returns:
+            list: The dirty pygame.Rect objects, including where the AI animation checker was and now is,
+            widened to the left to start on a multiple of BLIT_ALIGN pixels.
+        """
+        rects = []
+        for name, signature in self.region_signatures().items():
+            if self.region_state.get(name, self) != signature:
+                self.region_state[name] = signature
+                rects.append(self.regions[name])
+        if self.animation_rect is not None:
+            rects.append(self.animation_rect)
+            self.animation_rect = None
+        pos = self.ai_animation_position()
+        if pos is not None:
+            self.animation_rect = pygame.Rect(pos[0] - 17, pos[1] - 17, 34, 34)
+            rects.append(self.animation_rect)
+        aligned = []
+        for rect in rects:
+            left = max(0, rect.x - rect.x % BLIT_ALIGN)
+            aligned.append(pygame.Rect(left, rect.y, rect.right - left, rect.h).clip(self.screen.get_rect()))
+        return aligned
+
+    def render(self):
+        """
+        Draws the frame, touching only what changed.
+
+        Each dirty rectangle is redrawn by drawing the table with the screen clipped to it,
+        and only they are passed to pygame.display.update. The first frame, a resize, and
+        changes covering most of the window are drawn whole and flipped.
 
         Returns:
-            bool: True if all black pieces are in the home board, False otherwise.
+            bool: True if anything was drawn.
         """
-        for pt in range(1, 19):
-            for p in self.board[pt]:
-                if p[0] == "black":
-                    return False
+        self.frame_ms = pygame.time.get_ticks()
+        rects = self.collect_dirty_rects()
+        if self.full_redraw or sum(rect.w * rect.h for rect in rects) > FULL_REDRAW_FRACTION * self.width * self.height:
+            self.full_redraw = False
+            self.draw_backgammon_table()
+            with span("display_flip"):
+                pygame.display.flip()
+            return True
+        if not rects:
+            return False
+        for rect in rects:
+            self.screen.set_clip(rect)
+            self.draw_backgammon_table()
+        self.screen.set_clip(None)
+        with span("display_update"):
+            pygame.display.update(rects)
         return True
 
-    def end_turn(self):
-        """
-        Ends the current player's turn, switching to the other player and resetting relevant states.
+    def ai_to_play(self):
         """
-        self.current_player_thrown_dice = False
-        if self.current_player == "white":
-            self.current_player = "black"
-        else:
-            self.current_player = "white"
-
-        if not self.winner:
-            self.dice_result = f"{self.current_player.capitalize()}'s turn - throw dice!"
-        self.selected_piece = None
-        self.possible_moves.clear()
+        Checks whether the AI is playing a turn, which the loop has to keep stepping without user input.
 
-    def update_hover_states(self):
-        """
-        Updates the hover state of each piece based on the current mouse position.
+        Returns:
+            bool: True during black's turn in a running game against the AI.
         """
-        if not self.game_started or not self.current_player or not self.current_player_thrown_dice:
-            return
-        mx, my = pygame.mouse.get_pos()
-        radius = 15
-        for point_idx, stack in self.board.items():
-            new_stack = []
-            for i, (clr, hov, sel) in enumerate(stack):
-                px, py = self.point_coords[point_idx]
-                if point_idx <= 12:
-                    py = py + i * self.stack_offset + radius
-                else:
-                    py = py - i * self.stack_offset - radius
-                dist = (mx - px) ** 2 + (my - py) ** 2
-                is_hover = (dist <= radius ** 2) and (clr == self.current_player)
-                new_stack.append((clr, is_hover, sel))
-            self.board[point_idx] = new_stack
+        return self.vs_ai and self.current_player == BLACK and not self.winner and self.game_started
 
     def gui_loop(self):
         """
         Runs the main GUI loop, handling events, updating states, and rendering the interface.
+
+        The loop sleeps in pygame.event.wait until something happens. While the AI plays or the
+        overlay is shown, it also wakes FRAME_MS after each frame to step the AI and the animations;
+        otherwise an idle board uses no CPU. The hovered checker is looked up again only after the
+        mouse moved or clicked, and a frame is drawn only when something changed, at most FPS
+        times a second; only drawn frames count towards the frame time percentiles.
         """
+        clock = time.perf_counter
         while self.running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    self.handle_click(pygame.mouse.get_pos())
-
-            self.update_hover_states()
-
-            if self.vs_ai and self.current_player == "black" and not self.winner and self.game_started:
-                self.ai_move()
-
-            self.draw_backgammon_table()
-            self.clock.tick(60)
-            pygame.display.update()
-
+            # A timeout of 0 waits for the next event however long it takes.
+            timeout = 0
+            if self.show_overlay or self.ai_to_play():
+                timeout = max(1, self.frame_ms + FRAME_MS - pygame.time.get_ticks())
+            first = pygame.event.wait(timeout)
+            frame_start = clock()
+            hover_changed = False
+            with span("events"):
+                for event in [first] + pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self.running = False
+                    elif event.type == pygame.MOUSEMOTION:
+                        hover_changed = True
+                    elif event.type == pygame.MOUSEBUTTONDOWN:
+                        self.handle_click(pygame.mouse.get_pos())
+                        hover_changed = True
+                    elif event.type == pygame.VIDEORESIZE:
+                        self.resize(event.w, event.h)
+                        hover_changed = True
+                    elif event.type == pygame.VIDEOEXPOSE:
+                        self.full_redraw = True
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        self.show_overlay = not self.show_overlay
+
+            ai_to_play = self.ai_to_play()
+            # The AI's moves can slide a checker away from under a still mouse.
+            if hover_changed or ai_to_play:
+                with span("update_hover_states"):
+                    self.update_hover_states()
+
+            if ai_to_play:
+                with span("ai_move"):
+                    self.ai_move()
+
+            with span("render"):
+                drawn = self.render()
+            if drawn:
+                TRACER.frame(clock() - frame_start)
+                self.clock.tick(FPS)
+
+        self.ai_worker.stop()
+        self.ai_player.shutdown()
         pygame.quit()
 
 
@@ -1059,5 +1157,14 @@ if __name__ == "__main__":
     """
     Entry point of the Backgammon game. Initializes the GUI and starts the main loop.
     """
+    parser = argparse.ArgumentParser(description="Play Backgammon.")
+    parser.add_argument("--trace", metavar="FILE", help="record tracing spans and write them as a Chrome trace on exit")
+    parser.add_argument("--overlay", action="store_true", help="show the frame time overlay (F3 toggles it)")
+    args = parser.parse_args()
+
+    TRACER.enabled = args.trace is not None
     game_gui = GUI(1200, 800, "Backgammon")
+    game_gui.show_overlay = args.overlay
     game_gui.gui_loop()
+    if args.trace:
+        print(f"Wrote {TRACER.export_chrome_trace(args.trace)} spans to {args.trace}")
@@ -0,0 +1,8 @@
+"""
+Lets the tests import the game modules, which live one directory up.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
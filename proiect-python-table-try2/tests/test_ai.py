@@ -0,0 +1,41 @@
+"""
+Tests of the expectiminimax search.
+"""
+
+from ai import ExpectiminimaxPlayer, evaluate
+from batch import sample_positions
+from engine import BLACK, ROLLS, WHITE, Position, dice_for_roll, opponent
+
+
+def full_width_value(position, color):
+    """
+    One-layer expectiminimax value of a position before `color` rolls, without any pruning.
+    """
+    total = 0.0
+    for (roll, probability) in ROLLS:
+        plays = position.legal_plays(color, dice_for_roll(*roll))
+        total += probability * max(evaluate(child, color) for (moves, child) in plays)
+    return total
+
+
+def test_pruned_search_finds_the_full_width_best_play():
+    player = ExpectiminimaxPlayer(time_budget_ms=60000, max_depth=1)
+    for (position, color, roll) in sample_positions(40, seed=3)[::4]:
+        dice = dice_for_roll(*roll)
+        plays = position.legal_plays(color, dice)
+        if len(plays) < 2:
+            continue
+        values = {moves: -full_width_value(child, opponent(color)) for (moves, child) in plays}
+        chosen = player.choose_play(position, color, dice)
+        assert abs(values[chosen] - max(values.values())) < 1e-9
+
+
+def test_second_layer_fits_in_the_default_budget():
+    points = [0] * 26
+    for (point, count) in ((6, 1), (5, 2), (4, 1), (3, 2), (2, 1)):
+        points[point] = count
+        points[25 - point] = -count
+    position = Position(points, {WHITE: 8, BLACK: 8})
+    player = ExpectiminimaxPlayer()
+    player.choose_play(position, WHITE, dice_for_roll(6, 5))
+    assert player.last_stats["depth"] >= 2
@@ -0,0 +1,99 @@
+"""
+Tests of the position bookkeeping and the legal play generator.
+"""
+
+import random
+
+from batch import sample_positions
+from engine import BLACK, OFF, WHITE, Position, dice_for_roll
+
+
+def snapshot(position):
+    return (list(position.points), dict(position.off), dict(position.pips),
+            dict(position.outside), dict(position.back), position.hash)
+
+
+def test_unmake_restores_every_counter():
+    rng = random.Random(1)
+    for (position, color, roll) in sample_positions(60, seed=2):
+        before = snapshot(position)
+        undo = []
+        for _ in range(rng.randint(1, 8)):
+            moves = position.single_moves(color, [rng.randint(1, 6)])
+            if moves:
+                (spoint, dest, die) = rng.choice(moves)
+                undo.append(position.make_move(color, spoint, dest))
+                # The running counters must match a recount from the checkers alone.
+                assert snapshot(position) == snapshot(Position(position.points, position.off))
+            color = BLACK if color == WHITE else WHITE
+        for record in reversed(undo):
+            position.unmake_move(record)
+        assert snapshot(position) == before
+
+
+def brute_force_results(position, color, dice):
+    """
+    Resulting boards of every legal play, found by trying every order of the dice with the rules spelled out.
+    """
+    s = 1 if color == WHITE else -1
+    bar = 25 if color == WHITE else 0
+    other_bar = 25 - bar
+
+    def distance(point):
+        return point if color == WHITE else 25 - point
+
+    def moves_for(points, die):
+        if points[bar] * s > 0:
+            sources = [bar]
+        else:
+            sources = [p for p in range(1, 25) if points[p] * s > 0]
+        home = all(distance(p) <= 6 for p in range(0, 26) if points[p] * s > 0)
+        for spoint in sources:
+            left = distance(spoint) - die
+            if left >= 1:
+                dest = spoint - die if color == WHITE else spoint + die
+                if points[dest] * s >= -1:
+                    yield spoint, dest
+            elif home and (left == 0 or all(distance(p) <= distance(spoint)
+                                            for p in range(1, 25) if points[p] * s > 0)):
+                yield spoint, OFF
+
+    sequences = []
+
+    def walk(points, off, remaining, used):
+        moved = False
+        for die in set(remaining):
+            for (spoint, dest) in moves_for(points, die):
+                moved = True
+                child = list(points)
+                child[spoint] -= s
+                child_off = off
+                if dest == OFF:
+                    child_off += 1
+                else:
+                    if child[dest] == -s:
+                        child[dest] = 0
+                        child[other_bar] -= s
+                    child[dest] += s
+                rest = list(remaining)
+                rest.remove(die)
+                walk(child, child_off, rest, used + [die])
+        if not moved:
+            sequences.append((used, tuple(points), off))
+
+    walk(list(position.points), position.off[color], list(dice), [])
+    most = max(len(used) for (used, points, off) in sequences)
+    sequences = [sequence for sequence in sequences if len(sequence[0]) == most]
+    if most == 1 and len(dice) == 2 and dice[0] != dice[1]:
+        high = [sequence for sequence in sequences if sequence[0][0] == max(dice)]
+        sequences = high or sequences
+    return {(points, off) for (used, points, off) in sequences}
+
+
+def test_legal_plays_match_brute_force():
+    for (position, color, roll) in sample_positions(150, seed=4):
+        dice = dice_for_roll(*roll)
+        plays = position.legal_plays(color, dice)
+        results = [(tuple(child.points), child.off[color]) for (moves, child) in plays]
+        assert len(set(results)) == len(results)
+        assert set(results) == brute_force_results(position, color, dice)
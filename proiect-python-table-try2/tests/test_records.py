@@ -0,0 +1,28 @@
+"""
+Tests of the position IDs and the game-record reader.
+"""
+
+import pytest
+
+from batch import sample_positions
+from engine import COLORS, Position
+from records import MAGIC, RECORD_HEADER, VERSION, position_from_id, position_id, read_records
+
+
+def test_position_id_round_trip():
+    for (position, color, roll) in sample_positions(100, seed=5):
+        for side in COLORS:
+            decoded = position_from_id(position_id(position, side), side)
+            assert decoded.points == position.points
+            assert decoded.off == position.off
+
+
+def test_initial_position_id():
+    assert position_id(Position.initial(), COLORS[0]) == "4HPwATDgc/ABMA"
+
+
+def test_truncated_turn_record_is_rejected(tmp_path):
+    path = tmp_path / "short.bgr"
+    path.write_bytes(MAGIC + bytes([VERSION]) + RECORD_HEADER.pack(b"T", 5) + bytes(5))
+    with pytest.raises(ValueError):
+        list(read_records(str(path)))
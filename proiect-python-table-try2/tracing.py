@@ -0,0 +1,184 @@
+"""
+Lightweight tracing: named spans, counters and frame times.
+
+Spans are opened with `with tracing.span("name"):`. While tracing is disabled,
+span() hands back one shared object whose __enter__ and __exit__ do nothing,
+and count() returns after a single attribute test, so instrumented hot paths
+cost next to nothing. Enabled, every span is kept as (name, thread, start,
+duration) in a bounded buffer that export_chrome_trace() writes in the Chrome
+trace event format, to be opened in chrome://tracing or https://ui.perfetto.dev.
+
+Frame times are recorded separately by the render loop; frame_percentiles()
+feeds the on-screen overlay of table.py.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Spans kept before the oldest are dropped.
+SPAN_CAPACITY = 200000
+
+# Frames the percentiles are computed over.
+FRAME_WINDOW = 600
+
+
+class _NullSpan:
+    """
+    Span returned while tracing is disabled; entering and leaving it does nothing.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """
+    Span being timed; stores itself in the tracer when it is left.
+    """
+
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.tracer.spans.append((self.name, threading.get_ident(), self.start, time.perf_counter_ns() - self.start))
+        return False
+
+
+class Tracer:
+    """
+    Collects spans, counters and frame times.
+
+    Attributes:
+        enabled (bool): Whether spans and counters are recorded.
+        spans (collections.deque): Recorded (name, thread id, start ns, duration ns) tuples.
+        counters (dict): Counter name to value.
+        frames (collections.deque): The last FRAME_WINDOW frame times in seconds.
+    """
+
+    def __init__(self, capacity=SPAN_CAPACITY, frame_window=FRAME_WINDOW):
+        """
+        Initializes a disabled tracer.
+
+        Parameters:
+            capacity (int, optional): Spans kept. Defaults to SPAN_CAPACITY.
+            frame_window (int, optional): Frames kept for the percentiles. Defaults to FRAME_WINDOW.
+        """
+        self.enabled = False
+        self.spans = deque(maxlen=capacity)
+        self.counters = {}
+        self.frames = deque(maxlen=frame_window)
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name):
+        """
+        Returns a context manager timing a named span.
+
+        Parameters:
+            name (str): The span name.
+
+        Returns:
+            object: The span, or a shared no-op span while disabled.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def count(self, name, n=1):
+        """
+        Adds to a counter while enabled.
+
+        Parameters:
+            name (str): The counter name.
+            n (int, optional): The amount. Defaults to 1.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def frame(self, seconds):
+        """
+        Records the duration of one rendered frame.
+
+        Parameters:
+            seconds (float): The frame time.
+        """
+        self.frames.append(seconds)
+
+    def frame_percentiles(self, percentiles=(50, 95, 99)):
+        """
+        Computes frame time percentiles over the recent frames.
+
+        Parameters:
+            percentiles (tuple, optional): The percentiles. Defaults to (50, 95, 99).
+
+        Returns:
+            dict: Percentile to frame time in milliseconds; empty before the first frame.
+        """
+        if not self.frames:
+            return {}
+        ordered = sorted(self.frames)
+        last = len(ordered) - 1
+        return {p: 1000.0 * ordered[min(last, round(p / 100.0 * last))] for p in percentiles}
+
+    def clear(self):
+        """
+        Drops the recorded spans, counters and frames.
+        """
+        self.spans.clear()
+        self.counters.clear()
+        self.frames.clear()
+        self.origin = time.perf_counter_ns()
+
+    def chrome_trace(self):
+        """
+        Converts the recorded spans and counters to the Chrome trace event format.
+
+        Returns:
+            dict: The trace, with complete ("X") events for the spans and one counter ("C") event per counter.
+        """
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                   "ts": (start - self.origin) / 1000.0, "dur": duration / 1000.0}
+                  for (name, tid, start, duration) in list(self.spans)]
+        now = (time.perf_counter_ns() - self.origin) / 1000.0
+        events.extend({"name": name, "ph": "C", "pid": pid, "tid": 0, "ts": now, "args": {name: value}}
+                      for name, value in self.counters.items())
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        """
+        Writes the recorded spans and counters as a Chrome trace JSON file.
+
+        Parameters:
+            path (str): The file to write.
+
+        Returns:
+            int: The number of spans written.
+        """
+        trace = self.chrome_trace()
+        with open(path, "w") as f:
+            json.dump(trace, f)
+        return sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
+
+
+# The process-wide tracer used by the engine, the AI worker and the GUI.
+TRACER = Tracer()
+span = TRACER.span
+count = TRACER.count
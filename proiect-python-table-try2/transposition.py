@@ -0,0 +1,122 @@
+"""
+Bounded transposition table keyed by Zobrist position hash plus dice.
+"""
+
+from collections import namedtuple
+
+# Rough size of one stored entry (the slot pointer, the entry tuple and its fields).
+ENTRY_BYTES = 160
+
+TTEntry = namedtuple("TTEntry", ["key", "dice", "depth", "value", "best", "generation"])
+
+
+def dice_key(dice):
+    """
+    Normalizes a dice list so that equal rolls share one table key.
+
+    Parameters:
+        dice (list): The dice values, in any order.
+
+    Returns:
+        tuple: The sorted dice values.
+    """
+    return tuple(sorted(dice))
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results.
+
+    The table is a power-of-two list of slots sized from a memory budget, so it never
+    grows. When two entries map to the same slot the new one replaces the old one if
+    the old one is from an earlier search, is for the same position and dice, or was
+    searched less deeply; otherwise the deeper, current result is kept.
+
+    Attributes:
+        size (int): Number of slots.
+        generation (int): Counter bumped by new_search() to age out old entries.
+        hits (int): Number of successful probes.
+        misses (int): Number of probes that found nothing.
+        stores (int): Number of entries written.
+    """
+
+    def __init__(self, size_mb=16):
+        """
+        Allocates the table.
+
+        Parameters:
+            size_mb (float, optional): Memory budget in megabytes. Defaults to 16.
+        """
+        wanted = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.size = 1 << (wanted.bit_length() - 1)
+        self._mask = self.size - 1
+        self._slots = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def _index(self, key, dice):
+        return (key ^ (hash(dice) * 0x9E3779B97F4A7C15)) & self._mask
+
+    def probe(self, key, dice):
+        """
+        Looks up the entry for a position and roll.
+
+        Parameters:
+            key (int): The Zobrist hash of the position (combined with the side to move by the caller if needed).
+            dice (list): The dice to play.
+
+        Returns:
+            TTEntry or None: The stored entry, or None if the position and roll are not in the table.
+        """
+        dice = dice_key(dice)
+        entry = self._slots[self._index(key, dice)]
+        if entry is not None and entry.key == key and entry.dice == dice:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, dice, depth, value, best=None):
+        """
+        Stores a result, subject to the replacement policy.
+
+        Parameters:
+            key (int): The Zobrist hash of the position.
+            dice (list): The dice that were played.
+            depth (int): The search depth the value was computed at.
+            value (float): The value to store.
+            best (object, optional): The best play found, if any.
+
+        Returns:
+            bool: True if the entry was written.
+        """
+        dice = dice_key(dice)
+        index = self._index(key, dice)
+        old = self._slots[index]
+        if (old is not None and old.generation == self.generation and depth < old.depth
+                and (old.key != key or old.dice != dice)):
+            return False
+        self._slots[index] = TTEntry(key, dice, depth, value, best, self.generation)
+        self.stores += 1
+        return True
+
+    def new_search(self):
+        """
+        Marks every stored entry as coming from an earlier search so it can be replaced freely.
+        """
+        self.generation += 1
+
+    def clear(self):
+        """
+        Empties the table and resets the counters.
+        """
+        self._slots = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def __len__(self):
+        return sum(1 for entry in self._slots if entry is not None)
@@ -7,13 +7,16 @@ import json
 import random
 
 class ServerInstance:
-    def __init__(self):
-        self.host = "127.0.0.1" 
-        self.port = 5100
+    def __init__(self, host="127.0.0.1", port=5100, dice_source=None):
+        self.host = host
+        # Any object with a roll() method returning two dice (see dice.py); None rolls live.
+        self.dice_source = dice_source
         self.server_socket = socket.socket()
         self.server_socket.setblocking(False)
-        self.server_socket.bind((self.host, self.port))
+        self.server_socket.bind((self.host, port))
         self.server_socket.listen(5)
+        # Port 0 asks the OS for a free port; report the one actually bound.
+        self.port = self.server_socket.getsockname()[1]
         print(f"Server listening on {self.host}:{self.port}")
         self.clients = []
         self.game_state = None
@@ -51,7 +54,10 @@ class ServerInstance:
             print(f"Error handling message: {e}")
 
     def roll_dice(self):
-        self.dice_rolls = (random.randint(1, 6), random.randint(1, 6))
+        if self.dice_source is not None:
+            self.dice_rolls = self.dice_source.roll()
+        else:
+            self.dice_rolls = (random.randint(1, 6), random.randint(1, 6))
         print(f"Dice rolled: {self.dice_rolls}")
 
     async def broadcast_game_state(self):
@@ -100,16 +106,13 @@ class ServerInstance:
             await self.close_connection(client)
         self.server_socket.close()
 
-server = ServerInstance()
+server = None
 
 def signal_handler(sig, frame):
     print("Caught signal, shutting down server...")
     asyncio.run(server.shutdown())
     sys.exit(0)
 
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
-
 async def main():
     try:
         await server.accept_clients()
@@ -117,6 +120,9 @@ async def main():
         print("Server stopped.")
 
 if __name__ == '__main__':
+    server = ServerInstance()
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
     try:
         asyncio.run(main())
     except KeyboardInterrupt: